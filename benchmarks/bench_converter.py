@@ -0,0 +1,41 @@
+# bench_converter.py
+
+import os
+import shutil
+import time
+import numpy as np
+from napari_zarr_loader.synthetic import make_ims_file
+from .common import IMS_FILE, temp_path
+import ims_to_zarr  # importable once common has set up the path
+
+
+class Converter:
+    """Conversion of a synthetic .ims file, one conversion per setup."""
+    number = 1
+    repeat = 5
+    timeout = 900
+    params = [[1, 4]]
+    param_names = ['workers']
+
+    def setup_cache(self):
+        return make_ims_file(temp_path('volume.ims'), **IMS_FILE)
+
+    def setup(self, ims_path, workers):
+        self.output = temp_path('volume.zarr')
+
+    def teardown(self, ims_path, workers):
+        shutil.rmtree(os.path.dirname(self.output), ignore_errors=True)
+
+    def _convert(self, ims_path, workers):
+        ims_to_zarr.main(ims_path, self.output, workers=workers)
+
+    def time_convert(self, ims_path, workers):
+        self._convert(ims_path, workers)
+
+    def track_throughput(self, ims_path, workers):
+        start = time.perf_counter()
+        self._convert(ims_path, workers)
+        nbytes = int(np.prod(IMS_FILE['shape'])) * np.dtype('uint16').itemsize
+        return nbytes / 2**20 / (time.perf_counter() - start)
+
+    track_throughput.unit = 'MB/s'
@@ -0,0 +1,86 @@
+# bench_reader.py
+
+import zarr
+from napari.components import ViewerModel
+from napari_zarr_loader.chunked_array import open_chunked
+from napari_zarr_loader.reader import zarr_reader
+from napari_zarr_loader.resolution_change_widget import reload_layers
+from napari_zarr_loader.statistics import min_max
+from napari_zarr_loader.synthetic import make_volume
+from .common import CACHE_STATES, VOLUME, reset_cache, temp_path
+
+LEVELS = list(range(VOLUME['levels']))
+
+
+class VolumeSuite:
+    """Base class: one synthetic volume shared by all benchmarks, one run per setup."""
+    number = 1
+    repeat = 10
+    timeout = 600
+
+    def setup_cache(self):
+        return make_volume(temp_path('volume.zarr'), **VOLUME)
+
+
+class OpenVolume(VolumeSuite):
+    params = [CACHE_STATES]
+    param_names = ['cache']
+
+    def setup(self, path, cache):
+        reset_cache()
+        if cache == 'warm':
+            zarr_reader(path)
+
+    def time_open(self, path, cache):
+        zarr_reader(path)
+
+
+class Contrast(VolumeSuite):
+    params = [CACHE_STATES, [True, False]]
+    param_names = ['cache', 'summary_index']
+
+    def setup(self, path, cache, summary_index):
+        group = zarr.open(path, mode='r')['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0']
+        self.chunked = open_chunked(group)
+        if not summary_index:
+            self.chunked.summary = None
+        reset_cache()
+        if cache == 'warm':
+            min_max(self.chunked)
+
+    def time_min_max(self, path, cache, summary_index):
+        min_max(self.chunked)
+
+
+class SliceLatency(VolumeSuite):
+    params = [CACHE_STATES, LEVELS]
+    param_names = ['cache', 'level']
+
+    def setup(self, path, cache, level):
+        self.data = zarr_reader(path, resolution_level=level)[0][0]
+        self.plane = self.data.shape[0] // 2
+        reset_cache()
+        if cache == 'warm':
+            self.data[self.plane].compute()
+
+    def time_plane(self, path, cache, level):
+        self.data[self.plane].compute()
+
+
+class ResolutionChange(VolumeSuite):
+    """Switch of all layers to `level`, from the coarsest level (or from level 0 for level 0 itself)."""
+    params = [CACHE_STATES, LEVELS[1:] + [0]]
+    param_names = ['cache', 'level']
+
+    def setup(self, path, cache, level):
+        start = LEVELS[-1] if level == 0 else 0
+        self.viewer = ViewerModel()
+        for data, meta in zarr_reader(path, resolution_level=start):
+            self.viewer.add_image(data, **meta)
+        reset_cache()
+        if cache == 'warm':
+            reload_layers(self.viewer, level)
+            reload_layers(self.viewer, start)
+
+    def time_reload(self, path, cache, level):
+        reload_layers(self.viewer, level)
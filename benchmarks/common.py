@@ -0,0 +1,29 @@
+# common.py
+
+import os
+import sys
+import tempfile
+from napari_zarr_loader.chunk_cache import get_chunk_cache
+
+# The converter is a top-level script of the repository
+try:
+    import ims_to_zarr  # noqa: F401
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Synthetic volume used by the reader benchmarks: two channels, three levels, 30% empty chunks
+VOLUME = dict(shape=(128, 512, 512), chunks=(32, 128, 128), levels=3, channels=2, sparsity=0.3)
+# Synthetic .ims file used by the converter benchmarks
+IMS_FILE = dict(shape=(128, 512, 512), chunks=(32, 128, 128), levels=2, channels=1, sparsity=0.3)
+
+# 'cold' benchmarks start with an empty chunk cache, 'warm' ones after running the operation once.
+# The operating system's page cache is not dropped in either case.
+CACHE_STATES = ['cold', 'warm']
+
+
+def temp_path(name: str) -> str:
+    return os.path.join(tempfile.mkdtemp(prefix='napari-zarr-bench-'), name)
+
+
+def reset_cache() -> None:
+    get_chunk_cache().clear()
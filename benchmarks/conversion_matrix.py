@@ -0,0 +1,163 @@
+# conversion_matrix.py
+"""
+Runs the converter over a matrix of compressor, chunk-shape and worker-count settings and reports,
+for each combination, the conversion throughput, the compression ratio and the reader's plane latency,
+followed by a recommended configuration.
+
+    python -m benchmarks.conversion_matrix --ims sample.ims --workers 1,4,8
+    python -m benchmarks.conversion_matrix --synthetic 128,1024,1024 --json results.json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import h5py
+import numpy as np
+from napari_zarr_loader.chunk_cache import get_chunk_cache
+from napari_zarr_loader.reader import zarr_reader
+from napari_zarr_loader.synthetic import make_ims_file
+from .common import temp_path
+import ims_to_zarr  # importable once common has set up the path
+
+DEFAULT_COMPRESSORS = 'lz4:5:shuffle,lz4:5:bitshuffle,zstd:3:bitshuffle,zstd:7:bitshuffle,none'
+DEFAULT_CHUNKS = 'ims,32x128x128,64x256x256'
+# Planes read (each from a cold chunk cache) to measure the reader latency
+PLANES = 8
+
+
+def ims_nbytes(ims_path: str) -> int:
+    """Returns the uncompressed size of all image data in an .ims file."""
+    total = 0
+
+    def visit(name, item):
+        nonlocal total
+        if isinstance(item, h5py.Dataset) and name.endswith('/Data'):
+            total += item.size * item.dtype.itemsize
+
+    with h5py.File(ims_path, 'r') as f:
+        f.visititems(visit)
+    return total
+
+
+def stored_nbytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def plane_latency(zarr_path: str) -> float:
+    """Returns the median time, in seconds, to read a full-resolution Z plane from a cold chunk cache."""
+    data = zarr_reader(zarr_path)[0][0]
+    planes = np.linspace(0, data.shape[0] - 1, PLANES).astype(int)
+    times = []
+    for z in planes:
+        get_chunk_cache().clear()
+        start = time.perf_counter()
+        data[z].compute()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def run_combination(ims_path: str, compressor: str, chunks, workers: int, nbytes: int) -> dict:
+    output = temp_path('matrix.zarr')
+    try:
+        start = time.perf_counter()
+        # The converter reports every dataset it copies
+        with contextlib.redirect_stdout(io.StringIO()):
+            ims_to_zarr.main(ims_path, output, workers=workers, chunks=chunks,
+                             compressor=ims_to_zarr.parse_compressor(compressor))
+            seconds = time.perf_counter() - start
+            latency = plane_latency(output)
+        stored = stored_nbytes(output)
+    finally:
+        shutil.rmtree(os.path.dirname(output), ignore_errors=True)
+    return {
+        'compressor': compressor,
+        'chunks': 'ims' if chunks is None else 'x'.join(str(c) for c in chunks),
+        'workers': workers,
+        'convert_gb_s': nbytes / 2**30 / seconds,
+        'compression_ratio': nbytes / stored,
+        'plane_ms': latency * 1000,
+    }
+
+
+def recommend(results):
+    """
+    Picks the combination with the best balance of the three measures: each is scored relative to
+    the best value measured (higher throughput and ratio, lower latency are better) and the
+    combination with the highest geometric mean of its scores wins.
+    """
+    best_speed = max(r['convert_gb_s'] for r in results)
+    best_ratio = max(r['compression_ratio'] for r in results)
+    best_latency = min(r['plane_ms'] for r in results)
+
+    def score(r):
+        return (r['convert_gb_s'] / best_speed * r['compression_ratio'] / best_ratio
+                * best_latency / r['plane_ms']) ** (1 / 3)
+
+    return max(results, key=score)
+
+
+def print_table(results):
+    header = f"{'compressor':<20} {'chunks':<14} {'workers':>7} {'GB/s':>7} {'ratio':>7} {'plane ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['compressor']:<20} {r['chunks']:<14} {r['workers']:>7} {r['convert_gb_s']:>7.3f} "
+              f"{r['compression_ratio']:>7.2f} {r['plane_ms']:>9.1f}")
+
+
+def parse_chunks(spec: str):
+    return None if spec == 'ims' else tuple(int(c) for c in spec.split('x'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark converter settings on a sample or synthetic .ims file.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ims', help="sample .ims file")
+    source.add_argument('--synthetic', metavar='Z,Y,X',
+                        help="generate a synthetic .ims file of this shape (30%% empty chunks)")
+    parser.add_argument('--compressors', default=DEFAULT_COMPRESSORS,
+                        help=f"comma-separated compressors, 'none' or CNAME:LEVEL:SHUFFLE (default: {DEFAULT_COMPRESSORS})")
+    parser.add_argument('--chunks', default=DEFAULT_CHUNKS,
+                        help=f"comma-separated ZxYxX chunk shapes, 'ims' keeps the HDF5 chunks (default: {DEFAULT_CHUNKS})")
+    parser.add_argument('--workers', default=str(os.cpu_count() or 1),
+                        help="comma-separated worker counts (default: one per core)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    ims_path = args.ims
+    if args.synthetic:
+        shape = tuple(int(n) for n in args.synthetic.split(','))
+        ims_path = make_ims_file(os.path.join(tempfile.mkdtemp(prefix='napari-zarr-bench-'), 'synthetic.ims'),
+                                 shape=shape, sparsity=0.3)
+    nbytes = ims_nbytes(ims_path)
+
+    results = []
+    combinations = list(itertools.product(args.compressors.split(','), args.chunks.split(','),
+                                          [int(w) for w in args.workers.split(',')]))
+    for n, (compressor, chunks, workers) in enumerate(combinations, 1):
+        print(f"[{n}/{len(combinations)}] compressor={compressor} chunks={chunks} workers={workers}")
+        results.append(run_combination(ims_path, compressor, parse_chunks(chunks), workers, nbytes))
+
+    print()
+    print_table(results)
+    best = recommend(results)
+    print(f"\nRecommended: --compressor {best['compressor']} "
+          + ('' if best['chunks'] == 'ims' else f"--chunks {best['chunks'].replace('x', ',')} ")
+          + f"--workers {best['workers']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'source': ims_path, 'results': results, 'recommended': best}, f, indent=2)
+    if args.synthetic:
+        shutil.rmtree(os.path.dirname(ims_path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
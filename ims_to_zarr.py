@@ -1,45 +1,181 @@
 #!/usr/bin/env python3
 
+import argparse
 import h5py
+import numpy as np
 import zarr
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from napari_zarr_loader.chunked_array import ChunkedArray, write_occupancy, write_summary
+from napari_zarr_loader.chunking import chunk_grid_shape, iter_chunk_slices, run_bounded
+from napari_zarr_loader.ims_reader import image_shape
+from napari_zarr_loader.ngff import write_ngff
+from napari_zarr_loader.paths import file_signature
+from napari_zarr_loader.storage import create_store, finalize_store, parse_compressor
+from napari_zarr_loader.instrumentation import count, log, span, traced
+from napari_zarr_loader.projections import KINDS, build_projections
+from napari_zarr_loader.pyramid import DEFAULT_TARGET_SIZE, build_pyramid
+from napari_zarr_loader.shared_cache import get_shared_chunk_cache
+from napari_zarr_loader.statistics import chunk_summary, fill_summary
+from napari_zarr_loader.threading_policy import BULK, configure_threading
 
-def copy_to_zarr(h5_group, zarr_group):
+
+def copy_dataset(name, item, zarr_group, executor, workers, compressor='default', data_chunks=None):
+    """
+    Copy one HDF5 dataset chunk by chunk, compressing the chunks in parallel.
+    Chunks holding only the fill value are not written; for image 'Data' arrays their
+    positions are recorded in a chunk-occupancy bitmap stored next to the array, together
+    with the per-chunk summary index (min, max, sum, count, nonzero).
+    Chunks are read through the shared chunk cache when it is enabled, under the keys
+    used by the IMS reader, so conversions and viewers of the same file share decoded chunks.
+    `data_chunks` rechunks the 'Data' arrays, which otherwise keep the HDF5 chunk shape.
+    """
+    # Keep the HDF5 chunking so that empty regions are detected at the same granularity
+    chunks = item.chunks or True
+    if name == 'Data' and data_chunks is not None and item.ndim >= len(data_chunks):
+        chunks = item.shape[:item.ndim - len(data_chunks)] + tuple(
+            min(c, n) for c, n in zip(data_chunks, item.shape[item.ndim - len(data_chunks):]))
+    zarr_array = zarr_group.create_dataset(name, shape=item.shape, dtype=item.dtype, chunks=chunks,
+                                           compressor=compressor, write_empty_chunks=False)
+    fill_value = zarr_array.fill_value
+    chunks = zarr_array.chunks
+    occupancy = np.zeros(chunk_grid_shape(zarr_array.shape, chunks), dtype=bool)
+    summary = fill_summary(ChunkedArray(zarr_array)) if name == 'Data' else None
+    # Shared chunks are keyed by the HDF5 chunk grid, as read by the IMS reader
+    shared_cache = get_shared_chunk_cache() if name == 'Data' and chunks == item.chunks else None
+    # The reader crops the padded datasets (and so its edge chunks) to the image size
+    bounds = image_shape(item.parent) if shared_cache is not None else item.shape
+    cache_key = f"ims:{os.path.abspath(item.file.filename)}:{item.name}"
+    # The version of the .ims file, as keyed by the reader's ChunkedArray
+    version = file_signature(item.file.filename)
+
+    def read_chunk(selection):
+        if shared_cache is None:
+            return item[selection]
+        key = (cache_key, tuple(s.start // c for s, c in zip(selection, chunks)), version)
+        cropped = tuple(slice(0, max(0, min(s.stop, n) - s.start)) for s, n in zip(selection, bounds))
+        block = shared_cache.get(key)
+        if block is not None and block.shape == tuple(s.stop - s.start for s in selection):
+            return block
+        # Edge chunks also hold padding, which is read from the file but not shared
+        block = item[selection]
+        if all(c.stop > 0 for c in cropped):
+            shared_cache.put(key, np.ascontiguousarray(block[cropped]))
+        return block
+
+    def copy_chunk(selection):
+        with span('read_chunk'):
+            block = read_chunk(selection)
+        count('bytes_decoded', block.nbytes)
+        if np.any(block != fill_value):
+            with span('write_chunk'):
+                zarr_array[selection] = block
+            count('chunks_written')
+            index = tuple(s.start // c for s, c in zip(selection, chunks))
+            occupancy[index] = True
+            if summary is not None:
+                summary[index] = chunk_summary(block)
+
+    # Only a couple of chunks per worker are held in memory at any time
+    run_bounded(executor, copy_chunk, iter_chunk_slices(zarr_array.shape, chunks), 2 * workers)
+
+    if name == 'Data':
+        write_occupancy(zarr_group, occupancy)
+        write_summary(zarr_group, summary)
+        log(f"{int(occupancy.sum())} of {occupancy.size} chunks hold data")
+
+
+def copy_to_zarr(h5_group, zarr_group, executor=None, workers=1, compressor='default', data_chunks=None):
     """Recursively copy HDF5 groups and datasets to Zarr format."""
-    for name, item in h5_group.items():
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return copy_to_zarr(h5_group, zarr_group, executor, workers, compressor, data_chunks)
+
+    # Materialize the listing: h5py holds its global lock while iterating a group,
+    # which would block the workers reading chunks in the meantime
+    for name, item in list(h5_group.items()):
         if isinstance(item, h5py.Dataset):
             # Check for metadata compatibility
             if not item.dtype.metadata:  # Skip if dtype has complex metadata
                 try:
-                    print(f"Copying dataset {name}")
-                    zarr_group.create_dataset(name, data=item[...], shape=item.shape, dtype=item.dtype)
+                    log(f"Copying dataset {name}")
+                    with span('copy_dataset', name=item.name):
+                        copy_dataset(name, item, zarr_group, executor, workers, compressor, data_chunks)
                 except Exception as e:
-                    print(f"Skipping dataset {name} due to error: {e}")
+                    log(f"Skipping dataset {name} due to error: {e}")
             else:
-                print(f"Skipping dataset {name} due to incompatible metadata.")
+                log(f"Skipping dataset {name} due to incompatible metadata.")
         elif isinstance(item, h5py.Group):
-            print(f"Creating group {name}")
+            log(f"Creating group {name}")
             new_zarr_group = zarr_group.create_group(name)
-            copy_to_zarr(item, new_zarr_group)
+            copy_to_zarr(item, new_zarr_group, executor, workers, compressor, data_chunks)
 
-def main(ims_path, zarr_path):
+@traced('convert')
+def main(ims_path, zarr_path, workers=None, pyramid=False, target_size=DEFAULT_TARGET_SIZE, labels=False,
+         output_format='ims', chunks=None, projections=False, mean_projections=False, compressor='default'):
     if not os.path.exists(ims_path):
-        print(f"Error: {ims_path} does not exist.")
+        log(f"Error: {ims_path} does not exist.")
         sys.exit(1)
 
+    # Bulk conversion: one Blosc thread per worker, one worker per core
+    workers, blosc_threads = configure_threading(BULK, workers)
+    log(f"Converting with {workers} workers and {blosc_threads} Blosc thread(s) per worker")
+
     # Open the .ims file and create a new Zarr file
     with h5py.File(ims_path, 'r') as ims_file:
-        zarr_file = zarr.open(zarr_path, mode='w')
-        copy_to_zarr(ims_file, zarr_file)
+        # A '.zip' output path writes the whole volume into a single zip container
+        store = create_store(zarr_path)
+        zarr_file = zarr.open(store, mode='w')
+        if output_format == 'ngff':
+            write_ngff(ims_file, zarr_file, workers=workers, chunks=chunks, compressor=compressor)
+        else:
+            copy_to_zarr(ims_file, zarr_file, workers=workers, compressor=compressor, data_chunks=chunks)
 
-    print(f"Conversion complete: {zarr_path}")
+    # Add coarse levels when the IMS file does not provide enough of them
+    if pyramid and output_format == 'ngff':
+        log("--pyramid is only supported for the IMS layout, skipping.")
+    elif pyramid:
+        with span('build_pyramid'):
+            added = build_pyramid(zarr_file, target_size, 'mode' if labels else 'mean', workers)
+        log(f"Added {added} resolution level(s)")
+
+    # Projections open instantly in the viewer instead of being computed from the full volume
+    if (projections or mean_projections) and output_format == 'ngff':
+        log("--projections is only supported for the IMS layout, skipping.")
+    elif projections or mean_projections:
+        kinds = KINDS if mean_projections else ('max',)
+        with span('build_projections'):
+            built = build_projections(zarr_file, kinds, target_size=target_size, workers=workers)
+        log(f"Built {built} projection(s)")
+
+    finalize_store(store)
+    log(f"Conversion complete: {zarr_path}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python ims_to_zarr.py <input.ims> <output.zarr>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Convert an Imaris .ims file to the Zarr layout read by napari-zarr-loader.")
+    parser.add_argument('ims_path', help="input .ims file")
+    parser.add_argument('zarr_path', help="output .zarr directory, or .zarr.zip single-file container")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of parallel copy workers (default: one per core)")
+    parser.add_argument('--pyramid', action='store_true',
+                        help="add resolution levels until the coarsest level fits --target-size")
+    parser.add_argument('--target-size', type=int, default=DEFAULT_TARGET_SIZE,
+                        help="largest axis length of the coarsest level (with --pyramid)")
+    parser.add_argument('--labels', action='store_true',
+                        help="downsample with the most frequent value instead of the mean (with --pyramid)")
+    parser.add_argument('--format', choices=['ims', 'ngff'], default='ims',
+                        help="'ims' mirrors the IMS hierarchy, 'ngff' writes an OME-NGFF multiscale image")
+    parser.add_argument('--chunks', type=lambda s: tuple(int(v) for v in s.split(',')), default=None,
+                        help="spatial Z,Y,X chunk shape of the image arrays (default: the IMS chunk shape)")
+    parser.add_argument('--compressor', type=parse_compressor, default='default',
+                        help="'none' or Blosc CNAME[:LEVEL[:SHUFFLE]], e.g. zstd:3:bitshuffle (default: lz4:5:shuffle)")
+    parser.add_argument('--projections', action='store_true',
+                        help="store maximum-intensity projections along Z, Y and X with their own levels")
+    parser.add_argument('--mean-projections', action='store_true',
+                        help="store mean projections as well as the maximum-intensity projections")
+    args = parser.parse_args()
 
-    ims_path = sys.argv[1]
-    zarr_path = sys.argv[2]
-    main(ims_path, zarr_path)
+    main(args.ims_path, args.zarr_path, workers=args.workers, pyramid=args.pyramid,
+         target_size=args.target_size, labels=args.labels, output_format=args.format, chunks=args.chunks,
+         projections=args.projections, mean_projections=args.mean_projections, compressor=args.compressor)
@@ -1,4 +1,4 @@
-from .reader import napari_get_reader
-from .resolution_change_widget import napari_experimental_provide_dock_widget
+# Only the path sniffing is imported with the package; readers and widgets load on use
+from .contributions import napari_get_reader
 
-__all__ = ['napari_get_reader', 'napari_experimental_provide_dock_widget']
\ No newline at end of file
+__all__ = ['napari_get_reader']
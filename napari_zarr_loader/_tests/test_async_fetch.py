@@ -0,0 +1,84 @@
+import threading
+import time
+import numpy as np
+import pytest
+import zarr
+from napari_zarr_loader import threading_policy
+from napari_zarr_loader.async_fetch import AsyncFetchEngine, fetch_decoded
+from napari_zarr_loader.chunked_array import ChunkedArray
+from napari_zarr_loader.remote import HTTPStore, aiohttp
+from .test_remote import http_root  # noqa: F401
+
+
+class SlowStore(zarr.storage.MemoryStore):
+    """Memory store with a fixed latency per read, recording the peak number of concurrent reads."""
+
+    def __init__(self, latency=0.05):
+        super().__init__()
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        return super().__getitem__(key)
+
+
+def test_engine_fetches_concurrently():
+    store = SlowStore()
+    for i in range(12):
+        store[f"k{i}"] = bytes([i])
+    engine = AsyncFetchEngine(max_inflight=8, decode_threads=2)
+
+    values = engine.fetch(store, [f"k{i}" for i in range(12)] + ['missing'], decode=lambda raw: raw[0])
+    assert values == {f"k{i}": i for i in range(12)}
+    assert 1 < store.peak <= 8
+    assert engine.inflight == 0
+
+
+def test_chunked_array_reads_through_engine():
+    store = SlowStore(latency=0.01)
+    data = np.arange(8 * 64 * 64, dtype='uint16').reshape(8, 64, 64)
+    zarr.array(data, chunks=(4, 16, 16), store=store)
+    chunked = ChunkedArray(zarr.open_array(store, mode='r'))
+
+    np.testing.assert_array_equal(chunked[5], data[5])
+    assert store.peak > 1
+
+
+@pytest.mark.skipif(aiohttp is None, reason="aiohttp is not installed")
+def test_http_store_async_get(http_root):  # noqa: F811
+    root, url = http_root
+    data = np.arange(100, dtype='uint16')
+    array = zarr.array(data, chunks=(10,), store=str(root / 'a.zarr'))
+    store = HTTPStore(f"{url}/a.zarr")
+    try:
+        values = fetch_decoded(store, ['0', '9', 'missing'], lambda raw: np.frombuffer(array.compressor.decode(raw), 'uint16'))
+        assert sorted(values) == ['0', '9']
+        np.testing.assert_array_equal(values['9'], data[90:])
+    finally:
+        store.close()
+
+
+def test_bulk_mode_decodes_local_chunks_on_caller(tmp_path, monkeypatch):
+    array = zarr.array(np.arange(64, dtype='uint16'), chunks=(8,), store=str(tmp_path / 'a.zarr'))
+    decoders = set()
+
+    def decode(raw):
+        decoders.add(threading.current_thread().name)
+        return np.frombuffer(array.compressor.decode(raw), 'uint16')
+
+    keys = [str(i) for i in range(8)]
+    monkeypatch.setattr(threading_policy, '_configured_mode', threading_policy.INTERACTIVE)
+    assert len(fetch_decoded(array.chunk_store, keys, decode)) == 8
+    assert threading.current_thread().name not in decoders
+    decoders.clear()
+    monkeypatch.setattr(threading_policy, '_configured_mode', threading_policy.BULK)
+    assert len(fetch_decoded(array.chunk_store, keys, decode)) == 8
+    assert decoders == {threading.current_thread().name}
@@ -0,0 +1,77 @@
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from napari_zarr_loader import chunk_cache
+from napari_zarr_loader.chunk_cache import AdaptiveChunkCache, CompressedChunkCache
+
+
+def smooth_chunk(seed, shape=(16, 64, 64)):
+    z, y, x = np.indices(shape)
+    return (1000 + seed + z + y + x).astype('uint16')
+
+
+def test_compressed_cache_holds_more():
+    chunk = smooth_chunk(0)
+    cache = CompressedChunkCache(4 * chunk.nbytes)
+    for i in range(20):
+        cache.put(('a', (i,)), smooth_chunk(i))
+    assert len(cache) == 20 and cache.nbytes <= 4 * chunk.nbytes
+    np.testing.assert_array_equal(cache.get(('a', (3,))), smooth_chunk(3))
+
+
+def test_adaptive_cache_demotes_and_promotes():
+    chunk = smooth_chunk(0)
+    cache = AdaptiveChunkCache(4 * chunk.nbytes)
+    for i in range(6):
+        cache.put(('a', (i,)), smooth_chunk(i))
+    # The oldest chunks were demoted to the compressed tier instead of being dropped
+    assert len(cache) == 6 and len(cache.warm) >= 4
+    np.testing.assert_array_equal(cache.get(('a', (0,))), smooth_chunk(0))
+    assert cache.warm.hits == 1 and ('a', (0,)) in cache.hot._chunks
+
+    cache.invalidate('a')
+    assert len(cache) == 0 and cache.get(('a', (0,))) is None
+
+
+def test_replacing_a_demoted_chunk_does_not_decode_it(monkeypatch):
+    chunk = smooth_chunk(0)
+    cache = AdaptiveChunkCache(4 * chunk.nbytes)
+    for i in range(6):
+        cache.put(('a', (i,)), smooth_chunk(i))
+    assert ('a', (0,)) in cache.warm._chunks
+
+    decoded = []
+    monkeypatch.setattr(cache.warm, '_decode', lambda entry: decoded.append(entry))
+    cache.put(('a', (0,)), smooth_chunk(10))
+    assert decoded == [] and ('a', (0,)) not in cache.warm._chunks
+    np.testing.assert_array_equal(cache.get(('a', (0,))), smooth_chunk(10))
+
+
+def test_chunk_cache_is_created_once(monkeypatch):
+    monkeypatch.setattr(chunk_cache, '_chunk_cache', None)
+    # A slow construction widens the window in which workers could build a second cache
+    monkeypatch.setattr(chunk_cache, 'get_shared_chunk_cache', lambda: time.sleep(0.01))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        caches = list(executor.map(lambda _: chunk_cache.get_chunk_cache(), range(64)))
+    assert all(cache is caches[0] for cache in caches)
+
+
+def test_split_follows_hit_rates():
+    chunk = smooth_chunk(0)
+    cache = AdaptiveChunkCache(2 * chunk.nbytes, warm_fraction=0.5)
+    cache.ADAPT_INTERVAL = 16
+
+    # Everything fits in the decoded tier: the compressed tier shrinks
+    cache.put(('a', (0,)), chunk)
+    for _ in range(64):
+        cache.get(('a', (0,)))
+    assert cache.warm_fraction < 0.5
+
+    # A working set cycling through more chunks than fit: the compressed tier grows
+    shrunk = cache.warm_fraction
+    for _ in range(20):
+        for i in range(400):
+            if cache.get(('b', (i,))) is None:
+                cache.put(('b', (i,)), np.random.randint(0, 2**16, (64, 64), dtype='uint16'))
+    assert cache.warm_fraction > shrunk
+    assert cache.nbytes <= cache.max_bytes
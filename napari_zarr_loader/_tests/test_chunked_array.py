@@ -0,0 +1,69 @@
+import time
+import numpy as np
+import zarr
+from napari_zarr_loader.chunked_array import ChunkedArray, OCCUPANCY_NAME, open_chunked, to_dask
+from napari_zarr_loader.statistics import min_max
+
+
+class CountingStore(zarr.storage.MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = []
+
+    def __getitem__(self, key):
+        self.reads.append(key)
+        return super().__getitem__(key)
+
+
+def make_sparse_group():
+    store = CountingStore()
+    group = zarr.group(store=store)
+    data = np.zeros((8, 8, 8), dtype='uint16')
+    data[:4, :4, :4] = np.arange(64, dtype='uint16').reshape(4, 4, 4) + 10
+    group.create_dataset('Data', data=data, chunks=(4, 4, 4), write_empty_chunks=False)
+    occupancy = np.zeros((2, 2, 2), dtype='uint8')
+    occupancy[0, 0, 0] = 1
+    group.create_dataset(OCCUPANCY_NAME, data=occupancy)
+    return group, store, data
+
+
+def test_getitem_matches_zarr():
+    group, store, data = make_sparse_group()
+    chunked = open_chunked(group)
+    np.testing.assert_array_equal(chunked[...], data)
+    np.testing.assert_array_equal(chunked[2, 1:7, ::3], data[2, 1:7, ::3])
+    np.testing.assert_array_equal(chunked[-1], data[-1])
+
+
+def test_empty_chunks_are_not_read():
+    group, store, data = make_sparse_group()
+    chunked = open_chunked(group)
+    store.reads.clear()
+    np.testing.assert_array_equal(chunked[4:, 4:, :], 0)
+    np.testing.assert_array_equal(to_dask(chunked)[6].compute(), data[6])
+    assert not [key for key in store.reads if key.startswith('Data/')]
+
+
+def test_min_max_uses_occupancy():
+    group, store, data = make_sparse_group()
+    chunked = open_chunked(group)
+    store.reads.clear()
+    assert min_max(chunked) == (0.0, 73.0)
+    assert [key for key in store.reads if key.startswith('Data/') and not key.endswith('.zarray')] == ['Data/0.0.0']
+
+
+def test_min_max_without_occupancy():
+    group, store, data = make_sparse_group()
+    assert min_max(ChunkedArray(group['Data'])) == (0.0, 73.0)
+
+
+def test_dask_name_changes_when_store_is_rewritten(tmp_path):
+    path = str(tmp_path / 'volume.zarr')
+    array = zarr.open(path, mode='w', shape=(8, 8), chunks=(4, 4), dtype='uint16')
+    array[:] = 1
+    name = to_dask(ChunkedArray(zarr.open(path, mode='r'))).name
+    assert to_dask(ChunkedArray(zarr.open(path, mode='r'))).name == name
+    time.sleep(0.01)
+    # Same layout, new chunk contents
+    array[:4, :4] = 2
+    assert to_dask(ChunkedArray(zarr.open(path, mode='r'))).name != name
@@ -0,0 +1,51 @@
+import numpy as np
+import zarr
+from napari_zarr_loader.chunked_array import ChunkedArray, to_dask
+from napari_zarr_loader.coalesce import coalesced_chunks, merge_ranges
+from napari_zarr_loader.storage import ZipChunkStore
+
+
+class BatchCountingStore(zarr.storage.MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def getitems(self, keys, *, contexts):
+        self.batches.append(list(keys))
+        return {key: self[key] for key in keys if key in self}
+
+
+def test_merge_ranges():
+    merged = merge_ranges([(100, 10), (0, 50), (50, 50), (10**6, 5)], max_gap=0)
+    assert merged == [(0, 110, [1, 2, 0]), (10**6, 5, [3])]
+
+
+def test_coalesced_chunks():
+    assert coalesced_chunks((64, 1024, 1024), (16, 128, 128), 2, 16 * 128 * 1024 * 2) == (16, 128, 1024)
+    assert coalesced_chunks((64, 100, 100), (16, 32, 32), 2, 2**30) == (16, 100, 100)
+
+
+def test_plane_is_fetched_in_one_batch():
+    store = BatchCountingStore()
+    data = np.arange(8 * 64 * 64, dtype='uint16').reshape(8, 64, 64)
+    zarr.array(data, chunks=(4, 16, 16), store=store)
+    chunked = ChunkedArray(zarr.open_array(store, mode='r'))
+
+    np.testing.assert_array_equal(chunked[5], data[5])
+    assert len(store.batches) == 1 and len(store.batches[0]) == 16
+
+
+def test_zip_store_ranged_reads(tmp_path):
+    path = str(tmp_path / 'sample.zarr.zip')
+    data = np.random.randint(0, 1000, (8, 64, 64)).astype('uint16')
+    with zarr.ZipStore(path, mode='w') as store:
+        zarr.array(data, chunks=(4, 16, 16), store=store)
+
+    store = ZipChunkStore(path)
+    keys = [f'1.{y}.{x}' for y in range(4) for x in range(4)] + ['missing']
+    values = store.getitems(keys, contexts={})
+    assert sorted(values) == sorted(keys[:-1])
+    assert all(values[key] == store[key] for key in values)
+
+    array = zarr.open_array(store, mode='r')
+    np.testing.assert_array_equal(to_dask(ChunkedArray(array))[5:7].compute(), data[5:7])
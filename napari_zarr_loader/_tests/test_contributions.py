@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import pytest
+from npe2 import PluginManifest
+import napari_zarr_loader
+from napari_zarr_loader import paths
+from napari_zarr_loader.contributions import napari_get_reader, read_ims, read_zarr
+
+MANIFEST = os.path.join(os.path.dirname(napari_zarr_loader.__file__), 'napari.yaml')
+
+
+def test_manifest_commands_resolve():
+    manifest = PluginManifest.from_file(MANIFEST)
+    names = {command.python_name for command in manifest.contributions.commands}
+    assert 'napari_zarr_loader.contributions:napari_get_reader' in names
+    assert manifest.contributions.readers[0].accepts_directories
+
+
+def test_sniffing_is_path_only(tmp_path):
+    (tmp_path / 'volume.zarr' / 'DataSet').mkdir(parents=True)
+    (tmp_path / 'volume.zarr' / 'DataSet' / '.zgroup').write_text('{"zarr_format": 2}')
+    (tmp_path / 'volume.ims').write_bytes(b'')
+    assert napari_get_reader(str(tmp_path / 'volume.zarr')) is read_zarr
+    assert napari_get_reader(str(tmp_path / 'volume.ims')) is read_ims
+    assert napari_get_reader('https://example.org/volume.zarr/') is read_zarr
+    assert napari_get_reader(str(tmp_path / 'missing.zarr')) is None
+    assert napari_get_reader(['a.zarr', 'b.zarr']) is None
+
+
+def test_import_does_not_load_heavy_modules(tmp_path):
+    code = ("import sys, napari_zarr_loader; napari_zarr_loader.napari_get_reader(sys.argv[1]); "
+            "print(','.join(m for m in ('zarr', 'dask', 'numpy', 'h5py', 'napari', 'magicgui') if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(napari_zarr_loader.__file__)))
+    result = subprocess.run([sys.executable, '-c', code, str(tmp_path)], capture_output=True, text=True, env=env,
+                            check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_store_layouts(tmp_path, monkeypatch):
+    import zarr
+    from napari_zarr_loader.reader import zarr_reader
+    from napari_zarr_loader.synthetic import make_volume
+    ims = make_volume(str(tmp_path / 'ims.zarr.zip'), shape=(8, 16, 16), chunks=(8, 16, 16), levels=1)
+    ngff = zarr.open_group(str(tmp_path / 'ngff.zarr'), mode='w')
+    ngff.attrs['multiscales'] = [{'datasets': []}]
+    zarr.open_array(str(tmp_path / 'array.zarr'), mode='w', shape=(4, 4), dtype='u1')
+    zarr.open_group(str(tmp_path / 'other.zarr'), mode='w').create_group('Images')
+
+    assert paths.store_layout(ims) == paths.IMS_LAYOUT
+    assert paths.store_layout(str(tmp_path / 'ngff.zarr')) == paths.NGFF_LAYOUT
+    # Plain arrays and unknown hierarchies are left to other readers
+    assert paths.store_layout(str(tmp_path / 'array.zarr')) == paths.ARRAY_LAYOUT
+    assert napari_get_reader(str(tmp_path / 'array.zarr')) is None
+    assert napari_get_reader(str(tmp_path / 'other.zarr')) is None
+
+    # The reader reuses the layout sniffed by napari_get_reader instead of sniffing again
+    monkeypatch.setattr(paths, '_sniff_zip', lambda path: pytest.fail("store sniffed twice"))
+    assert napari_get_reader(ims) is read_zarr
+    assert len(zarr_reader(ims)) == 1
@@ -0,0 +1,77 @@
+import numpy as np
+import zarr
+from napari_zarr_loader import threading_policy
+from napari_zarr_loader.chunked_array import write_occupancy
+from napari_zarr_loader.dirty_regions import DIRTY_ATTR, dirty_regions, update_pyramid, write_region
+from napari_zarr_loader.projections import KINDS, build_projections
+from napari_zarr_loader.pyramid import build_pyramid, downsample_max, downsample_mean
+
+
+def test_update_pyramid_keeps_threading_policy(tmp_path):
+    root = zarr.open(str(tmp_path / 'sample.zarr'), mode='w')
+    root.create_dataset('DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data', data=np.zeros((8, 32, 32), dtype='uint16'),
+                        chunks=(4, 16, 16))
+    build_pyramid(root, target_size=16, workers=2)
+    write_region(root['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0'], (slice(0, 2), slice(0, 4), slice(0, 4)), 80)
+
+    threading_policy.configure_threading(threading_policy.INTERACTIVE)
+    assert update_pyramid(root) == 1
+    assert threading_policy.active_mode() == threading_policy.INTERACTIVE
+
+
+def test_update_pyramid_recomputes_only_dirty_chunks(tmp_path):
+    root = zarr.open(str(tmp_path / 'sample.zarr'), mode='w')
+    data = np.zeros((8, 64, 64), dtype='uint16')
+    root.create_dataset('DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data', data=data, chunks=(4, 16, 16))
+    dataset = root['DataSet']
+    group0 = dataset['ResolutionLevel 0/TimePoint 0/Channel 0']
+    write_occupancy(group0, np.zeros((2, 4, 4), dtype=bool))
+    build_pyramid(root, target_size=16, workers=2)
+
+    write_region(group0, (slice(0, 2), slice(40, 44), slice(40, 44)), 80)
+    assert dirty_regions(group0) == [(slice(0, 2), slice(40, 44), slice(40, 44))]
+
+    # One chunk per coarse level covers the edit
+    assert update_pyramid(root, workers=2) == 2
+    group0 = dataset['ResolutionLevel 0/TimePoint 0/Channel 0']
+    assert DIRTY_ATTR not in group0.attrs
+
+    level0 = group0['Data'][...]
+    level1 = dataset['ResolutionLevel 1/TimePoint 0/Channel 0/Data'][...]
+    level2 = dataset['ResolutionLevel 2/TimePoint 0/Channel 0/Data'][...]
+    np.testing.assert_array_equal(level1, downsample_mean(level0, (2, 2, 2)))
+    np.testing.assert_array_equal(level2, downsample_mean(level1, (2, 2, 2)))
+    assert group0['ChunkOccupancy'][...].sum() == 1
+    assert dataset['ResolutionLevel 2/TimePoint 0/Channel 0/ChunkOccupancy'][...].sum() == 1
+
+    # Clearing the edit removes the coarse chunks again
+    write_region(group0, (slice(0, 2), slice(40, 44), slice(40, 44)), 0)
+    update_pyramid(root, workers=2)
+    assert dataset['ResolutionLevel 1/TimePoint 0/Channel 0/Data'].nchunks_initialized == 0
+    assert dataset['ResolutionLevel 1/TimePoint 0/Channel 0/ChunkOccupancy'][...].sum() == 0
+
+
+def test_update_pyramid_refreshes_projections(tmp_path):
+    root = zarr.open(str(tmp_path / 'sample.zarr'), mode='w')
+    data = np.zeros((8, 64, 64), dtype='uint16')
+    root.create_dataset('DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data', data=data, chunks=(4, 16, 16))
+    build_pyramid(root, target_size=16, workers=2)
+    build_projections(root, KINDS, target_size=16, workers=2)
+    group0 = root['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0']
+
+    write_region(group0, (slice(0, 2), slice(40, 44), slice(40, 44)), 80)
+    update_pyramid(root, workers=2)
+    level0 = group0['Data'][...]
+    projections = root['Projections']
+    np.testing.assert_array_equal(projections['Max Z/ResolutionLevel 0/TimePoint 0/Channel 0/Data'][...],
+                                  level0.max(axis=0))
+    np.testing.assert_allclose(projections['Mean X/ResolutionLevel 0/TimePoint 0/Channel 0/Data'][...],
+                               level0.mean(axis=2), rtol=1e-6)
+    np.testing.assert_array_equal(projections['Max Z/ResolutionLevel 1/TimePoint 0/Channel 0/Data'][...],
+                                  downsample_max(level0.max(axis=0), (2, 2)))
+
+    # Clearing the edit removes the projection chunks again
+    write_region(group0, (slice(0, 2), slice(40, 44), slice(40, 44)), 0)
+    update_pyramid(root, workers=2)
+    assert projections['Max Z/ResolutionLevel 0/TimePoint 0/Channel 0/Data'].nchunks_initialized == 0
+
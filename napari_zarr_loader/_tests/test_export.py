@@ -0,0 +1,72 @@
+import os
+import zipfile
+import numpy as np
+import pytest
+import zarr
+from numcodecs import blosc
+from napari.components import ViewerModel
+from napari_zarr_loader import contributions, threading_policy
+from napari_zarr_loader.export import export_region, main, parse_box, tifffile
+from napari_zarr_loader.roi_widget import export_roi
+from napari_zarr_loader.synthetic import make_ims_file, make_volume
+
+LEVEL0 = 'DataSet/ResolutionLevel 0/TimePoint 0/Channel {}/Data'
+
+
+def test_parse_box():
+    assert parse_box(':,100:300,4:') == (slice(None, None), slice(100, 300), slice(4, None))
+    with pytest.raises(ValueError):
+        parse_box('0,1:2')
+
+
+def test_export_zarr_with_pyramid(tmp_path):
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32), channels=2, sparsity=0.3)
+    output = str(tmp_path / 'region.zarr.zip')
+    main([path, output, '--channels', '1', '--box', '2:14,10:50,:', '--chunks', '8,16,16',
+          '--pyramid', '--target-size', '8', '--workers', '2'])
+
+    source = zarr.open(path, mode='r')
+    layers = contributions.read_zarr(output)
+    assert len(layers) == 1
+    data, meta = layers[0]
+    np.testing.assert_array_equal(np.asarray(data), source[LEVEL0.format(1)][2:14, 10:50, :])
+    assert meta['metadata']['resolutionLevels'] > 1
+    # The region keeps the voxel size of the source
+    assert meta['scale'] == pytest.approx([1.0, 1.0, 1.0])
+    assert zarr.open(output, mode='r')[LEVEL0.format(1)].chunks == (8, 16, 16)
+
+
+def test_export_keeps_threading_policy(tmp_path):
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(8, 32, 32), chunks=(8, 16, 16))
+    threading_policy.configure_threading(threading_policy.INTERACTIVE)
+    nthreads, use_threads = blosc.get_nthreads(), blosc.use_threads
+    export_region(path, str(tmp_path / 'region.zarr.zip'), workers=2)
+    assert threading_policy.active_mode() == threading_policy.INTERACTIVE
+    assert (blosc.get_nthreads(), blosc.use_threads) == (nthreads, use_threads)
+    # One attribute update, so the zip container holds a single .zattrs per group
+    names = zipfile.ZipFile(str(tmp_path / 'region.zarr.zip')).namelist()
+    assert len(names) == len(set(names))
+
+
+@pytest.mark.skipif(tifffile is None, reason="tifffile is not installed")
+def test_export_ims_to_tiff(tmp_path):
+    path = make_ims_file(str(tmp_path / 'volume.ims'), shape=(12, 32, 32), chunks=(8, 16, 16), channels=2)
+    output = str(tmp_path / 'planes')
+    assert export_region(path, output, level=1, channels=[0], output_format='tiff', workers=2) == (6, 16, 16)
+    names = sorted(os.listdir(output))
+    assert names == [f'Channel0_Z{z:05d}.tif' for z in range(6)]
+    data = contributions.read_ims(path, resolution_level=1)[0][0]
+    np.testing.assert_array_equal(tifffile.imread(os.path.join(output, names[3])), np.asarray(data[3]))
+
+
+def test_export_from_viewer(tmp_path):
+    viewer = ViewerModel()
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32), levels=3, channels=2)
+    for data, meta in contributions.read_zarr(path, resolution_level=2):
+        viewer.add_image(data, **meta)
+    output = str(tmp_path / 'region.zarr')
+    # A box drawn on the coarse level, exported at full resolution
+    assert export_roi(viewer, ([0.0, 0.0], [31.0, 15.0]), output, 0, ('layer', 'Channel 0')) == (16, 32, 16)
+    exported = zarr.open(output, mode='r')
+    assert list(exported['DataSet/ResolutionLevel 0/TimePoint 0']) == ['Channel 0']
+    np.testing.assert_array_equal(exported[LEVEL0.format(0)][:], zarr.open(path, mode='r')[LEVEL0.format(0)][:, :32, :16])
@@ -0,0 +1,43 @@
+import zarr
+from napari_zarr_loader.hierarchy import build_index, cached_index, hierarchy_index
+from napari_zarr_loader.reader import zarr_reader
+
+
+def write_levels(path, shapes, channels=2):
+    dataset = zarr.open_group(path, mode='w').create_group('DataSet')
+    for level, shape in enumerate(shapes):
+        for c in range(channels):
+            dataset.zeros(f'ResolutionLevel {level}/TimePoint 0/Channel {c}/Data', shape=shape, chunks=shape, dtype='u1')
+    return dataset
+
+
+def test_levels_are_ordered_numerically(tmp_path):
+    shapes = [(2 ** (12 - level),) * 2 for level in range(12)]
+    dataset = write_levels(str(tmp_path / 'volume.zarr'), shapes, channels=11)
+    index = build_index(dataset)
+    assert index.levels == tuple(range(12))
+    assert index.channels == tuple(range(11))
+    assert index.level_shape(10) == (4, 4)
+    assert index.channel_paths(10)[10] == 'ResolutionLevel 10/TimePoint 0/Channel 10'
+
+    layers = zarr_reader(str(tmp_path / 'volume.zarr'), resolution_level=10)
+    assert len(layers) == 11 and layers[0][0].shape == (4, 4)
+
+
+def test_levels_not_coarser_are_dropped(tmp_path):
+    dataset = write_levels(str(tmp_path / 'volume.zarr'), [(64, 64), (32, 32), (32, 32), (8, 8)])
+    assert build_index(dataset).levels == (0, 1)
+
+
+def test_index_is_cached_per_store(tmp_path):
+    path = str(tmp_path / 'volume.zarr')
+    dataset = write_levels(path, [(64, 64), (32, 32)])
+    index = hierarchy_index(dataset, path)
+    assert hierarchy_index(dataset, path) is index
+    assert cached_index(path) is index
+
+    # Adding a level changes the store signature
+    dataset.zeros('ResolutionLevel 2/TimePoint 0/Channel 0/Data', shape=(16, 16), dtype='u1')
+    dataset.zeros('ResolutionLevel 2/TimePoint 0/Channel 1/Data', shape=(16, 16), dtype='u1')
+    assert cached_index(path) is None
+    assert len(hierarchy_index(dataset, path)) == 3
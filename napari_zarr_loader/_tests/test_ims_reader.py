@@ -0,0 +1,79 @@
+import h5py
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from napari_zarr_loader import instrumentation, napari_get_reader
+from napari_zarr_loader.chunk_cache import get_chunk_cache
+from napari_zarr_loader.contributions import read_ims
+from napari_zarr_loader.ims_reader import open_file
+from napari_zarr_loader.synthetic import make_ims_file
+
+
+def ims_chars(value):
+    """Imaris stores attributes as arrays of single characters."""
+    return np.array(list(str(value)), dtype='S1')
+
+
+def write_ims(path, histogram=True):
+    data = np.arange(10 * 20 * 30, dtype='uint16').reshape(10, 20, 30)
+    with h5py.File(path, 'w') as f:
+        for level, step in enumerate((1, 2)):
+            group = f.create_group(f'DataSet/ResolutionLevel {level}/TimePoint 0/Channel 0')
+            level_data = data[::step, ::step, ::step]
+            # Imaris pads the datasets up to whole chunks
+            padded = np.zeros(tuple(-(-n // 8) * 8 for n in level_data.shape), dtype='uint16')
+            padded[tuple(slice(0, n) for n in level_data.shape)] = level_data
+            group.create_dataset('Data', data=padded, chunks=(8, 8, 8))
+            for axis, n in zip('ZYX', level_data.shape):
+                group.attrs[f'ImageSize{axis}'] = ims_chars(n)
+            if histogram:
+                group.attrs['HistogramMin'] = ims_chars(float(level_data.min()))
+                group.attrs['HistogramMax'] = ims_chars(float(level_data.max()))
+        info = f.create_group('DataSetInfo/Image')
+        for i, extent in enumerate((60.0, 40.0, 20.0)):
+            info.attrs[f'ExtMin{i}'] = ims_chars(0)
+            info.attrs[f'ExtMax{i}'] = ims_chars(extent)
+    return data
+
+
+def test_ims_reader(tmp_path):
+    path = str(tmp_path / 'sample.ims')
+    data = write_ims(path)
+    reader = napari_get_reader(path)
+    assert reader is read_ims
+
+    layers = reader(path)
+    assert len(layers) == 1
+    array, meta = layers[0]
+    assert array.shape == (10, 20, 30)
+    np.testing.assert_array_equal(array[3].compute(), data[3])
+    # From the histogram range of the full-resolution channel
+    assert meta['contrast_limits'] == [0.0, float(data.max())]
+    assert meta['scale'] == [2.0, 2.0, 2.0]
+    assert meta['metadata']['resolutionLevels'] == 2
+
+    coarse, _ = reader(path, resolution_level=1)[0]
+    np.testing.assert_array_equal(coarse.compute(), data[::2, ::2, ::2])
+
+
+def test_file_handles_are_per_thread(tmp_path):
+    path = str(tmp_path / 'sample.ims')
+    write_ims(path)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        handles = set(executor.map(lambda _: id(open_file(path)), range(8)))
+    assert id(open_file(path)) not in handles
+
+
+def test_contrast_limits_read_coarsest_level(tmp_path):
+    path = make_ims_file(str(tmp_path / 'volume.ims'), shape=(64, 256, 256), chunks=(16, 64, 64), levels=2)
+    get_chunk_cache().clear()
+    instrumentation.disable()
+    recorder = instrumentation.enable()
+    try:
+        (data, meta), = read_ims(path)
+    finally:
+        instrumentation.disable()
+    # Without histogram attributes only the 8 chunks of level 1 are read, not the 64 of level 0
+    assert recorder.counters['cache_misses'] == 8
+    coarse = read_ims(path, resolution_level=1)[0][0].compute()
+    assert meta['contrast_limits'] == [float(coarse.min()), float(coarse.max())]
+
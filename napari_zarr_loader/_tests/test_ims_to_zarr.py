@@ -0,0 +1,47 @@
+import h5py
+import numpy as np
+import zarr
+import ims_to_zarr
+from napari_zarr_loader.chunked_array import OCCUPANCY_NAME
+from napari_zarr_loader.reader import zarr_reader
+
+
+def write_ims(path, shape=(16, 32, 32), channels=2):
+    """Writes a minimal sparse IMS-layout HDF5 file with one resolution level."""
+    data = np.zeros(shape, dtype='uint16')
+    data[:4, :8, :8] = 100
+    data[8, 20, 20] = 7
+    with h5py.File(path, 'w') as f:
+        for c in range(channels):
+            f.create_dataset(f'DataSet/ResolutionLevel 0/TimePoint 0/Channel {c}/Data', data=data + c, chunks=(4, 16, 16))
+    return data
+
+
+def test_convert_skips_empty_chunks(tmp_path):
+    ims_path, zarr_path = str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr')
+    data = write_ims(ims_path)
+    ims_to_zarr.main(ims_path, zarr_path, workers=2)
+
+    channel = zarr.open(zarr_path, mode='r')['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0']
+    occupancy = channel[OCCUPANCY_NAME][...]
+    assert 0 < occupancy.sum() < occupancy.size
+    assert channel['Data'].nchunks_initialized == occupancy.sum()
+    np.testing.assert_array_equal(channel['Data'][...], data)
+
+    layers = zarr_reader(zarr_path)
+    assert len(layers) == 2
+    np.testing.assert_array_equal(np.asarray(layers[0][0]), data)
+    assert layers[0][1]['contrast_limits'] == [0.0, 100.0]
+    assert layers[1][1]['contrast_limits'] == [1.0, 101.0]
+
+
+def test_convert_with_compressor_and_chunks(tmp_path):
+    ims_path, zarr_path = str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr')
+    data = write_ims(ims_path, channels=1)
+    ims_to_zarr.main(ims_path, zarr_path, workers=2, chunks=(8, 32, 32),
+                     compressor=ims_to_zarr.parse_compressor('none'))
+
+    array = zarr.open(zarr_path, mode='r')['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data']
+    assert array.chunks == (8, 32, 32)
+    assert array.compressor is None
+    np.testing.assert_array_equal(array[...], data)
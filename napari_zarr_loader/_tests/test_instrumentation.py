@@ -0,0 +1,51 @@
+import json
+import pytest
+from napari_zarr_loader import instrumentation
+from napari_zarr_loader.chunk_cache import get_chunk_cache
+from napari_zarr_loader.reader import zarr_reader
+from napari_zarr_loader.synthetic import make_volume
+
+
+@pytest.fixture
+def recorder():
+    instrumentation.disable()
+    yield instrumentation.enable()
+    instrumentation.disable()
+
+
+def test_disabled_records_nothing():
+    instrumentation.disable()
+    assert instrumentation.span('anything', n=1) is instrumentation._NULL_SPAN
+    instrumentation.count('bytes_read', 10)
+    assert not instrumentation.is_enabled()
+
+
+def test_reader_spans_and_counters(tmp_path, recorder):
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32), sparsity=0.3)
+    get_chunk_cache().clear()
+    data = zarr_reader(path)[0][0]
+    data[4].compute()
+    data[4].compute()
+
+    names = {event[0] for event in recorder.events}
+    assert {'zarr_reader', 'open_store', 'metadata_walk', 'statistics', 'log'} <= names
+    assert recorder.counters['cache_hits'] > 0
+    # Chunks fetched for the first plane are decoded once, then answered by the cache
+    assert recorder.counters['chunks_decoded'] == recorder.counters['cache_misses']
+    assert recorder.counters['bytes_read'] > 0
+
+    trace = json.loads(json.dumps(instrumentation.chrome_trace(recorder)))
+    phases = {event['ph'] for event in trace['traceEvents']}
+    assert phases == {'X', 'i', 'C'}
+    table = instrumentation.format_summary(recorder)
+    assert 'zarr_reader' in table and 'cache_hits' in table
+
+
+def test_traced_decorator(recorder):
+    @instrumentation.traced('work')
+    def work(x):
+        return x * 2
+
+    assert work(3) == 6
+    rows = instrumentation.summary(recorder)
+    assert rows[0][:2] == ('work', 1)
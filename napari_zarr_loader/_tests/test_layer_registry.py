@@ -0,0 +1,68 @@
+from napari.components import ViewerModel
+from napari_zarr_loader import contributions, instrumentation
+from napari_zarr_loader.layer_registry import LayerRegistry
+from napari_zarr_loader.resolution_change_widget import reload_layers
+from napari_zarr_loader.synthetic import make_ims_file, make_volume
+
+
+def open_volumes(tmp_path):
+    viewer = ViewerModel()
+    paths = []
+    for name in ('a', 'b'):
+        path = make_volume(str(tmp_path / f'{name}.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32), levels=3, channels=2)
+        for data, meta in contributions.read_zarr(path):
+            meta['name'] = f"{name} {meta['name']}"
+            viewer.add_image(data, **meta)
+        paths.append(path)
+    return viewer, paths
+
+
+def test_switch_one_file(tmp_path):
+    viewer, (a, b) = open_volumes(tmp_path)
+    registry = LayerRegistry(viewer)
+    assert registry.files() == [a, b]
+    assert [entry.channel for entry in registry.select(file=b)] == [0, 1]
+
+    assert reload_layers(viewer, 2, ('file', a)) == 2
+    assert viewer.layers['a Channel 1'].data.shape == (4, 16, 16)
+    assert viewer.layers['b Channel 1'].data.shape == (16, 64, 64)
+    # The layers keep their physical extent
+    assert tuple(viewer.layers['a Channel 1'].scale) == (4.0, 4.0, 4.0)
+    assert len(viewer.layers) == 4
+
+
+def test_switch_one_layer_reads_only_changed(tmp_path, monkeypatch):
+    viewer, (a, b) = open_volumes(tmp_path)
+    assert reload_layers(viewer, 1, ('layer', 'b Channel 0')) == 1
+    assert viewer.layers['b Channel 0'].metadata['resolutionLevel'] == 1
+    assert viewer.layers['b Channel 1'].metadata['resolutionLevel'] == 0
+
+    reads = []
+    monkeypatch.setattr(contributions, 'read_zarr', lambda path, resolution_level=0: reads.append(path))
+    monkeypatch.setitem(contributions.READERS, 'zarr', contributions.read_zarr)
+    # Layers already at the requested level are not read again
+    assert reload_layers(viewer, 1, ('layer', 'b Channel 0')) == 0
+    assert reads == []
+    assert reload_layers(viewer, 7) == 0
+    assert reads == []
+
+
+def test_switch_opens_only_the_channel_arrays(tmp_path, monkeypatch):
+    viewer = ViewerModel()
+    path = make_ims_file(str(tmp_path / 'volume.ims'), shape=(16, 64, 64), chunks=(8, 32, 32), channels=2)
+    for data, meta in contributions.read_ims(path):
+        viewer.add_image(data, **meta)
+    contrast_limits = list(viewer.layers['Channel 1'].contrast_limits)
+
+    # Neither the reader (statistics, projections) nor any chunk is needed to switch levels
+    monkeypatch.setitem(contributions.READERS, 'ims', None)
+    recorder = instrumentation.enable()
+    try:
+        assert reload_layers(viewer, 1, ('layer', 'Channel 1')) == 1
+    finally:
+        instrumentation.disable()
+    assert recorder.counters.get('cache_misses', 0) == 0
+    layer = viewer.layers['Channel 1']
+    assert layer.data.shape == (8, 32, 32)
+    assert list(layer.contrast_limits) == contrast_limits
+    assert tuple(layer.scale) == tuple(2 * s for s in viewer.layers['Channel 0'].scale)
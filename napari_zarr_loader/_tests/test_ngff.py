@@ -0,0 +1,28 @@
+import numpy as np
+import zarr
+import ims_to_zarr
+from napari_zarr_loader import napari_get_reader
+from .test_ims_reader import write_ims
+
+
+def test_convert_to_ngff(tmp_path):
+    ims_path, zarr_path = str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr')
+    data = write_ims(ims_path)
+    ims_to_zarr.main(ims_path, zarr_path, workers=2, output_format='ngff', chunks=(4, 8, 8))
+
+    root = zarr.open(zarr_path, mode='r')
+    multiscales = root.attrs['multiscales'][0]
+    assert [d['path'] for d in multiscales['datasets']] == ['0', '1']
+    assert multiscales['datasets'][1]['coordinateTransformations'][0]['scale'] == [1.0, 1.0, 4.0, 4.0, 4.0]
+    assert root['0'].shape == (1, 1, 10, 20, 30)
+    assert root['0'].chunks == (1, 1, 4, 8, 8)
+    assert root.attrs['omero']['channels'][0]['window']['end'] == float(data.max())
+
+    layers = napari_get_reader(zarr_path)(zarr_path)
+    array, meta = layers[0]
+    np.testing.assert_array_equal(array.compute(), data)
+    assert meta['contrast_limits'] == [0.0, float(data.max())]
+    assert meta['scale'] == [2.0, 2.0, 2.0]
+
+    coarse, coarse_meta = napari_get_reader(zarr_path)(zarr_path, resolution_level=1)[0]
+    np.testing.assert_array_equal(coarse.compute(), data[::2, ::2, ::2])
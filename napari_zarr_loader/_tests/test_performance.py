@@ -0,0 +1,31 @@
+from napari_zarr_loader import instrumentation
+from napari_zarr_loader.chunk_cache import get_chunk_cache
+from napari_zarr_loader.performance import PerformanceMonitor
+from napari_zarr_loader.reader import zarr_reader
+from napari_zarr_loader.synthetic import make_volume
+
+
+def test_monitor_samples_reader_activity(tmp_path):
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32))
+    data = zarr_reader(path)[0][0]
+    get_chunk_cache().clear()
+    instrumentation.disable()
+    monitor = PerformanceMonitor(history=4)
+    monitor.start()
+    try:
+        assert instrumentation.is_enabled()
+        data[4].compute()
+        data[4].compute()
+        sample = monitor.sample()
+        assert sample['latency_ms'] > 0
+        assert sample['throughput_mb_s'] > 0
+        assert sample['hit_ratio'] == 0.5
+        assert sample['memory_mb'] > 0
+
+        # Nothing happened since the previous sample
+        idle = monitor.sample()
+        assert idle['latency_ms'] == 0 and idle['hit_ratio'] is None
+        assert len(monitor.samples) == 2
+    finally:
+        monitor.stop()
+    assert not instrumentation.is_enabled()
@@ -0,0 +1,60 @@
+import numpy as np
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+import ims_to_zarr
+from napari_zarr_loader import napari_get_reader, threading_policy
+from napari_zarr_loader.chunked_array import ChunkedArray
+from napari_zarr_loader.projections import build_projection, build_projections
+from napari_zarr_loader.synthetic import make_volume
+from .test_ims_reader import write_ims
+
+
+def test_projection_chunks_match_numpy():
+    data = np.random.randint(0, 1000, (20, 24, 40)).astype('uint16')
+    group = zarr.group()
+    source = ChunkedArray(group.create_dataset('Data', data=data, chunks=(8, 8, 16)))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for axis in range(3):
+            target = build_projection(source, group.require_group(f'max{axis}'), axis, 'max', executor, 2)
+            np.testing.assert_array_equal(target[:], data.max(axis=axis))
+        target = build_projection(source, group.require_group('mean'), 0, 'mean', executor, 2)
+        np.testing.assert_allclose(target[:], data.mean(axis=0), rtol=1e-6)
+
+
+def test_reader_exposes_projections(tmp_path):
+    write_ims(str(tmp_path / 'sample.ims'))
+    ims_to_zarr.main(str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr'), workers=2,
+                     projections=True, mean_projections=True, target_size=8)
+    volume = zarr.open(str(tmp_path / 'sample.zarr'), mode='r')['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data'][:]
+
+    layers = napari_get_reader(str(tmp_path / 'sample.zarr'))(str(tmp_path / 'sample.zarr'))
+    projections = {meta['name']: (data, meta) for data, meta in layers[1:]}
+    assert sorted(projections) == ['Channel 0 Max X', 'Channel 0 Max Y', 'Channel 0 Max Z',
+                                   'Channel 0 Mean X', 'Channel 0 Mean Y', 'Channel 0 Mean Z']
+    data, meta = projections['Channel 0 Max Z']
+    assert meta['multiscale'] and len(data) > 1 and len(meta['scale']) == 2
+    np.testing.assert_array_equal(data[0].compute(), volume.max(axis=0))
+    np.testing.assert_allclose(projections['Channel 0 Mean Y'][0][0].compute(), volume.mean(axis=1), rtol=1e-6)
+
+
+def test_build_projections_keeps_threading_policy(tmp_path):
+    root = zarr.open(make_volume(str(tmp_path / 'volume.zarr'), shape=(8, 32, 32), chunks=(8, 16, 16)), mode='r+')
+    threading_policy.configure_threading(threading_policy.INTERACTIVE)
+    build_projections(root, target_size=16)
+    assert threading_policy.active_mode() == threading_policy.INTERACTIVE
+
+
+def test_projection_scale_at_coarse_levels(tmp_path):
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32), levels=3)
+    root = zarr.open(path, mode='r+')
+    build_projections(root, target_size=16, workers=2)
+    zarr.consolidate_metadata(root.store)
+
+    # Projection level 0 is full resolution whatever level the volume opens at
+    for level, scale in ((0, 1.0), (2, 4.0)):
+        layers = napari_get_reader(path)(path, resolution_level=level)
+        assert list(layers[0][1]['scale']) == [scale] * 3
+        projections = {meta['name']: (data, meta) for data, meta in layers[1:]}
+        data, meta = projections['Channel 0 Max Z']
+        assert data[0].shape == (64, 64)
+        assert meta['scale'] == (1.0, 1.0)
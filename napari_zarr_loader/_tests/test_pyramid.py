@@ -0,0 +1,43 @@
+import numpy as np
+import zarr
+from napari_zarr_loader import threading_policy
+from napari_zarr_loader.pyramid import build_pyramid, downsample_mean, downsample_mode, numbered_keys
+from napari_zarr_loader.reader import zarr_reader
+
+
+def test_downsample_mean_and_mode():
+    block = np.array([[1, 3, 5], [1, 3, 5]], dtype='uint16')
+    np.testing.assert_array_equal(downsample_mean(block, (2, 2)), [[2, 5]])
+    labels = np.array([[7, 7, 2, 2], [1, 7, 2, 3]], dtype='uint32')
+    np.testing.assert_array_equal(downsample_mode(labels, (2, 2)), [[7, 2]])
+
+
+def test_build_pyramid_keeps_threading_policy(tmp_path):
+    root = zarr.open(str(tmp_path / 'sample.zarr'), mode='w')
+    root.create_dataset('DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data', data=np.ones((8, 32, 32), dtype='uint16'),
+                        chunks=(4, 16, 16))
+    threading_policy.configure_threading(threading_policy.INTERACTIVE)
+    assert build_pyramid(root, target_size=16) == 1
+    assert threading_policy.active_mode() == threading_policy.INTERACTIVE
+
+
+def test_build_pyramid(tmp_path):
+    root = zarr.open(str(tmp_path / 'sample.zarr'), mode='w')
+    data = np.zeros((8, 64, 64), dtype='uint16')
+    data[:, :16, :16] = 40
+    for c in range(2):
+        root.create_dataset(f'DataSet/ResolutionLevel 0/TimePoint 0/Channel {c}/Data', data=data,
+                            chunks=(4, 16, 16))
+
+    assert build_pyramid(root, target_size=8, workers=2) == 3
+    dataset = root['DataSet']
+    assert numbered_keys(dataset, 'ResolutionLevel ') == [f'ResolutionLevel {i}' for i in range(4)]
+    level1 = dataset['ResolutionLevel 1/TimePoint 0/Channel 1']
+    assert level1['Data'].shape == (4, 32, 32)
+    np.testing.assert_array_equal(level1['Data'][...], data[::2, ::2, ::2])
+    assert level1['ChunkOccupancy'][...].sum() == 1
+    assert dataset['ResolutionLevel 3/TimePoint 0/Channel 0/Data'].shape == (1, 8, 8)
+
+    layers = zarr_reader(str(tmp_path / 'sample.zarr'), resolution_level=3)
+    assert layers[0][0].shape == (1, 8, 8)
+    assert layers[0][1]['metadata']['resolutionLevels'] == 4
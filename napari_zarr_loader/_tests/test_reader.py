@@ -1,22 +1,24 @@
-import os
+import dask.array as da
 from napari_zarr_loader import napari_get_reader
+from napari_zarr_loader.synthetic import make_volume
 
 
 # tmp_path is a pytest fixture
-def test_reader(tmp_path='brain_crop3.zarr'):
+def test_reader(tmp_path):
     """An example of how you might test your plugin."""
-    
-    path = os.path.join(os.path.dirname(os.path.realpath(__file__)),tmp_path)
+
+    path = make_volume(str(tmp_path / 'brain_crop3.zarr'), shape=(32, 64, 64), chunks=(16, 32, 32),
+                       levels=2, channels=2, sparsity=0.5)
     # Test whether we get a callable reader function
-    #reader = napari_get_reader('/path/to/a/fake.zarr')
     reader = napari_get_reader(path)
     assert callable(reader)
 
     # make sure we're delivering the right format
     layer_data = reader(path)
-    assert isinstance(layer_data, list)
+    assert isinstance(layer_data, list) and len(layer_data) == 2
     assert isinstance(layer_data[0], tuple) and len(layer_data[0]) == 2
-    assert isinstance(layer_data[0][0], list) and isinstance(layer_data[0][1], dict)
+    assert isinstance(layer_data[0][0], da.Array) and isinstance(layer_data[0][1], dict)
+    assert layer_data[0][0].shape == (32, 64, 64)
 
 
 def test_get_reader_pass():
@@ -0,0 +1,70 @@
+import functools
+import threading
+import numpy as np
+import pytest
+import zarr
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import ims_to_zarr
+from napari_zarr_loader import napari_get_reader
+from napari_zarr_loader.remote import HTTPStore, close_http_stores, open_remote_store
+from .test_ims_reader import write_ims
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_root(tmp_path):
+    handler = functools.partial(QuietHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield tmp_path, f"http://127.0.0.1:{server.server_address[1]}"
+    close_http_stores()
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_store(http_root):
+    root, url = http_root
+    zarr.array(np.arange(100, dtype='uint16'), chunks=(10,), store=str(root / 'a.zarr'))
+    store = HTTPStore(f"{url}/a.zarr")
+    assert '.zarray' in store and 'missing' not in store
+    with pytest.raises(KeyError):
+        store['missing']
+    values = store.getitems(['0', '5', 'missing'], contexts={})
+    assert sorted(values) == ['0', '5']
+    np.testing.assert_array_equal(zarr.open_array(store, mode='r')[:], np.arange(100))
+    store.close()
+
+
+def test_remote_stores_are_shared(http_root):
+    _, url = http_root
+    store = open_remote_store(f"{url}/a.zarr/")
+    assert open_remote_store(f"{url}/a.zarr") is store
+    close_http_stores()
+    assert open_remote_store(f"{url}/a.zarr") is not store
+
+
+def test_read_converted_volume_over_http(http_root):
+    root, url = http_root
+    data = write_ims(str(root / 'sample.ims'))
+    ims_to_zarr.main(str(root / 'sample.ims'), str(root / 'sample.zarr'), workers=2)
+
+    volume_url = f"{url}/sample.zarr"
+    reader = napari_get_reader(volume_url)
+    assert callable(reader)
+    array, meta = reader(volume_url)[0]
+    np.testing.assert_array_equal(array.compute()[:10, :20, :30], data)
+    assert meta['metadata']['resolutionLevels'] == 2
+
+
+def test_file_url(tmp_path):
+    data = write_ims(str(tmp_path / 'sample.ims'))
+    ims_to_zarr.main(str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr'), workers=2)
+    array, _ = napari_get_reader(f"file://{tmp_path / 'sample.zarr'}")(f"file://{tmp_path / 'sample.zarr'}")[0]
+    np.testing.assert_array_equal(array.compute()[:10, :20, :30], data)
@@ -0,0 +1,54 @@
+import math
+import numpy as np
+import zarr
+from napari.components import ViewerModel
+from napari_zarr_loader import contributions, instrumentation
+from napari_zarr_loader.chunk_cache import get_chunk_cache
+from napari_zarr_loader.layer_registry import LayerRegistry
+from napari_zarr_loader.roi import box_selection, roi_layers
+from napari_zarr_loader.roi_widget import load_roi
+from napari_zarr_loader.synthetic import make_volume
+
+
+def open_coarse(tmp_path):
+    viewer = ViewerModel()
+    path = make_volume(str(tmp_path / 'volume.zarr'), shape=(16, 64, 64), chunks=(8, 32, 32), levels=3, channels=2)
+    for data, meta in contributions.read_zarr(path, resolution_level=2):
+        viewer.add_image(data, **meta)
+    return viewer, path
+
+
+def test_box_selection():
+    assert box_selection(([-math.inf, 2.5], [math.inf, 7.0]), [1, 2], [0, 1], [10, 10]) == (slice(0, 10), slice(0, 4))
+    # Boxes outside the array select nothing
+    assert box_selection(([100.0], [200.0]), [1], [0], [10]) == (slice(10, 10),)
+
+
+def test_roi_reads_only_region_chunks(tmp_path):
+    viewer, path = open_coarse(tmp_path)
+    entries = LayerRegistry(viewer).select(layer_name='Channel 1')
+    get_chunk_cache().clear()
+    instrumentation.disable()
+    recorder = instrumentation.enable()
+    try:
+        (data, meta), = roi_layers(entries, ([4.0, 8.0, 40.0], [11.5, 23.0, 60.0]), 0)
+        region = np.asarray(data)
+    finally:
+        instrumentation.disable()
+
+    expected = zarr.open(path, mode='r')['DataSet/ResolutionLevel 0/TimePoint 0/Channel 1/Data'][4:12, 8:24, 40:61]
+    np.testing.assert_array_equal(region, expected)
+    assert meta['scale'] == [1.0, 1.0, 1.0]
+    assert meta['translate'] == [4.0, 8.0, 40.0]
+    assert meta['metadata']['roi'] == [[4, 12], [8, 24], [40, 61]]
+    # The region overlaps two chunks of the finest level
+    assert recorder.counters['cache_misses'] == 2
+
+
+def test_roi_layers_are_kept_out_of_level_switching(tmp_path):
+    viewer, path = open_coarse(tmp_path)
+    layers = load_roi(viewer, ([0.0, 0.0], [32.0, 32.0]), 1, ('file', path))
+    # Both edges of the box are included
+    assert [layer.data.shape for layer in layers] == [(8, 17, 17), (8, 17, 17)]
+    assert len(LayerRegistry(viewer).entries()) == 2
+    assert load_roi(viewer, ([0.0, 0.0], [32.0, 32.0]), 5) == []
@@ -0,0 +1,98 @@
+import time
+import numpy as np
+import zarr
+import ims_to_zarr
+from napari_zarr_loader import shared_cache
+from napari_zarr_loader.chunk_cache import ChunkCache
+from napari_zarr_loader.chunked_array import ChunkedArray
+from napari_zarr_loader.ims_reader import ImsArray, image_shape, open_file
+from napari_zarr_loader.shared_cache import HEADER_SIZE, SharedChunkCache
+from .test_ims_reader import write_ims
+
+
+def test_chunks_are_shared_between_caches(tmp_path):
+    # Two instances over one directory behave like two processes
+    writer = SharedChunkCache(2**20, str(tmp_path))
+    reader = SharedChunkCache(2**20, str(tmp_path))
+    chunk = np.arange(24, dtype='uint16').reshape(2, 3, 4)
+    writer.put(('a', (0, 1, 2)), chunk)
+
+    cached = reader.get(('a', (0, 1, 2)))
+    np.testing.assert_array_equal(cached, chunk)
+    assert not cached.flags.writeable
+    assert reader.get(('a', (0, 0, 0))) is None and reader.get(('b', (0, 1, 2))) is None
+    assert (reader.hits, reader.misses) == (1, 2)
+
+    # Views stay valid after the chunk was dropped
+    writer.invalidate('a')
+    assert reader.get(('a', (0, 1, 2))) is None
+    np.testing.assert_array_equal(cached, chunk)
+
+
+def test_eviction_bounds_size(tmp_path):
+    chunk = np.zeros(1024, dtype='uint8')
+    cache = SharedChunkCache(8 * (HEADER_SIZE + chunk.nbytes), str(tmp_path))
+    for i in range(40):
+        cache.put(('a', (i,)), chunk)
+    assert len(cache) <= 8
+    assert cache.get(('a', (39,))) is not None
+
+
+def test_backs_process_cache(tmp_path):
+    shared = SharedChunkCache(2**20, str(tmp_path))
+    first, second = ChunkCache(2**20, shared), ChunkCache(2**20, SharedChunkCache(2**20, str(tmp_path)))
+    first.put(('a', (0,)), np.ones(4))
+    np.testing.assert_array_equal(second.get(('a', (0,))), np.ones(4))
+    assert len(second) == 1
+    first.invalidate('a')
+    assert len(shared) == 0
+
+
+def test_converter_and_reader_share_chunks(tmp_path, monkeypatch):
+    shared = SharedChunkCache(2**24, str(tmp_path / 'cache'))
+    monkeypatch.setattr(shared_cache, '_shared_cache', shared)
+    write_ims(str(tmp_path / 'sample.ims'))
+    ims_to_zarr.main(str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr'), workers=2)
+    assert len(shared) > 0
+
+    channel = open_file(str(tmp_path / 'sample.ims'))['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0']
+    array = ImsArray(str(tmp_path / 'sample.ims'), channel['Data'].name, image_shape(channel))
+    chunked = ChunkedArray(array, cache=ChunkCache(2**20, shared))
+    hits = shared.hits
+    chunked.read_chunk((0, 0, 0))
+    assert shared.hits == hits + 1
+
+
+def test_converter_shares_cropped_edge_chunks(tmp_path, monkeypatch):
+    shared = SharedChunkCache(2**24, str(tmp_path / 'cache'))
+    monkeypatch.setattr(shared_cache, '_shared_cache', shared)
+    data = write_ims(str(tmp_path / 'sample.ims'))
+    ims_to_zarr.main(str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr'), workers=2)
+
+    channel = open_file(str(tmp_path / 'sample.ims'))['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0']
+    array = ImsArray(str(tmp_path / 'sample.ims'), channel['Data'].name, image_shape(channel))
+    chunked = ChunkedArray(array, cache=ChunkCache(2**20, shared))
+    # The padded datasets are 16 x 24 x 32, the image 10 x 20 x 30
+    np.testing.assert_array_equal(chunked.read_chunk((1, 2, 3)), data[8:, 16:, 24:])
+
+    # A cached chunk of the wrong shape is read again
+    key = (chunked.key, (1, 0, 0), chunked.version)
+    shared.put(key, np.zeros((8, 8, 8), dtype='uint16'))
+    chunked = ChunkedArray(array, cache=ChunkCache(2**20, shared))
+    np.testing.assert_array_equal(chunked.read_chunk((1, 0, 0)), data[8:, :8, :8])
+    assert zarr.open(str(tmp_path / 'sample.zarr'), mode='r')[
+        'DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data'].shape == (16, 24, 32)
+
+
+def test_rewritten_store_misses_stale_chunks(tmp_path):
+    shared = SharedChunkCache(2**24, str(tmp_path / 'cache'))
+    path = str(tmp_path / 'volume.zarr')
+    zarr.array(np.ones((8, 8), dtype='uint16'), chunks=(4, 4), store=path)
+    first = ChunkedArray(zarr.open(path, mode='r'), cache=ChunkCache(2**20, shared))
+    assert first.read_chunk((0, 0)).max() == 1
+
+    # Converted again to the same path, e.g. by another process
+    time.sleep(0.01)
+    zarr.open(path, mode='w', shape=(8, 8), chunks=(4, 4), dtype='uint16')[:] = 2
+    second = ChunkedArray(zarr.open(path, mode='r'), cache=ChunkCache(2**20, shared))
+    assert second.read_chunk((0, 0)).max() == 2
@@ -0,0 +1,47 @@
+import numpy as np
+import zarr
+import ims_to_zarr
+from napari_zarr_loader.chunked_array import SUMMARY_NAME, ChunkedArray, open_chunked
+from napari_zarr_loader.dirty_regions import write_region
+from napari_zarr_loader.statistics import compute_summary, index_volume, min_max, region_stats
+from .test_chunked_array import CountingStore
+from .test_ims_reader import write_ims
+
+
+def test_region_stats_read_only_boundary_chunks():
+    data = np.random.randint(0, 1000, (8, 64, 64)).astype('uint16')
+    store = CountingStore()
+    array = zarr.array(data, chunks=(4, 16, 16), store=store)
+    chunked = ChunkedArray(array)
+    chunked.summary = compute_summary(chunked)
+    assert min_max(chunked) == (data.min(), data.max())
+
+    store.reads.clear()
+    stats = region_stats(chunked, (slice(0, 8), slice(0, 32), slice(0, 48)))
+    assert not store.reads
+    assert stats['count'] == 8 * 32 * 48
+    assert np.isclose(stats['mean'], data[:, :32, :48].mean())
+
+    region = (slice(1, 7), slice(5, 40), slice(0, 64))
+    stats = region_stats(chunked, region)
+    assert (stats['min'], stats['max'], stats['nonzero']) == (
+        data[region].min(), data[region].max(), np.count_nonzero(data[region]))
+    assert np.isclose(stats['mean'], data[region].mean())
+    # Only chunks cut by the region boundary along Z or Y are read
+    assert len(store.reads) == 2 * 3 * 4
+
+
+def test_converter_writes_summary(tmp_path):
+    data = write_ims(str(tmp_path / 'sample.ims'))
+    ims_to_zarr.main(str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr'), workers=2)
+    root = zarr.open(str(tmp_path / 'sample.zarr'), mode='r+')
+    group = root['DataSet/ResolutionLevel 0/TimePoint 0/Channel 0']
+    summary = group[SUMMARY_NAME][...]
+    assert index_volume(root) == 2
+    np.testing.assert_array_equal(group[SUMMARY_NAME][...], summary)
+
+    chunked = open_chunked(group)
+    assert min_max(chunked) == (0.0, float(data.max()))
+
+    write_region(group, (slice(0, 2), slice(0, 2), slice(0, 2)), 60000)
+    assert min_max(open_chunked(group)) == (0.0, 60000.0)
@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pytest
+import ims_to_zarr
+from napari_zarr_loader import napari_get_reader
+from numcodecs import Blosc
+from napari_zarr_loader.storage import ZipChunkStore, parse_compressor
+from .test_ims_reader import write_ims
+
+
+@pytest.mark.parametrize('output_format', ['ims', 'ngff'])
+def test_zip_container(tmp_path, output_format):
+    ims_path, zip_path = str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr.zip')
+    data = write_ims(ims_path)
+    ims_to_zarr.main(ims_path, zip_path, workers=2, output_format=output_format, pyramid=True, target_size=8)
+    assert os.path.isfile(zip_path)
+
+    store = ZipChunkStore(zip_path)
+    assert '.zmetadata' in store
+
+    reader = napari_get_reader(zip_path)
+    assert callable(reader)
+    array, meta = reader(zip_path)[0]
+    if output_format == 'ngff':
+        np.testing.assert_array_equal(array.compute(), data)
+    else:
+        # The IMS layout keeps the padded datasets
+        np.testing.assert_array_equal(array.compute()[:10, :20, :30], data)
+        assert meta['metadata']['resolutionLevels'] == 3
+
+
+def test_directory_output_is_consolidated(tmp_path):
+    ims_path, zarr_path = str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr')
+    write_ims(ims_path)
+    ims_to_zarr.main(ims_path, zarr_path, workers=2)
+    assert os.path.isfile(os.path.join(zarr_path, '.zmetadata'))
+    assert len(napari_get_reader(zarr_path)(zarr_path)) == 1
+
+
+def test_parse_compressor():
+    assert parse_compressor('none') is None
+    assert parse_compressor('default') == 'default'
+    compressor = parse_compressor('zstd:7:bitshuffle')
+    assert (compressor.cname, compressor.clevel, compressor.shuffle) == ('zstd', 7, Blosc.BITSHUFFLE)
+    with pytest.raises(ValueError):
+        parse_compressor('gzip')
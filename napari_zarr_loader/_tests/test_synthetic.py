@@ -0,0 +1,33 @@
+import numpy as np
+import zarr
+import ims_to_zarr
+from napari_zarr_loader import napari_get_reader
+from napari_zarr_loader.chunked_array import OCCUPANCY_NAME, SUMMARY_NAME
+from napari_zarr_loader.synthetic import make_ims_file, make_volume
+
+
+def test_make_volume(tmp_path):
+    path = make_volume(str(tmp_path / 'volume.zarr.zip'), shape=(32, 64, 64), chunks=(8, 16, 16),
+                       levels=3, timepoints=2, channels=2, sparsity=0.5, compressor='zstd')
+    root = zarr.open_consolidated(zarr.ZipStore(path, mode='r'), mode='r')
+    assert sorted(root['DataSet'].group_keys()) == [f'ResolutionLevel {i}' for i in range(3)]
+    group = root['DataSet/ResolutionLevel 0/TimePoint 1/Channel 1']
+    occupancy = group[OCCUPANCY_NAME][...].astype(bool)
+    assert 0 < occupancy.mean() < 1
+    assert group[SUMMARY_NAME].shape == occupancy.shape + (5,)
+    assert root['DataSet/ResolutionLevel 2/TimePoint 0/Channel 0/Data'].shape == (8, 16, 16)
+
+    data = group['Data'][...]
+    empty = np.argwhere(~occupancy)[0] * (8, 16, 16)
+    assert not data[empty[0]:empty[0] + 8, empty[1]:empty[1] + 16, empty[2]:empty[2] + 16].any()
+
+
+def test_make_ims_file_converts(tmp_path):
+    ims_path = make_ims_file(str(tmp_path / 'volume.ims'), shape=(20, 40, 40), chunks=(8, 16, 16), sparsity=0.3)
+    ims_layers = napari_get_reader(ims_path)(ims_path)
+    ims_to_zarr.main(ims_path, str(tmp_path / 'volume.zarr'), workers=2)
+    zarr_layers = napari_get_reader(str(tmp_path / 'volume.zarr'))(str(tmp_path / 'volume.zarr'))
+
+    assert ims_layers[0][0].shape == (20, 40, 40)
+    np.testing.assert_array_equal(zarr_layers[0][0][:20, :40, :40].compute(), ims_layers[0][0].compute())
+    assert ims_layers[0][1]['scale'] == [1.0, 1.0, 1.0]
@@ -0,0 +1,56 @@
+import time
+import dask
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from numcodecs import blosc
+from napari_zarr_loader import threading_policy
+from napari_zarr_loader.threading_policy import (BULK, INTERACTIVE, configure_threading, ensure_threading,
+                                                 resolve_threading)
+
+
+def test_interactive_gives_blosc_all_cores():
+    workers, blosc_threads = resolve_threading(INTERACTIVE, cpu_count=16)
+    assert workers == 4
+    # Threaded Blosc decodes serialize on its global context, so one decode uses every core
+    assert blosc_threads == 16
+
+
+def test_bulk_uses_one_blosc_thread_per_worker():
+    workers, blosc_threads = resolve_threading(BULK, cpu_count=16)
+    assert workers == 16
+    assert blosc_threads == 1
+
+
+def test_settings_override_from_environment(monkeypatch):
+    monkeypatch.setenv('NAPARI_ZARR_LOADER_BLOSC_THREADS', '3')
+    assert resolve_threading(BULK, workers=2, cpu_count=16) == (2, 3)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        resolve_threading('fast')
+
+
+def test_configure_threading_sets_blosc():
+    previous = blosc.get_nthreads()
+    # Leaving the block restores the global scheduler settings changed by configure_threading
+    with dask.config.set(scheduler=None, num_workers=None):
+        try:
+            workers, blosc_threads = configure_threading(BULK, workers=2)
+            assert blosc.get_nthreads() == blosc_threads == 1
+            assert not blosc.use_threads
+            assert dask.config.get('num_workers') == 2
+        finally:
+            blosc.set_nthreads(previous)
+            blosc.use_threads = None
+
+
+def test_ensure_threading_configures_once(monkeypatch):
+    monkeypatch.setattr(threading_policy, '_configured_mode', None)
+    monkeypatch.setattr(blosc, 'use_threads', blosc.use_threads)
+    calls = []
+    monkeypatch.setattr(blosc, 'set_nthreads', lambda n: (calls.append(n), time.sleep(0.01)))
+    with dask.config.set(scheduler=None, num_workers=None):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: ensure_threading(INTERACTIVE), range(32)))
+    assert len(calls) == 1
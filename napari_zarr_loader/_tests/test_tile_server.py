@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import requests
+import zarr
+import ims_to_zarr
+from napari_zarr_loader import napari_get_reader
+from napari_zarr_loader.chunk_cache import ChunkCache
+from napari_zarr_loader.tile_server import ChunkServer
+from .test_ims_reader import write_ims
+
+
+@pytest.fixture
+def server():
+    server = ChunkServer(port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize('decoded', [True, False])
+def test_reader_opens_served_volume(tmp_path, server, decoded):
+    data = write_ims(str(tmp_path / 'sample.ims'))
+    ims_to_zarr.main(str(tmp_path / 'sample.ims'), str(tmp_path / 'sample.zarr'), workers=2)
+    url = server.add_volume(str(tmp_path / 'sample.zarr'), decoded=decoded)
+    assert url.endswith('/sample.zarr')
+
+    layers = napari_get_reader(url)(url)
+    np.testing.assert_array_equal(layers[0][0].compute()[:10, :20, :30], data)
+    assert layers[0][1]['metadata']['resolutionLevels'] == 2
+
+    meta = requests.get(f"{url}/DataSet/ResolutionLevel 0/TimePoint 0/Channel 0/Data/.zarray").json()
+    assert (meta['compressor'] is None) == decoded
+
+
+def test_clients_share_one_decode(tmp_path, server):
+    data = np.arange(32 * 32, dtype='uint16').reshape(32, 32)
+    zarr.array(data, chunks=(16, 16), store=str(tmp_path / 'a.zarr'))
+    url = server.add_volume(str(tmp_path / 'a.zarr'))
+    volume = server.volumes['a.zarr']
+    volume.arrays[''].cache = cache = ChunkCache(2**20)
+
+    for _ in range(3):
+        client = zarr.open_consolidated(url, mode='r')
+        np.testing.assert_array_equal(client[:], data)
+    assert cache.misses == 4 and cache.hits == 8
+    assert requests.get(f"{url}/9.9").status_code == 404
@@ -0,0 +1,111 @@
+# async_fetch.py
+
+import asyncio
+import threading
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence
+from .coalesce import fetch_many, get_fetch_executor
+from .settings import get_setting
+from .threading_policy import BULK, active_mode
+
+
+def _get_or_none(store, key):
+    try:
+        return store[key]
+    except KeyError:
+        return None
+
+
+class AsyncFetchEngine:
+    """
+    Chunk fetch pipeline driven by an asyncio event loop running in a background thread.
+    Up to `max_inflight` reads are outstanding at once across all callers, so throughput on
+    high-latency stores is bounded by bandwidth rather than by the number of dask workers.
+    Stores with an async `aget` method are awaited directly, other stores are read on the
+    fetch thread pool. Fetched chunks are decoded on a small, separate thread pool.
+    """
+
+    def __init__(self, max_inflight: int, decode_threads: int):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        # Reads requested and not yet answered, waiting for a slot or in flight
+        self.pending = 0
+        self._semaphore = None
+        self.decode_executor = ThreadPoolExecutor(max_workers=decode_threads, thread_name_prefix='napari-zarr-decode')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='napari-zarr-async', daemon=True)
+        self.thread.start()
+
+    async def _fetch_one(self, store, key: str, decode: Optional[Callable]):
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                self.inflight += 1
+                try:
+                    if getattr(store, 'supports_async', False):
+                        try:
+                            raw = await store.aget(key)
+                        except KeyError:
+                            raw = None
+                    else:
+                        raw = await self.loop.run_in_executor(get_fetch_executor(), _get_or_none, store, key)
+                finally:
+                    self.inflight -= 1
+        finally:
+            self.pending -= 1
+        if raw is None or decode is None:
+            return raw
+        return await self.loop.run_in_executor(self.decode_executor, decode, raw)
+
+    async def _fetch_all(self, store, keys: Sequence[str], decode: Optional[Callable]):
+        if self._semaphore is None:
+            # Created on the loop's own thread so that it binds to this loop
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        values = await asyncio.gather(*(self._fetch_one(store, key, decode) for key in keys))
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def fetch(self, store, keys: Sequence[str], decode: Optional[Callable] = None) -> Dict[str, object]:
+        """
+        Fetches (and decodes, if `decode` is given) several keys concurrently and blocks until
+        all of them are available. Missing keys are left out of the result.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._fetch_all(store, keys, decode), self.loop)
+        return future.result()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_fetch_engine() -> AsyncFetchEngine:
+    """Returns the process-wide asyncio fetch engine ('max_inflight' and 'decode_threads' settings)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncFetchEngine(get_setting('max_inflight'), get_setting('decode_threads'))
+    return _engine
+
+
+def fetch_queue_depth() -> int:
+    """Returns the number of chunk reads queued or in flight in the fetch engine, 0 if it never started."""
+    return _engine.pending if _engine is not None else 0
+
+
+def fetch_decoded(store, keys: Sequence[str], decode: Callable) -> Dict[str, object]:
+    """
+    Fetches and decodes the chunks stored under `keys`. Async-capable stores, and plain stores
+    without a batched read, go through the asyncio engine (unless the 'async_fetch' setting is off);
+    stores with their own batched read (merged ranged reads, fsspec) keep using it.
+    In 'bulk' threading mode local stores are read and decoded on the calling worker, so that
+    conversions and exports decode on all their workers rather than on the engine's few threads.
+    """
+    if not keys:
+        return {}
+    batched = type(store).getitems is not zarr.storage.BaseStore.getitems
+    local = isinstance(store, (zarr.storage.DirectoryStore, zarr.storage.ZipStore))
+    use_engine = get_setting('async_fetch') and len(keys) > 1 and not (local and active_mode() == BULK) and (
+        getattr(store, 'supports_async', False) or not batched)
+    if use_engine:
+        return get_fetch_engine().fetch(store, keys, decode)
+    return {key: decode(raw) for key, raw in fetch_many(store, keys).items()}
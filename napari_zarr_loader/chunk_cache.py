@@ -0,0 +1,311 @@
+# chunk_cache.py
+
+import threading
+import numpy as np
+from collections import OrderedDict
+from numcodecs import Blosc
+from typing import Callable, Hashable, List, Optional, Tuple
+from .settings import get_setting
+from .shared_cache import get_shared_chunk_cache
+
+
+class ChunkCache:
+    """
+    Thread-safe LRU cache of decoded chunks, bounded by the total number of bytes held.
+    Cached chunks are marked read-only since they are shared between readers.
+    An optional `next_tier` (e.g. the shared-memory cache) is consulted on misses and
+    receives every chunk put here.
+    """
+
+    def __init__(self, max_bytes: int, next_tier=None,
+                 on_evict: Optional[Callable[[Hashable, np.ndarray], None]] = None):
+        self.max_bytes = max_bytes
+        self.next_tier = next_tier
+        self.on_evict = on_evict
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+                self.hits += 1
+                return chunk
+            self.misses += 1
+        if self.next_tier is None:
+            return None
+        chunk = self.next_tier.get(key)
+        if chunk is not None:
+            self._put_local(key, chunk)
+        return chunk
+
+    def put(self, key: Hashable, chunk: np.ndarray) -> None:
+        if self.next_tier is not None:
+            self.next_tier.put(key, chunk)
+        self._put_local(key, chunk)
+
+    def _put_local(self, key: Hashable, chunk: np.ndarray) -> None:
+        if chunk.nbytes > self.max_bytes:
+            return
+        chunk.flags.writeable = False
+        with self._lock:
+            previous = self._chunks.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._chunks[key] = chunk
+            self.nbytes += chunk.nbytes
+            evicted = self._trim()
+        self._evicted(evicted)
+
+    def _trim(self) -> List[Tuple[Hashable, np.ndarray]]:
+        evicted = []
+        while self.nbytes > self.max_bytes:
+            key, chunk = self._chunks.popitem(last=False)
+            self.nbytes -= chunk.nbytes
+            evicted.append((key, chunk))
+        return evicted
+
+    def _evicted(self, evicted: List[Tuple[Hashable, np.ndarray]]) -> None:
+        if self.on_evict is not None:
+            for key, chunk in evicted:
+                self.on_evict(key, chunk)
+
+    def pop(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            chunk = self._chunks.pop(key, None)
+            if chunk is not None:
+                self.nbytes -= chunk.nbytes
+            return chunk
+
+    def discard(self, key: Hashable) -> None:
+        """Drops one chunk, if cached, without handing it out."""
+        with self._lock:
+            entry = self._chunks.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry.nbytes
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            evicted = self._trim()
+        self._evicted(evicted)
+
+    def invalidate(self, array_key: str) -> None:
+        """Drops all cached chunks of one array, e.g. after it was written to."""
+        with self._lock:
+            for key in [k for k in self._chunks if k[0] == array_key]:
+                self.nbytes -= self._chunks.pop(key).nbytes
+        if self.next_tier is not None:
+            self.next_tier.invalidate(array_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chunks.clear()
+            self.nbytes = 0
+        if self.next_tier is not None:
+            self.next_tier.clear()
+
+
+class CompressedChunkCache(ChunkCache):
+    """
+    LRU cache holding chunks compressed with a fast codec (LZ4 with bit shuffling), decoded on hit.
+    Smooth microscopy data compresses several-fold, so this tier holds several times more
+    chunks than the same budget of decoded chunks, at the cost of a decode per hit.
+    """
+
+    def __init__(self, max_bytes: int, codec=None):
+        super().__init__(max_bytes)
+        self.codec = codec or Blosc(cname='lz4', clevel=5, shuffle=Blosc.BITSHUFFLE)
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._chunks.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._chunks.move_to_end(key)
+            self.hits += 1
+        return self._decode(entry)
+
+    def _decode(self, entry: 'CompressedChunk') -> np.ndarray:
+        chunk = np.frombuffer(self.codec.decode(entry.data), dtype=entry.dtype)
+        return chunk.reshape(entry.shape)
+
+    def pop(self, key: Hashable) -> Optional[np.ndarray]:
+        """Removes and decodes one chunk, counted as a hit (it moves to a decoded tier)."""
+        with self._lock:
+            entry = self._chunks.pop(key, None)
+            if entry is None:
+                return None
+            self.nbytes -= entry.nbytes
+            self.hits += 1
+        return self._decode(entry)
+
+    def put(self, key: Hashable, chunk: np.ndarray) -> None:
+        if chunk.dtype.hasobject:
+            return
+        entry = CompressedChunk(self.codec.encode(np.ascontiguousarray(chunk)), chunk.dtype, chunk.shape)
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._chunks.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._chunks[key] = entry
+            self.nbytes += entry.nbytes
+            evicted = self._trim()
+        self._evicted(evicted)
+
+
+class CompressedChunk:
+    __slots__ = ('data', 'dtype', 'shape', 'nbytes')
+
+    def __init__(self, data: bytes, dtype: np.dtype, shape: Tuple[int, ...]):
+        self.data = data
+        self.dtype = dtype
+        self.shape = shape
+        self.nbytes = len(data)
+
+
+class AdaptiveChunkCache:
+    """
+    Two-tier cache: a decoded, hot tier in front of a compressed, warm tier receiving the chunks
+    evicted from the hot one. Both share one memory budget whose split follows the measured
+    hit rates: when chunks dropped from the warm tier are requested again (the working set
+    outgrows the cache), the compressed tier grows; when the warm tier stops serving hits,
+    the decoded tier grows back so that hits skip decoding.
+    """
+    # Lookups between two adjustments of the split, and the step of each adjustment
+    ADAPT_INTERVAL = 256
+    STEP = 0.05
+    MIN_WARM, MAX_WARM = 0.1, 0.9
+    # Keys recently dropped from the warm tier, whose misses reveal a too small cache
+    GHOST_KEYS = 4096
+
+    def __init__(self, max_bytes: int, next_tier=None, warm_fraction: float = 0.5):
+        self.max_bytes = max_bytes
+        self.next_tier = next_tier
+        self.warm_fraction = warm_fraction
+        self.warm = CompressedChunkCache(int(max_bytes * warm_fraction))
+        self.hot = ChunkCache(max_bytes - self.warm.max_bytes, on_evict=self.warm.put)
+        self.misses = 0
+        self._ghosts = OrderedDict()
+        self._window = dict(hot=0, warm=0, ghost=0, lookups=0)
+        self._lock = threading.Lock()
+        self.warm.on_evict = self._forget
+
+    @property
+    def hits(self) -> int:
+        return self.hot.hits + self.warm.hits
+
+    @property
+    def nbytes(self) -> int:
+        return self.hot.nbytes + self.warm.nbytes
+
+    def __len__(self):
+        return len(self.hot) + len(self.warm)
+
+    def _forget(self, key: Hashable, entry) -> None:
+        with self._lock:
+            self._ghosts[key] = None
+            if len(self._ghosts) > self.GHOST_KEYS:
+                self._ghosts.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        chunk = self.hot.get(key)
+        tier = 'hot'
+        if chunk is None:
+            chunk = self.warm.pop(key)
+            tier = 'warm'
+            if chunk is not None:
+                self.hot.put(key, chunk)
+        with self._lock:
+            if chunk is None:
+                self.misses += 1
+                tier = None
+                if key in self._ghosts:
+                    del self._ghosts[key]
+                    tier = 'ghost'
+            if tier is not None:
+                self._window[tier] += 1
+            self._window['lookups'] += 1
+            adapt = self._window['lookups'] >= self.ADAPT_INTERVAL
+        if adapt:
+            self._adapt()
+        if chunk is None and self.next_tier is not None:
+            chunk = self.next_tier.get(key)
+            if chunk is not None:
+                self.hot.put(key, chunk)
+        return chunk
+
+    def _adapt(self) -> None:
+        with self._lock:
+            window, self._window = self._window, dict(hot=0, warm=0, ghost=0, lookups=0)
+            fraction = self.warm_fraction
+            if window['ghost'] > 0.01 * window['lookups']:
+                fraction = min(self.MAX_WARM, fraction + self.STEP)
+            elif window['warm'] < 0.01 * window['lookups']:
+                fraction = max(self.MIN_WARM, fraction - self.STEP)
+            if fraction == self.warm_fraction:
+                return
+            self.warm_fraction = fraction
+        warm_bytes = int(self.max_bytes * fraction)
+        # Shrink first, so that the total stays within the budget
+        if warm_bytes > self.warm.max_bytes:
+            self.hot.resize(self.max_bytes - warm_bytes)
+            self.warm.resize(warm_bytes)
+        else:
+            self.warm.resize(warm_bytes)
+            self.hot.resize(self.max_bytes - warm_bytes)
+
+    def put(self, key: Hashable, chunk: np.ndarray) -> None:
+        if self.next_tier is not None:
+            self.next_tier.put(key, chunk)
+        # A stale compressed copy is dropped without decoding it
+        self.warm.discard(key)
+        self.hot.put(key, chunk)
+
+    def invalidate(self, array_key: str) -> None:
+        self.hot.invalidate(array_key)
+        self.warm.invalidate(array_key)
+        if self.next_tier is not None:
+            self.next_tier.invalidate(array_key)
+
+    def clear(self) -> None:
+        self.hot.clear()
+        self.warm.clear()
+        with self._lock:
+            self._ghosts.clear()
+        if self.next_tier is not None:
+            self.next_tier.clear()
+
+
+_chunk_cache = None
+_chunk_cache_lock = threading.Lock()
+
+
+def get_chunk_cache() -> ChunkCache:
+    """
+    Returns the process-wide decoded-chunk cache shared by the Zarr and IMS readers.
+    Its size is set by the 'chunk_cache_mb' plugin setting. When the shared-memory cache is
+    enabled ('shared_cache_mb'), it backs this cache so that processes reuse each other's chunks.
+    With the 'compressed_cache' setting, the budget is split adaptively between decoded and
+    LZ4-compressed chunks (see AdaptiveChunkCache), holding several times more data.
+    """
+    global _chunk_cache
+    # Dask workers may ask for the cache concurrently on first use
+    with _chunk_cache_lock:
+        if _chunk_cache is None:
+            max_bytes = int(get_setting('chunk_cache_mb') * 2**20)
+            if get_setting('compressed_cache'):
+                _chunk_cache = AdaptiveChunkCache(max_bytes, get_shared_chunk_cache())
+            else:
+                _chunk_cache = ChunkCache(max_bytes, get_shared_chunk_cache())
+    return _chunk_cache
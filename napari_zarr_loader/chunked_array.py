@@ -0,0 +1,270 @@
+# chunked_array.py
+
+import functools
+import itertools
+import os
+import numpy as np
+import dask.array as da
+from dask.base import tokenize
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from .async_fetch import fetch_decoded
+from .chunk_cache import ChunkCache, get_chunk_cache
+from .chunking import chunk_grid_shape, chunk_slices
+from .coalesce import chunk_key, coalesced_chunks, decode_chunk
+from .instrumentation import count, log, span
+from .paths import file_signature, is_url
+from .settings import get_setting
+
+# Name of the chunk-occupancy bitmap stored next to each 'Data' array by the converter
+OCCUPANCY_NAME = 'ChunkOccupancy'
+# Name of the per-chunk summary index (min, max, sum, count, nonzero) stored next to 'Data' arrays
+SUMMARY_NAME = 'ChunkSummary'
+
+
+class ChunkedArray:
+    """
+    Read-only array-like view over a chunked Zarr array that reads whole chunks.
+    Chunks marked as empty in the occupancy bitmap are answered with the fill value
+    without touching the store, other chunks go through the shared decoded-chunk cache.
+    `array` is a Zarr array or any array-like with `shape`, `dtype`, `chunks` and `fill_value`.
+    `summary` is the per-chunk summary index answering statistics without reading voxels.
+    """
+
+    def __init__(self, array, occupancy: Optional[np.ndarray] = None, cache: Optional[ChunkCache] = None,
+                 summary: Optional[np.ndarray] = None):
+        self.array = array
+        self.key = array_key(array)
+        # Cached chunks are keyed by the store version as well, so that chunks cached (possibly
+        # by other processes) before the store was rewritten at the same path are not served
+        self.version = array_signature(array) if self.key is not None else None
+        self.cache = get_chunk_cache() if cache is None else cache
+        self.shape = tuple(array.shape)
+        self.dtype = np.dtype(array.dtype)
+        self.ndim = len(self.shape)
+        self.chunks = tuple(array.chunks)
+        self.grid_shape = chunk_grid_shape(self.shape, self.chunks)
+        self.fill_value = array.fill_value if array.fill_value is not None else 0
+        if occupancy is not None and occupancy.shape != self.grid_shape:
+            log(f"Ignoring chunk occupancy with shape {occupancy.shape}, expected {self.grid_shape}.")
+            occupancy = None
+        self.occupancy = None if occupancy is None else occupancy.astype(bool)
+        if summary is not None and summary.shape[:-1] != self.grid_shape:
+            log(f"Ignoring chunk summary with shape {summary.shape}, expected {self.grid_shape}.")
+            summary = None
+        self.summary = summary
+
+    def __len__(self):
+        return self.shape[0]
+
+    def is_empty(self, index: Tuple[int, ...]) -> bool:
+        """Returns True if the chunk at grid position `index` is known to hold only the fill value."""
+        return self.occupancy is not None and not self.occupancy[index]
+
+    def has_empty_chunks(self) -> bool:
+        return self.occupancy is not None and not self.occupancy.all()
+
+    def occupied_chunks(self) -> Iterator[Tuple[int, ...]]:
+        """Iterates over the grid positions of chunks that may hold data."""
+        if self.occupancy is None:
+            return itertools.product(*(range(n) for n in self.grid_shape))
+        return (tuple(int(i) for i in index) for index in np.argwhere(self.occupancy))
+
+    def chunk_shape(self, index: Tuple[int, ...]) -> Tuple[int, ...]:
+        return tuple(s.stop - s.start for s in chunk_slices(index, self.shape, self.chunks))
+
+    def read_chunk(self, index: Tuple[int, ...]) -> np.ndarray:
+        """Returns the decoded chunk at grid position `index`."""
+        return self.read_chunks([index])[index]
+
+    def read_chunks(self, indices: Iterable[Tuple[int, ...]]) -> Dict[Tuple[int, ...], np.ndarray]:
+        """
+        Returns the decoded chunks at the given grid positions. Empty and cached chunks are
+        answered directly; the remaining ones are requested from the store in a single batch
+        and decoded as they arrive.
+        """
+        chunks, missing, empty = {}, [], 0
+        for index in indices:
+            if self.is_empty(index):
+                chunks[index] = np.full(self.chunk_shape(index), self.fill_value, dtype=self.dtype)
+                empty += 1
+                continue
+            chunk = self.cache.get((self.key, index, self.version)) if self.key is not None else None
+            # Chunks cached by other readers of the same data may cover another region
+            if chunk is None or chunk.shape != self.chunk_shape(index):
+                missing.append(index)
+            else:
+                chunks[index] = chunk
+        count('empty_chunks', empty)
+        count('cache_hits', len(chunks) - empty)
+        count('cache_misses', len(missing))
+        if not missing:
+            return chunks
+
+        if self._batched:
+            keys = [chunk_key(self.array, index) for index in missing]
+            with span('chunk_fetch', chunks=len(keys)):
+                decoded = fetch_decoded(self.array.chunk_store, keys, functools.partial(decode_chunk, self.array))
+            for index, key in zip(missing, keys):
+                shape = self.chunk_shape(index)
+                if key in decoded:
+                    chunk = decoded[key][tuple(slice(0, n) for n in shape)]
+                else:
+                    chunk = np.full(shape, self.fill_value, dtype=self.dtype)
+                chunks[index] = self._cached(index, chunk)
+        else:
+            for index in missing:
+                with span('chunk_read'):
+                    chunk = np.asarray(self.array[chunk_slices(index, self.shape, self.chunks)])
+                count('chunks_decoded')
+                count('bytes_decoded', chunk.nbytes)
+                chunks[index] = self._cached(index, chunk)
+        return chunks
+
+    @property
+    def _batched(self) -> bool:
+        """Chunks of Zarr arrays are fetched as raw bytes in batches and decoded here."""
+        return hasattr(self.array, 'chunk_store') and self.dtype != object
+
+    def _cached(self, index: Tuple[int, ...], chunk: np.ndarray) -> np.ndarray:
+        if self.key is not None:
+            self.cache.put((self.key, index, self.version), chunk)
+        return chunk
+
+    def __getitem__(self, selection) -> np.ndarray:
+        with span('slice_request'):
+            return self._read(selection)
+
+    def _read(self, selection) -> np.ndarray:
+        selection, squeeze, steps = normalize_selection(selection, self.shape)
+        out_shape = tuple(s.stop - s.start for s in selection)
+        ranges = [range(s.start // c, -(-s.stop // c)) if s.stop > s.start else range(0)
+                  for s, c in zip(selection, self.chunks)]
+        indices = list(itertools.product(*ranges))
+
+        if all(self.is_empty(index) for index in indices):
+            out = np.full(out_shape, self.fill_value, dtype=self.dtype)
+        else:
+            out = np.empty(out_shape, dtype=self.dtype)
+            chunks = self.read_chunks(indices)
+            for index in indices:
+                chunk = chunks[index]
+                src, dst = [], []
+                for i, s, c in zip(index, selection, self.chunks):
+                    lo, hi = max(s.start, i * c), min(s.stop, (i + 1) * c)
+                    src.append(slice(lo - i * c, hi - i * c))
+                    dst.append(slice(lo - s.start, hi - s.start))
+                out[tuple(dst)] = chunk[tuple(src)]
+
+        out = out[tuple(slice(None, None, step) for step in steps)]
+        return out[tuple(0 if sq else slice(None) for sq in squeeze)]
+
+
+def normalize_selection(selection, shape):
+    """Converts an int/slice/Ellipsis selection into unit-step slices, squeeze flags and steps."""
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    if any(s is Ellipsis for s in selection):
+        at = selection.index(Ellipsis)
+        fill = (slice(None),) * (len(shape) - len(selection) + 1)
+        selection = selection[:at] + fill + selection[at + 1:]
+    selection = selection + (slice(None),) * (len(shape) - len(selection))
+
+    slices, squeeze, steps = [], [], []
+    for s, n in zip(selection, shape):
+        if isinstance(s, (int, np.integer)):
+            s = int(s) + n if s < 0 else int(s)
+            if not 0 <= s < n:
+                raise IndexError(f"index {s} is out of bounds for axis with size {n}")
+            slices.append(slice(s, s + 1))
+            squeeze.append(True)
+            steps.append(1)
+        elif isinstance(s, slice):
+            start, stop, step = s.indices(n)
+            if step < 1:
+                raise IndexError("only positive slice steps are supported")
+            slices.append(slice(start, max(start, stop)))
+            squeeze.append(False)
+            steps.append(step)
+        else:
+            raise IndexError(f"unsupported selection {s!r}")
+    return tuple(slices), tuple(squeeze), tuple(steps)
+
+
+def array_key(array) -> Optional[str]:
+    """
+    Returns a string identifying an array across readers: its store and path inside the store.
+    Array-likes that are not Zarr arrays can provide their own `cache_key` attribute.
+    Returns None for stores without a stable location (e.g. in-memory stores), which are not cached.
+    """
+    key = getattr(array, 'cache_key', None)
+    if key is not None:
+        return key
+    # Consolidated metadata wraps the store; chunks are still read from the chunk store
+    store = getattr(array, 'chunk_store', None) or array.store
+    store_path = getattr(store, 'path', None)
+    if store_path is None:
+        return None
+    return f"{type(store).__name__}:{store_path}:{array.path}"
+
+
+def array_signature(array):
+    """
+    Returns a value that changes when the chunks of an array are rewritten: the modification
+    time of its directory (Zarr writes chunks through renames), zip container or .ims file.
+    None for remote and in-memory stores.
+    """
+    filename = getattr(array, 'filename', None)
+    store = getattr(array, 'chunk_store', None) or getattr(array, 'store', None)
+    store_path = filename or getattr(store, 'path', None)
+    if store_path is None or is_url(store_path):
+        return None
+    return file_signature(os.path.join(store_path, array.path)
+                          if filename is None and os.path.isdir(store_path) else store_path)
+
+
+def to_dask(chunked: ChunkedArray, coalesce: bool = True) -> da.Array:
+    """
+    Wraps a ChunkedArray in a dask array. For Zarr arrays each task covers several chunks along
+    Y and X (see the 'coalesce_mb' setting), which are fetched from the store as one batch.
+    Without `coalesce`, each task is one chunk, so that slices of the dask array read exactly
+    the chunks they overlap.
+    The graph name covers the layout and the signature of the array, so that blocks kept by dask
+    caches (e.g. napari's) are not served for a store rewritten at the same path.
+    """
+    chunks = chunked.chunks
+    target_bytes = get_setting('coalesce_mb') * 2**20 if coalesce else 0
+    name = False
+    if chunked.key is not None:
+        name = 'chunked-' + tokenize(chunked.key, chunked.shape, chunked.chunks, chunked.dtype.str,
+                                     array_signature(chunked.array), target_bytes)
+    if target_bytes and chunked._batched:
+        chunks = coalesced_chunks(chunked.shape, chunked.chunks, chunked.dtype.itemsize, target_bytes)
+    return da.from_array(chunked, chunks=chunks, name=name, asarray=False, fancy=False)
+
+
+def open_chunked(group, name: str = 'Data') -> ChunkedArray:
+    """
+    Opens the array `name` of a channel group together with its chunk-occupancy bitmap
+    and chunk summary index, if present.
+    """
+    array = group[name]
+    occupancy = summary = None
+    if name == 'Data' and OCCUPANCY_NAME in group:
+        occupancy = group[OCCUPANCY_NAME][...]
+    if name == 'Data' and SUMMARY_NAME in group:
+        summary = group[SUMMARY_NAME][...]
+    return ChunkedArray(array, occupancy, summary=summary)
+
+
+def write_occupancy(group, occupancy: np.ndarray):
+    """
+    Stores the chunk-occupancy bitmap of the 'Data' array of a channel group.
+    """
+    return group.create_dataset(OCCUPANCY_NAME, data=occupancy.astype(np.uint8), overwrite=True)
+
+
+def write_summary(group, summary: np.ndarray):
+    """
+    Stores the chunk summary index of the 'Data' array of a channel group.
+    """
+    return group.create_dataset(SUMMARY_NAME, data=summary.astype(np.float64), overwrite=True)
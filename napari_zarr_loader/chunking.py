@@ -0,0 +1,43 @@
+# chunking.py
+
+import itertools
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Iterator, Sequence, Tuple
+
+
+def chunk_grid_shape(shape: Sequence[int], chunks: Sequence[int]) -> Tuple[int, ...]:
+    """
+    Returns the number of chunks along each axis of an array.
+    """
+    return tuple(-(-s // c) for s, c in zip(shape, chunks))
+
+
+def chunk_slices(index: Sequence[int], shape: Sequence[int], chunks: Sequence[int]) -> Tuple[slice, ...]:
+    """
+    Returns the selection covered by the chunk at grid position `index`, clipped to the array shape.
+    """
+    return tuple(slice(i * c, min((i + 1) * c, s)) for i, s, c in zip(index, shape, chunks))
+
+
+def iter_chunk_slices(shape: Sequence[int], chunks: Sequence[int]) -> Iterator[Tuple[slice, ...]]:
+    """
+    Iterates over the selections of all chunks of an array in C order.
+    """
+    for index in itertools.product(*(range(n) for n in chunk_grid_shape(shape, chunks))):
+        yield chunk_slices(index, shape, chunks)
+
+
+def run_bounded(executor, fn, items, max_pending: int) -> None:
+    """
+    Submits fn(item) for every item while keeping at most `max_pending` tasks in flight,
+    so that only a bounded number of chunks is held in memory. Re-raises the first error.
+    """
+    pending = set()
+    for item in items:
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        pending.add(executor.submit(fn, item))
+    for future in pending:
+        future.result()
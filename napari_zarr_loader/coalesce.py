@@ -0,0 +1,108 @@
+# coalesce.py
+
+import numpy as np
+import zarr
+from numcodecs.compat import ensure_ndarray_like
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+from .instrumentation import count, span
+from .settings import get_setting
+
+# Two byte ranges closer than this are read together, the gap being discarded
+MAX_GAP = 64 * 2**10
+
+_fetch_executor = None
+
+
+def get_fetch_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool used to fetch the chunks of one request concurrently.
+    Fetching is I/O bound, so it is sized independently of the dask workers ('fetch_threads' setting).
+    """
+    global _fetch_executor
+    if _fetch_executor is None:
+        _fetch_executor = ThreadPoolExecutor(max_workers=get_setting('fetch_threads'),
+                                             thread_name_prefix='napari-zarr-fetch')
+    return _fetch_executor
+
+
+def merge_ranges(ranges: Sequence[Tuple[int, int]], max_gap: int = MAX_GAP) -> List[Tuple[int, int, List[int]]]:
+    """
+    Merges (offset, size) byte ranges that are adjacent or separated by at most `max_gap` bytes.
+    Returns (offset, size, members) tuples, `members` being indices into `ranges`.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    merged = []
+    for i in order:
+        offset, size = ranges[i]
+        if merged and offset - (merged[-1][0] + merged[-1][1]) <= max_gap:
+            start, length, members = merged[-1]
+            merged[-1] = (start, max(length, offset + size - start), members + [i])
+        else:
+            merged.append((offset, size, [i]))
+    return merged
+
+
+def chunk_key(array, index: Sequence[int]) -> str:
+    """Returns the store key of the chunk at grid position `index` of a Zarr array."""
+    separator = getattr(array, '_dimension_separator', None) or '.'
+    name = separator.join(str(i) for i in index) if index else '0'
+    return f"{array.path}/{name}" if array.path else name
+
+
+def fetch_many(store, keys: Sequence[str]) -> Dict[str, bytes]:
+    """
+    Fetches the raw values of several keys at once, leaving missing keys out of the result.
+    Stores with their own batched implementation (ranged reads, async requests) use it,
+    other stores are read concurrently on the fetch thread pool.
+    """
+    if not keys:
+        return {}
+    if type(store).getitems is not zarr.storage.BaseStore.getitems:
+        return dict(store.getitems(keys, contexts={}))
+    if len(keys) == 1:
+        try:
+            return {keys[0]: store[keys[0]]}
+        except KeyError:
+            return {}
+
+    def fetch(key):
+        try:
+            return store[key]
+        except KeyError:
+            return None
+
+    values = get_fetch_executor().map(fetch, keys)
+    return {key: value for key, value in zip(keys, values) if value is not None}
+
+
+def decode_chunk(array, raw) -> np.ndarray:
+    """
+    Decodes the raw bytes of a chunk of a Zarr array into a full-size chunk
+    (edge chunks are stored padded to the chunk shape).
+    """
+    count('bytes_read', memoryview(raw).nbytes)
+    count('chunks_decoded')
+    with span('chunk_decode'):
+        chunk = array.compressor.decode(raw) if array.compressor is not None else raw
+        for codec in reversed(array.filters or []):
+            chunk = codec.decode(chunk)
+        chunk = ensure_ndarray_like(chunk).view(array.dtype)
+    count('bytes_decoded', chunk.nbytes)
+    return chunk.reshape(-1, order='A').reshape(array.chunks, order=array.order)
+
+
+def coalesced_chunks(shape: Sequence[int], chunks: Sequence[int], itemsize: int, target_bytes: int) -> Tuple[int, ...]:
+    """
+    Returns dask chunks made of whole Zarr chunks, grown along the two trailing (Y, X) axes up to
+    `target_bytes`, so that one plane request becomes a few tasks each fetching a batch of chunks.
+    """
+    out = list(chunks)
+    for axis in range(len(out) - 1, max(len(out) - 3, -1), -1):
+        full = -(-shape[axis] // chunks[axis]) * chunks[axis]
+        while out[axis] < full:
+            grown = min(out[axis] * 2, full)
+            if int(np.prod(out[:axis] + [grown] + out[axis + 1:])) * itemsize > target_bytes:
+                break
+            out[axis] = grown
+    return tuple(min(c, n) if n else c for c, n in zip(out, shape))
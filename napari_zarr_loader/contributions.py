@@ -0,0 +1,25 @@
+# contributions.py
+"""
+Reader contribution of the napari manifest (napari.yaml). Sniffing a path only classifies it;
+the readers, and with them zarr, dask and h5py, are imported when a file is actually opened.
+"""
+
+from .paths import reader_kind
+
+
+def read_zarr(path: str, resolution_level: int = 0):
+    from .reader import zarr_reader
+    return zarr_reader(path, resolution_level)
+
+
+def read_ims(path: str, resolution_level: int = 0):
+    from .ims_reader import ims_reader
+    return ims_reader(path, resolution_level)
+
+
+READERS = {'zarr': read_zarr, 'ims': read_ims}
+
+
+def napari_get_reader(path):
+    """Returns the reader for `path` (.zarr directories and URLs, zip containers, .ims files), or None."""
+    return READERS.get(reader_kind(path))
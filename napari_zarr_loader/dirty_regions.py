@@ -0,0 +1,217 @@
+# dirty_regions.py
+
+import argparse
+import itertools
+import numpy as np
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple
+from .chunk_cache import get_chunk_cache
+from .chunked_array import OCCUPANCY_NAME, ChunkedArray, array_key, normalize_selection, write_occupancy
+from .chunking import chunk_slices, run_bounded
+from .projections import AXES, PROJECTIONS_GROUP, parse_projection_name, project_chunk
+from .pyramid import CHANNEL_PREFIX, LEVEL_PREFIX, TIMEPOINT_PREFIX, downsample_chunk, numbered_keys
+from .statistics import refresh_summary
+from .threading_policy import BULK, configure_threading, resolve_threading
+
+# Attribute of a level-0 channel group listing the [start, stop] boxes edited since the last update
+DIRTY_ATTR = 'DirtyRegions'
+
+Region = Tuple[slice, ...]
+
+
+def mark_dirty(channel_group, selection) -> None:
+    """
+    Records that `selection` of the level-0 'Data' array of `channel_group` was modified,
+    so that the next update_pyramid call recomputes the coarse levels covering it.
+    """
+    region, _, _ = normalize_selection(selection, channel_group['Data'].shape)
+    regions = list(channel_group.attrs.get(DIRTY_ATTR, []))
+    regions.append([[s.start for s in region], [s.stop for s in region]])
+    channel_group.attrs[DIRTY_ATTR] = regions
+
+
+def write_region(channel_group, selection, data) -> None:
+    """
+    Writes `data` into the level-0 'Data' array of `channel_group`, refreshes the summaries
+    of the chunks written to and marks the region dirty.
+    """
+    array = channel_group['Data']
+    array[selection] = data
+    get_chunk_cache().invalidate(array_key(array))
+    region, _, _ = normalize_selection(selection, array.shape)
+    refresh_summary(channel_group, chunks_in_regions([region], array.chunks))
+    mark_dirty(channel_group, selection)
+
+
+def dirty_regions(channel_group) -> List[Region]:
+    """Returns the regions of the level-0 'Data' array modified since the last pyramid update."""
+    return [tuple(slice(lo, hi) for lo, hi in zip(start, stop))
+            for start, stop in channel_group.attrs.get(DIRTY_ATTR, [])]
+
+
+def level_factors(source_shape: Sequence[int], target_shape: Sequence[int]) -> Tuple[int, ...]:
+    """Returns the per-axis downsampling factors between two consecutive levels."""
+    return tuple(max(1, round(s / t)) for s, t in zip(source_shape, target_shape))
+
+
+def scale_region(region: Region, factors: Sequence[int], shape: Sequence[int]) -> Region:
+    """Maps a region onto the next coarser level, growing it to whole coarse voxels."""
+    return tuple(slice(s.start // f, min(-(-s.stop // f), n)) for s, f, n in zip(region, factors, shape))
+
+
+def chunks_in_regions(regions: Sequence[Region], chunks: Sequence[int]) -> Set[Tuple[int, ...]]:
+    """Returns the grid positions of all chunks overlapping any of the regions."""
+    indices = set()
+    for region in regions:
+        ranges = [range(s.start // c, -(-s.stop // c)) for s, c in zip(region, chunks)]
+        indices.update(itertools.product(*ranges))
+    return indices
+
+
+def _open_for_update(group):
+    """Opens the 'Data' array of `group` so that chunks becoming empty are deleted from the store."""
+    return zarr.open_array(store=group.store, path=f"{group.path}/Data", mode='r+', write_empty_chunks=False)
+
+
+def _read_occupancy(group) -> Optional[np.ndarray]:
+    if OCCUPANCY_NAME not in group:
+        return None
+    return group[OCCUPANCY_NAME][...].astype(bool)
+
+
+def _update_chunks(target_group, indices: Set[Tuple[int, ...]], compute, executor, workers: int) -> None:
+    """
+    Recomputes the given chunks of the 'Data' array of `target_group` with compute(target, index),
+    which returns whether the chunk holds data, keeping the occupancy bitmap, the summary index
+    and the chunk cache in sync.
+    """
+    target = _open_for_update(target_group)
+    occupancy = _read_occupancy(target_group)
+
+    def update_chunk(index):
+        has_data = compute(target, index)
+        if occupancy is not None:
+            occupancy[index] = has_data
+
+    run_bounded(executor, update_chunk, sorted(indices), 2 * workers)
+    get_chunk_cache().invalidate(array_key(target))
+    if occupancy is not None:
+        write_occupancy(target_group, occupancy)
+    refresh_summary(target_group, indices)
+
+
+def _update_levels(group, levels: Sequence[str], timepoint: str, channel: str, source: ChunkedArray,
+                   regions: List[Region], method: str, executor, workers: int) -> int:
+    """
+    Propagates the dirty `regions` of `source` (the first level) through the coarser `levels`
+    of `group`. Returns the number of chunks recomputed.
+    """
+    updated = 0
+    for level in levels[1:]:
+        path = f"{level}/{timepoint}/{channel}"
+        if path not in group:
+            break
+        target_group = group[path]
+        target_shape, target_chunks = target_group['Data'].shape, target_group['Data'].chunks
+        factors = level_factors(source.shape, target_shape)
+        regions = [scale_region(r, factors, target_shape) for r in regions]
+        indices = chunks_in_regions(regions, target_chunks)
+        _update_chunks(target_group, indices,
+                       lambda target, index, source=source, factors=factors:
+                           downsample_chunk(source, target, index, factors, method),
+                       executor, workers)
+        updated += len(indices)
+        source = ChunkedArray(target_group['Data'], _read_occupancy(target_group))
+    return updated
+
+
+def _update_projections(projections, timepoint: str, channel: str, source: ChunkedArray,
+                        regions: List[Region], executor, workers: int) -> int:
+    """
+    Recomputes the projection chunks covering the dirty `regions` of the level-0 array `source`,
+    then their coarser levels. Returns the number of chunks recomputed.
+    """
+    updated = 0
+    for name in projections.group_keys():
+        parsed = parse_projection_name(name)
+        levels = numbered_keys(projections[name], LEVEL_PREFIX)
+        path = f"{levels[0]}/{timepoint}/{channel}" if levels else None
+        if parsed is None or path not in projections[name]:
+            continue
+        kind, axis_name = parsed
+        axis = AXES[axis_name] % source.ndim
+        # A projection chunk depends on the whole column of source chunks along the axis
+        flat_regions = [r[:axis] + r[axis + 1:] for r in regions]
+        target_group = projections[name][path]
+        indices = chunks_in_regions(flat_regions, target_group['Data'].chunks)
+        _update_chunks(target_group, indices,
+                       lambda target, index, axis=axis, kind=kind:
+                           project_chunk(source, target, index, axis, kind, clear_empty=True),
+                       executor, workers)
+        updated += len(indices)
+        projection_source = ChunkedArray(target_group['Data'], _read_occupancy(target_group))
+        updated += _update_levels(projections[name], levels, timepoint, channel, projection_source,
+                                  flat_regions, kind, executor, workers)
+    return updated
+
+
+def update_pyramid(root, method: str = 'mean', workers: Optional[int] = None) -> int:
+    """
+    Recomputes only the coarse-level chunks covering the dirty regions of level 0, level by level,
+    keeping the chunk-occupancy bitmaps and summary indices in sync, then clears the dirty regions.
+    Stored projections (see projections.build_projections) are updated the same way.
+    Returns the number of chunks recomputed.
+    """
+    workers = workers or resolve_threading(BULK)[0]
+    dataset = root['DataSet']
+    levels = numbered_keys(dataset, LEVEL_PREFIX)
+    level0 = dataset[levels[0]]
+    updated = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for timepoint in numbered_keys(level0, TIMEPOINT_PREFIX):
+            for channel in numbered_keys(level0[timepoint], CHANNEL_PREFIX):
+                group = level0[timepoint][channel]
+                regions = dirty_regions(group)
+                if not regions:
+                    continue
+
+                # Edited chunks may have become empty or gained data
+                source_array = group['Data']
+                occupancy = _read_occupancy(group)
+                if occupancy is not None and occupancy.shape == ChunkedArray(source_array).grid_shape:
+                    for index in chunks_in_regions(regions, source_array.chunks):
+                        block = source_array[chunk_slices(index, source_array.shape, source_array.chunks)]
+                        occupancy[index] = bool(np.any(block != source_array.fill_value))
+                    write_occupancy(group, occupancy)
+                else:
+                    occupancy = None
+                source = ChunkedArray(source_array, occupancy)
+
+                updated += _update_levels(dataset, levels, timepoint, channel, source, regions, method,
+                                          executor, workers)
+                if PROJECTIONS_GROUP in root:
+                    updated += _update_projections(root[PROJECTIONS_GROUP], timepoint, channel, source, regions,
+                                                   executor, workers)
+                del group.attrs[DIRTY_ATTR]
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute the coarse levels covering edited level-0 regions.")
+    parser.add_argument('zarr_path', help="IMS-layout .zarr directory")
+    parser.add_argument('--labels', action='store_true',
+                        help="downsample with the most frequent value instead of the mean")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of parallel workers (default: one per core)")
+    args = parser.parse_args(argv)
+
+    workers, _ = configure_threading(BULK, args.workers)
+    root = zarr.open(args.zarr_path, mode='r+')
+    updated = update_pyramid(root, 'mode' if args.labels else 'mean', workers)
+    print(f"Recomputed {updated} coarse-level chunk(s) in {args.zarr_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# export.py
+
+import argparse
+import os
+import numpy as np
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+from .chunked_array import ChunkedArray, write_occupancy, write_summary
+from .chunking import chunk_grid_shape, iter_chunk_slices, run_bounded
+from .ims_reader import open_file
+from .instrumentation import count, log, span, traced
+from .layers import image_extent
+from .pyramid import CHANNEL_PREFIX, DEFAULT_TARGET_SIZE, LEVEL_PREFIX, TIMEPOINT_PREFIX, add_levels
+from .roi import level_arrays
+from .statistics import chunk_summary, fill_summary
+from .storage import create_store, finalize_store, open_zarr, parse_compressor
+from .threading_policy import BULK, configure_threading, resolve_threading
+
+try:
+    import tifffile
+except ImportError:  # optional, enables exports to TIFF planes
+    tifffile = None
+
+FORMATS = ('zarr', 'tiff')
+
+
+def parse_box(spec: str) -> Tuple[slice, ...]:
+    """
+    Parses a voxel bounding box 'Z0:Z1,Y0:Y1,X0:X1'; omitted bounds select the whole axis,
+    e.g. ':,100:300,:'.
+    """
+    selection = []
+    for part in spec.split(','):
+        start, sep, stop = part.partition(':')
+        if not sep:
+            raise ValueError(f"Invalid box '{spec}', expected START:STOP for every axis, e.g. 0:16,100:300,:")
+        selection.append(slice(int(start) if start.strip() else None, int(stop) if stop.strip() else None))
+    return tuple(selection)
+
+
+def clip_selection(selection: Optional[Sequence[slice]], shape: Sequence[int]) -> Tuple[slice, ...]:
+    """Clips a box to `shape`, leading axes that are not given being selected whole."""
+    selection = list(selection or ())
+    selection = [slice(None)] * (len(shape) - len(selection)) + selection[-len(shape):]
+    clipped = tuple(slice(*s.indices(n)[:2]) for s, n in zip(selection, shape))
+    if any(s.stop <= s.start for s in clipped):
+        raise ValueError(f"The box {[(s.start, s.stop) for s in clipped]} is empty within the shape {tuple(shape)}.")
+    return clipped
+
+
+def source_image_info(path: str):
+    """Returns the 'DataSetInfo/Image' attributes of an .ims file or IMS-layout store, or None."""
+    root = open_file(path) if path.lower().endswith('.ims') else open_zarr(path)
+    return root['DataSetInfo/Image'].attrs if 'DataSetInfo/Image' in root else None
+
+
+def region_extent(image_info, level_shape: Sequence[int],
+                  selection: Sequence[slice]) -> Tuple[List[float], List[float]]:
+    """
+    Returns the world (Z, Y, X) corners of a region of a level, from the source extents
+    (one unit per voxel of the level if they are missing).
+    """
+    extent = image_extent(image_info) if image_info is not None else None
+    lo, hi = extent if extent is not None else ([0.0] * 3, [float(n) for n in level_shape[-3:]])
+    voxel = [(b - a) / n for a, b, n in zip(lo, hi, level_shape[-3:])]
+    selection = selection[-3:]
+    return ([a + s.start * v for a, s, v in zip(lo, selection, voxel)],
+            [a + s.stop * v for a, s, v in zip(lo, selection, voxel)])
+
+
+def export_chunks(source: ChunkedArray, selection: Tuple[slice, ...], group, chunks, compressor,
+                  executor, workers: int) -> None:
+    """
+    Copies the `selection` of `source` into a new 'Data' array of `group`, one output chunk per task.
+    Only the source chunks overlapping each output chunk are read, and at most two output chunks
+    per worker are in flight, which bounds memory use whatever the size of the region.
+    Chunks holding only the fill value are not written; the chunk-occupancy bitmap and the
+    summary index are stored next to the array as by the converter.
+    """
+    shape = tuple(s.stop - s.start for s in selection)
+    chunks = tuple(min(c, n) for c, n in zip(chunks or source.chunks, shape))
+    kwargs = {} if compressor == 'default' else {'compressor': compressor}
+    target = group.create_dataset('Data', shape=shape, chunks=chunks, dtype=source.dtype,
+                                  fill_value=source.fill_value, write_empty_chunks=False, overwrite=True, **kwargs)
+    occupancy = np.zeros(chunk_grid_shape(shape, chunks), dtype=bool)
+    summary = fill_summary(ChunkedArray(target))
+    fill_value = target.fill_value
+
+    def copy_chunk(out_sel):
+        in_sel = tuple(slice(o.start + s.start, o.stop + s.start) for o, s in zip(out_sel, selection))
+        with span('read_chunk'):
+            block = source[in_sel]
+        count('bytes_decoded', block.nbytes)
+        if not np.any(block != fill_value):
+            return
+        with span('write_chunk'):
+            target[out_sel] = block
+        count('chunks_written')
+        index = tuple(o.start // c for o, c in zip(out_sel, chunks))
+        occupancy[index] = True
+        summary[index] = chunk_summary(block)
+
+    run_bounded(executor, copy_chunk, iter_chunk_slices(shape, chunks), 2 * workers)
+    write_occupancy(group, occupancy)
+    write_summary(group, summary)
+
+
+def export_planes(source: ChunkedArray, selection: Tuple[slice, ...], directory: str, prefix: str,
+                  executor, workers: int) -> int:
+    """
+    Writes the `selection` of `source` as one TIFF file per Z plane, '<prefix>_Z<z>.tif' in `directory`.
+    Slabs one source chunk thick are read in parallel, at most one per worker at a time.
+    Returns the number of planes written.
+    """
+    if tifffile is None:
+        raise ImportError("TIFF export requires tifffile: pip install tifffile")
+    z_axis = len(selection) - 3
+    depth = source.chunks[z_axis]
+    start, stop = selection[z_axis].start, selection[z_axis].stop
+    # Slabs are aligned on the source chunks so that every chunk is read once
+    bounds = [max(start, z) for z in range(start - start % depth, stop, depth)]
+
+    def write_slab(z0):
+        z1 = min(z0 - z0 % depth + depth, stop)
+        slab_sel = selection[:z_axis] + (slice(z0, z1),) + selection[z_axis + 1:]
+        with span('read_chunk'):
+            slab = source[slab_sel]
+        count('bytes_decoded', slab.nbytes)
+        for offset in range(z1 - z0):
+            plane = slab[(slice(None),) * z_axis + (offset,)]
+            with span('write_plane'):
+                tifffile.imwrite(os.path.join(directory, f"{prefix}_Z{z0 - start + offset:05d}.tif"), plane)
+
+    run_bounded(executor, write_slab, bounds, workers)
+    return stop - start
+
+
+@traced('export')
+def export_region(path: str, output: str, level: int = 0, channels: Optional[Sequence[int]] = None,
+                  timepoint: Optional[int] = None, selection: Optional[Sequence[slice]] = None,
+                  output_format: str = 'zarr', chunks: Optional[Sequence[int]] = None, compressor='default',
+                  pyramid: bool = False, target_size: int = DEFAULT_TARGET_SIZE, labels: bool = False,
+                  workers: Optional[int] = None) -> Tuple[int, ...]:
+    """
+    Streams a region of one resolution level of an IMS-layout store or .ims file to `output`,
+    chunk by chunk: either a new IMS-layout Zarr store ('.zarr' directory or '.zip' container)
+    that the reader opens like a converted volume, or a directory of TIFF planes per channel.
+
+    `channels` are channel positions (all by default), `timepoint` a timepoint number (by default
+    the first one), `selection` voxel slices of the level (the whole level by default).
+    For Zarr outputs, `chunks` and `compressor` default to those of the source, and `pyramid`
+    adds coarser levels computed block-wise from the exported region (see pyramid.add_levels).
+    Returns the shape of the exported region.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Use one of {list(FORMATS)}.")
+    arrays = level_arrays(path, level, timepoint)
+    if arrays is None:
+        raise ValueError(f"{path} is not an IMS-layout store or .ims file.")
+    channels = list(arrays) if channels is None else list(channels)
+    missing = [c for c in channels if c not in arrays]
+    if missing:
+        raise ValueError(f"Channels {missing} not found. Available channels: {list(arrays)}")
+    level_shape = arrays[channels[0]].shape
+    selection = clip_selection(selection, level_shape)
+    shape = tuple(s.stop - s.start for s in selection)
+
+    # The caller's threading policy is left as is (exports also run from the viewer)
+    workers = workers or resolve_threading(BULK)[0]
+    log(f"Exporting {shape} voxels of level {level} for channels {channels} to {output}")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if output_format == 'tiff':
+            os.makedirs(output, exist_ok=True)
+            for channel in channels:
+                with span('export_channel', channel=channel):
+                    export_planes(arrays[channel], selection, output, f"Channel{channel}", executor, workers)
+            if pyramid:
+                log("--pyramid is only supported for Zarr outputs, skipping.")
+            return shape
+
+        store = create_store(output)
+        root = zarr.open(store, mode='w')
+        dataset = root.create_group('DataSet')
+        for channel in channels:
+            group = dataset.create_group(f"{LEVEL_PREFIX}0/{TIMEPOINT_PREFIX}0/{CHANNEL_PREFIX}{channel}")
+            source = arrays[channel]
+            # Zarr sources keep their codec, HDF5 sources get Zarr's default one
+            channel_compressor = getattr(source.array, 'compressor', 'default') if compressor == 'default' else compressor
+            with span('export_channel', channel=channel):
+                export_chunks(source, selection, group, chunks, channel_compressor, executor, workers)
+
+    info = root.create_group('DataSetInfo/Image')
+    lo, hi = region_extent(source_image_info(path), level_shape, selection)
+    # Imaris numbers the axes X=0, Y=1, Z=2
+    extents = {}
+    for axis, (a, b) in enumerate(zip(reversed(lo), reversed(hi))):
+        extents[f'ExtMin{axis}'] = str(a)
+        extents[f'ExtMax{axis}'] = str(b)
+    info.attrs.update(extents)
+
+    if pyramid:
+        with span('build_pyramid'):
+            added = add_levels(dataset, target_size, 'mode' if labels else 'mean', workers)
+        log(f"Added {added} resolution level(s)")
+    finalize_store(store)
+    return shape
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a region of an IMS-layout store or .ims file "
+                                                 "to a new Zarr store or to TIFF planes.")
+    parser.add_argument('path', help="IMS-layout .zarr store, .zip container or .ims file")
+    parser.add_argument('output', help="output .zarr directory or .zip container, or directory of TIFF planes")
+    parser.add_argument('--level', type=int, default=0, help="resolution level to export (default: 0, the finest)")
+    parser.add_argument('--channels', type=lambda s: [int(v) for v in s.split(',')], default=None,
+                        help="comma-separated channel positions (default: all)")
+    parser.add_argument('--timepoint', type=int, default=None, help="timepoint number (default: the first one)")
+    parser.add_argument('--box', type=parse_box, default=None,
+                        help="voxel bounding box of the level, Z0:Z1,Y0:Y1,X0:X1 (default: the whole level)")
+    parser.add_argument('--format', choices=FORMATS, default='zarr',
+                        help="'zarr' writes an IMS-layout store, 'tiff' one TIFF file per channel and Z plane")
+    parser.add_argument('--chunks', type=lambda s: tuple(int(v) for v in s.split(',')), default=None,
+                        help="Z,Y,X chunk shape of the Zarr output (default: the source chunk shape)")
+    parser.add_argument('--compressor', type=parse_compressor, default='default',
+                        help="'none' or Blosc CNAME[:LEVEL[:SHUFFLE]] (default: the source compressor)")
+    parser.add_argument('--pyramid', action='store_true',
+                        help="add resolution levels to the Zarr output until the coarsest level fits --target-size")
+    parser.add_argument('--target-size', type=int, default=DEFAULT_TARGET_SIZE,
+                        help="largest axis length of the coarsest level (with --pyramid)")
+    parser.add_argument('--labels', action='store_true',
+                        help="downsample with the most frequent value instead of the mean (with --pyramid)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of parallel workers (default: one per core)")
+    args = parser.parse_args(argv)
+
+    configure_threading(BULK, args.workers)
+    shape = export_region(args.path, args.output, args.level, args.channels, args.timepoint, args.box,
+                          args.format, args.chunks, args.compressor, args.pyramid, args.target_size,
+                          args.labels, args.workers)
+    print(f"Exported a {shape} region to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
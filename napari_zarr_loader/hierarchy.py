@@ -0,0 +1,128 @@
+# hierarchy.py
+
+import threading
+import numpy as np
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+from .instrumentation import log, span
+from .paths import store_signature
+from .pyramid import CHANNEL_PREFIX, LEVEL_PREFIX, TIMEPOINT_PREFIX, numbered_keys
+
+
+class HierarchyIndex:
+    """
+    Index of an IMS-layout hierarchy ('DataSet/ResolutionLevel N/TimePoint N/Channel N/Data').
+    `levels`, `timepoints` and `channels` hold the numbers of the groups in increasing order,
+    `shapes` the (levels, ndim) shapes of the level 'Data' arrays (first timepoint and channel),
+    each level coarser than the one before. Levels are addressed by position, 0 being the finest.
+    """
+
+    def __init__(self, levels: Sequence[int], timepoints: Sequence[int], channels: Sequence[int], shapes):
+        self.levels = tuple(levels)
+        self.timepoints = tuple(timepoints)
+        self.channels = tuple(channels)
+        self.shapes = np.asarray(shapes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def level_shape(self, level: int) -> Tuple[int, ...]:
+        return tuple(int(n) for n in self.shapes[level])
+
+    def group_path(self, level: int, timepoint: int, channel: int) -> str:
+        """Returns the path, relative to 'DataSet', of a channel group; `level` is a position, the others numbers."""
+        return f"{LEVEL_PREFIX}{self.levels[level]}/{TIMEPOINT_PREFIX}{timepoint}/{CHANNEL_PREFIX}{channel}"
+
+    def channel_paths(self, level: int, timepoint: Optional[int] = None) -> List[str]:
+        """Returns the channel group paths of a level at `timepoint` (by default the first one)."""
+        timepoint = self.timepoints[0] if timepoint is None else timepoint
+        return [self.group_path(level, timepoint, channel) for channel in self.channels]
+
+    def iter_groups(self) -> Iterator[str]:
+        """Iterates over the paths of all channel groups, level by level."""
+        for level in range(len(self.levels)):
+            for timepoint in self.timepoints:
+                yield from self.channel_paths(level, timepoint)
+
+    def check_level(self, level: int) -> None:
+        if level < 0 or level >= len(self.levels):
+            raise ValueError(f"resolution_level {level} is out of bounds. Available levels: 0 to {len(self.levels) - 1}")
+
+    def check_timepoint(self, timepoint: Optional[int]) -> None:
+        if timepoint is not None and timepoint not in self.timepoints:
+            raise ValueError(f"TimePoint {timepoint} not found. Available timepoints: {list(self.timepoints)}")
+
+
+def _suffix(name: str, prefix: str) -> int:
+    return int(name[len(prefix):])
+
+
+def data_shape(channel_group) -> Tuple[int, ...]:
+    return tuple(channel_group['Data'].shape)
+
+
+def build_index(dataset, shape_of: Callable = data_shape) -> HierarchyIndex:
+    """
+    Indexes the 'DataSet' group of a Zarr or HDF5 hierarchy: group names are ordered by their
+    numeric suffix (ResolutionLevel 10 after ResolutionLevel 2), and levels that are not coarser
+    than the previous one, or that lack the first channel's 'Data' array, end the level list.
+    `shape_of` returns the shape of a level from its first channel group.
+    """
+    level_names = numbered_keys(dataset, LEVEL_PREFIX)
+    if not level_names:
+        raise ValueError("No ResolutionLevel group found in the DataSet group.")
+    first = dataset[level_names[0]]
+    timepoint_names = numbered_keys(first, TIMEPOINT_PREFIX)
+    if not timepoint_names:
+        raise ValueError("No TimePoint group found in the first resolution level.")
+    channel_names = numbered_keys(first[timepoint_names[0]], CHANNEL_PREFIX)
+    if not channel_names:
+        raise ValueError("No Channel group found in the first timepoint.")
+
+    levels, shapes = [], []
+    for name in level_names:
+        path = f"{name}/{timepoint_names[0]}/{channel_names[0]}"
+        if f"{path}/Data" not in dataset:
+            log(f"Ignoring {name} and the following levels: no {path}/Data array.")
+            break
+        shape = tuple(shape_of(dataset[path]))
+        if shapes and (len(shape) != len(shapes[-1]) or any(n > p for n, p in zip(shape, shapes[-1]))
+                       or shape == shapes[-1]):
+            log(f"Ignoring {name} and the following levels: shape {shape} is not coarser than {shapes[-1]}.")
+            break
+        levels.append(_suffix(name, LEVEL_PREFIX))
+        shapes.append(shape)
+    return HierarchyIndex(levels, [_suffix(t, TIMEPOINT_PREFIX) for t in timepoint_names],
+                          [_suffix(c, CHANNEL_PREFIX) for c in channel_names], shapes)
+
+
+# Indices by store path, with the store signature they were built at
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def hierarchy_index(dataset, path: Optional[str] = None, shape_of: Callable = data_shape) -> HierarchyIndex:
+    """
+    Returns the index of the 'DataSet' group `dataset`. With the `path` of the store, the index
+    is built once and reused until levels are added or removed (see paths.store_signature).
+    """
+    if path is None:
+        return build_index(dataset, shape_of)
+    signature = store_signature(path)
+    with _indices_lock:
+        cached = _indices.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with span('build_index', path=path):
+        index = build_index(dataset, shape_of)
+    with _indices_lock:
+        _indices[path] = (signature, index)
+    return index
+
+
+def cached_index(path: str) -> Optional[HierarchyIndex]:
+    """Returns the index of the store at `path` if a reader built it and it is still current."""
+    with _indices_lock:
+        cached = _indices.get(path)
+    if cached is not None and cached[0] == store_signature(path):
+        return cached[1]
+    return None
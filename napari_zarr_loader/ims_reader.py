@@ -0,0 +1,111 @@
+# ims_reader.py
+
+import os
+import threading
+import h5py
+import numpy as np
+from typing import Any, List, Optional, Tuple
+from .chunked_array import ChunkedArray, to_dask
+from .hierarchy import hierarchy_index
+from .instrumentation import log, span, traced
+from .layers import attr_str, build_layers
+from .threading_policy import ensure_threading
+
+# Per-thread HDF5 file handles, so that dask workers never share a handle
+_handles = threading.local()
+
+
+def open_file(filename: str) -> h5py.File:
+    """
+    Returns the calling thread's read-only handle on an .ims file, opening it on first use.
+    """
+    files = getattr(_handles, 'files', None)
+    if files is None:
+        files = _handles.files = {}
+    ims_file = files.get(filename)
+    if ims_file is None or not ims_file.id.valid:
+        ims_file = files[filename] = h5py.File(filename, 'r')
+    return ims_file
+
+
+class ImsArray:
+    """
+    Lazy array-like over one 'Data' dataset of an .ims file, read through per-thread file handles.
+    Imaris pads the datasets up to whole chunks; `shape` is cropped to the actual image size.
+    """
+
+    def __init__(self, filename: str, path: str, shape: Tuple[int, ...]):
+        dataset = open_file(filename)[path]
+        self.filename = filename
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = dataset.dtype
+        self.chunks = tuple(min(c, n) for c, n in zip(dataset.chunks or dataset.shape, self.shape))
+        self.fill_value = dataset.fillvalue
+        self.cache_key = f"ims:{os.path.abspath(filename)}:{path}"
+
+    def __getitem__(self, selection) -> np.ndarray:
+        return open_file(self.filename)[self.path][selection]
+
+
+def image_shape(channel_group) -> Tuple[int, ...]:
+    """
+    Returns the (Z, Y, X) image size of a channel group from its ImageSize attributes,
+    falling back to the shape of its 'Data' dataset.
+    """
+    shape = channel_group['Data'].shape
+    try:
+        size = tuple(int(attr_str(channel_group.attrs[f'ImageSize{axis}'])) for axis in 'ZYX')
+    except (KeyError, ValueError):
+        return shape
+    return shape[:-3] + tuple(min(s, n) for s, n in zip(size, shape[-3:]))
+
+
+def histogram_limits(channel_group) -> Optional[List[float]]:
+    """Returns the [HistogramMin, HistogramMax] attributes Imaris stores on channel groups, or None."""
+    try:
+        lo, hi = (float(attr_str(channel_group.attrs[name])) for name in ('HistogramMin', 'HistogramMax'))
+    except (KeyError, ValueError):
+        return None
+    return [lo, hi] if hi >= lo else None
+
+
+@traced('ims_reader')
+def ims_reader(path: str, resolution_level: int = 0) -> List[Tuple[Any, dict]]:
+    """
+    Reads an Imaris .ims file in place and returns data and metadata for napari.
+    The 'DataSet/ResolutionLevel/TimePoint/Channel/Data' hierarchy is mapped onto lazy arrays
+    sharing the decoded-chunk cache with the Zarr reader.
+    """
+    ensure_threading()
+    with span('open_store', path=path):
+        ims_file = open_file(path)
+    dataset = ims_file['DataSet']
+
+    index = hierarchy_index(dataset, path, image_shape)
+    num_levels = len(index)
+    log(f"Available resolution levels: {num_levels}")
+    index.check_level(resolution_level)
+
+    # Assume single time point for simplicity, as the Zarr reader does
+    channel_paths = index.channel_paths(resolution_level)
+    log(f"Number of channels: {len(channel_paths)}")
+
+    chunked_arrays = []
+    channel_arrays = []
+    for channel_path in channel_paths:
+        ch_group = dataset[channel_path]
+        array = ImsArray(path, ch_group['Data'].name, image_shape(ch_group))
+        chunked = ChunkedArray(array)
+        chunked_arrays.append(chunked)
+        channel_arrays.append(to_dask(chunked))
+
+    # .ims files have no summary index: contrast limits come from the histogram range Imaris
+    # stores with the full-resolution channels, or else from the few chunks of the coarsest level
+    limits = [histogram_limits(dataset[p]) for p in index.channel_paths(0)]
+    coarsest = [ChunkedArray(ImsArray(path, dataset[p]['Data'].name, image_shape(dataset[p])))
+                for p in index.channel_paths(num_levels - 1)]
+
+    image_info = ims_file['DataSetInfo/Image'].attrs if 'DataSetInfo/Image' in ims_file else None
+    return build_layers(path, chunked_arrays, channel_arrays, num_levels, image_info, resolution_level,
+                        limits, coarsest)
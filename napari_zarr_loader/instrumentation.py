@@ -0,0 +1,188 @@
+# instrumentation.py
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+from .settings import get_setting
+
+# Category of the events in the Chrome trace
+CATEGORY = 'napari-zarr-loader'
+# Returned by span() while instrumentation is off, so that disabled spans cost one global lookup
+_NULL_SPAN = nullcontext()
+
+
+class Recorder:
+    """
+    Collects timed spans, instant messages and counters from all threads.
+    Events are (name, start ns, duration ns or None for instants, thread id, args) tuples,
+    with times relative to the creation of the recorder. `max_events` keeps only the latest events.
+    """
+
+    def __init__(self, max_events: Optional[int] = None):
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter_ns()
+        self.events = deque(maxlen=max_events)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def now(self) -> int:
+        return time.perf_counter_ns() - self.origin
+
+    def add(self, name: str, start: int, duration: Optional[int], args: dict) -> None:
+        # deque.append is atomic, no lock needed
+        self.events.append((name, start - self.origin, duration, threading.get_ident(), args))
+
+    def count(self, name: str, n: int) -> None:
+        with self.lock:
+            self.counters[name] += n
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'args', 'start')
+
+    def __init__(self, recorder: Recorder, name: str, args: dict):
+        self.recorder, self.name, self.args = recorder, name, args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+_recorder: Optional[Recorder] = None
+
+
+def enable(max_events: Optional[int] = None) -> Recorder:
+    """Starts recording (keeping the current recorder if already on) and returns the recorder."""
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder(max_events)
+    return _recorder
+
+
+def disable() -> Optional[Recorder]:
+    """Stops recording and returns the recorder holding what was recorded, if any."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def is_enabled() -> bool:
+    return _recorder is not None
+
+
+def get_recorder() -> Optional[Recorder]:
+    return _recorder
+
+
+def span(name: str, /, **args):
+    """Context manager timing the enclosed block under `name`; `args` are shown in the trace."""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, args)
+
+
+def traced(name: str):
+    """Decorator timing every call of the function under `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _Span(_recorder, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, n: int = 1) -> None:
+    """Adds `n` to the counter `name` (bytes read, chunks decoded, cache hits...)."""
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+
+def log(message: str) -> None:
+    """Prints a diagnostic message, also recorded as an instant event of the trace while recording."""
+    print(message)
+    if _recorder is not None:
+        _recorder.add('log', time.perf_counter_ns(), None, {'message': message})
+
+
+def chrome_trace(recorder: Recorder) -> dict:
+    """Returns the recorded events in the Chrome trace event format (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    events = []
+    end = 0
+    for name, start, duration, tid, args in list(recorder.events):
+        event = {'name': name, 'cat': CATEGORY, 'ts': start / 1000, 'pid': pid, 'tid': tid, 'args': args}
+        if duration is None:
+            event.update(ph='i', s='t')
+        else:
+            event.update(ph='X', dur=duration / 1000)
+        events.append(event)
+        end = max(end, start + (duration or 0))
+    # Counters are reported with their final values at the end of the trace
+    for name, value in sorted(recorder.counters.items()):
+        events.append({'name': name, 'cat': CATEGORY, 'ph': 'C', 'ts': end / 1000, 'pid': pid, 'tid': 0,
+                       'args': {name: value}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(recorder: Recorder, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(recorder), f)
+
+
+def summary(recorder: Recorder) -> List[Tuple[str, int, float, float, float]]:
+    """Returns (name, calls, total ms, mean ms, max ms) per span name, by decreasing total time."""
+    durations = defaultdict(list)
+    for name, _, duration, _, _ in list(recorder.events):
+        if duration is not None:
+            durations[name].append(duration / 1e6)
+    rows = [(name, len(d), sum(d), sum(d) / len(d), max(d)) for name, d in durations.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def format_summary(recorder: Recorder) -> str:
+    """Returns the span summary and the counters as a text table."""
+    lines = [f"{'span':<24} {'calls':>8} {'total ms':>12} {'mean ms':>10} {'max ms':>10}"]
+    for name, calls, total, mean, longest in summary(recorder):
+        lines.append(f"{name:<24} {calls:>8} {total:>12.1f} {mean:>10.2f} {longest:>10.2f}")
+    if recorder.counters:
+        lines.append('')
+        lines.append(f"{'counter':<24} {'value':>12}")
+        for name, value in sorted(recorder.counters.items()):
+            lines.append(f"{name:<24} {value:>12}")
+    return '\n'.join(lines)
+
+
+def _report(trace_file: str) -> None:
+    recorder = disable()
+    if recorder is None:
+        return
+    print(format_summary(recorder))
+    if trace_file:
+        write_chrome_trace(recorder, trace_file)
+        print(f"Wrote trace to {trace_file}")
+
+
+def configure_from_settings() -> None:
+    """
+    Starts recording when the 'instrument' setting is on or a 'trace_file' is set; the summary
+    is printed, and the Chrome trace written, when the process exits.
+    """
+    trace_file = get_setting('trace_file')
+    if (get_setting('instrument') or trace_file) and not is_enabled():
+        enable()
+        atexit.register(_report, trace_file)
+
+
+configure_from_settings()
@@ -0,0 +1,110 @@
+# layer_registry.py
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from napari.layers import Image
+from .chunked_array import to_dask
+from .contributions import napari_get_reader
+from .hierarchy import cached_index
+from .instrumentation import log
+
+
+class RegisteredLayer:
+    """An image layer opened by the plugin's readers, with its file, resolution level and channel."""
+
+    def __init__(self, layer: Image, file: str, level: int, channel: int, num_levels: int):
+        self.layer = layer
+        self.file = file
+        self.level = level
+        self.channel = channel
+        self.num_levels = num_levels
+
+
+class LayerRegistry:
+    """
+    Registry of the image layers of a viewer created by the plugin. The readers record the file,
+    level and channel of each layer in its metadata, so layers opened through File > Open, through
+    `viewer.open` or restored by other plugins are all found. Projection and region-of-interest
+    layers are not included.
+    """
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+
+    def entries(self) -> List[RegisteredLayer]:
+        entries = []
+        for layer in self.viewer.layers:
+            metadata = getattr(layer, 'metadata', {})
+            if not isinstance(layer, Image) or 'channel' not in metadata or 'fileName' not in metadata:
+                continue
+            # Regions of interest keep the level they were loaded at
+            if 'roi' in metadata:
+                continue
+            entries.append(RegisteredLayer(layer, metadata['fileName'], metadata.get('resolutionLevel', 0),
+                                           metadata['channel'], metadata.get('resolutionLevels', 1)))
+        return entries
+
+    def files(self) -> List[str]:
+        """Returns the files with layers in the viewer, in layer order."""
+        return list(dict.fromkeys(entry.file for entry in self.entries()))
+
+    def select(self, file: Optional[str] = None, layer_name: Optional[str] = None) -> List[RegisteredLayer]:
+        """Returns the layers of `file`, the layer named `layer_name`, or all layers if neither is given."""
+        return [entry for entry in self.entries()
+                if (file is None or entry.file == file) and (layer_name is None or entry.layer.name == layer_name)]
+
+
+def level_data(file: str, level: int, channels: Sequence[int]) -> Dict[int, Any]:
+    """
+    Returns the lazy arrays of `channels` at resolution `level` of `file`, by channel. IMS-layout
+    stores and .ims files only open the arrays of those channels, without computing statistics
+    or projections; other stores (OME-NGFF, whose reader only reads metadata) go through their reader.
+    """
+    # roi imports this module for RegisteredLayer
+    from .roi import level_arrays
+    arrays = level_arrays(file, level, channels=channels)
+    if arrays is not None:
+        return {channel: to_dask(chunked) for channel, chunked in arrays.items()}
+    reader = napari_get_reader(file)
+    if reader is None:
+        raise ValueError(f"The file '{file}' is not supported.")
+    return {meta['metadata']['channel']: data for data, meta in reader(file, resolution_level=level)
+            if meta.get('metadata', {}).get('channel') in channels}
+
+
+def set_resolution_level(entries: Iterable[RegisteredLayer], level: int) -> int:
+    """
+    Switches the given layers to resolution `level`. Only the channels of the layers not already
+    at that level are opened, once per file; names, colormaps and contrast limits are kept, and
+    the scale is adjusted so that each layer keeps its physical extent.
+    Returns the number of layers changed.
+    """
+    stale: Dict[str, List[RegisteredLayer]] = {}
+    for entry in entries:
+        if entry.level != level:
+            stale.setdefault(entry.file, []).append(entry)
+
+    changed = 0
+    for file, file_entries in stale.items():
+        # The hierarchy index built when the file was opened is current, the metadata may not be
+        index = cached_index(file)
+        num_levels = len(index) if index is not None else file_entries[0].num_levels
+        if not 0 <= level < num_levels:
+            log(f"resolution_level {level} is out of bounds for {file}. Available levels: 0 to {num_levels - 1}")
+            continue
+        try:
+            by_channel = level_data(file, level, [entry.channel for entry in file_entries])
+        except (ValueError, OSError) as e:
+            log(str(e))
+            continue
+        for entry in file_entries:
+            if entry.channel not in by_channel:
+                log(f"Channel {entry.channel} not found at level {level} of {file}.")
+                continue
+            data = by_channel[entry.channel]
+            scale = [s * old / new for s, old, new in zip(entry.layer.scale, entry.layer.data.shape, data.shape)]
+            entry.layer.data = data
+            entry.layer.scale = scale
+            entry.layer.metadata['resolutionLevel'] = level
+            entry.level = level
+            changed += 1
+    return changed
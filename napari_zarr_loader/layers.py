@@ -0,0 +1,108 @@
+# layers.py
+
+import numpy as np
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+from .instrumentation import log, span
+from .statistics import min_max
+
+
+def attr_str(value) -> str:
+    """
+    Returns an attribute value as a string. Imaris stores attributes as arrays of single
+    characters (e.g. [b'5', b'1', b'2']), which are joined back together.
+    """
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'S':
+            return b''.join(value.ravel().tolist()).decode()
+        return ' '.join(str(v) for v in value.ravel().tolist())
+    if isinstance(value, (list, tuple)):
+        return ''.join(attr_str(v) for v in value)
+    return str(value)
+
+
+def image_extent(image_info: Mapping) -> Optional[Tuple[List[float], List[float]]]:
+    """
+    Returns the (Z, Y, X) minimum and maximum corners of the image from the 'DataSetInfo/Image'
+    attributes, or None if they are missing.
+    """
+    if not all(f'{name}{axis}' in image_info for name in ('ExtMin', 'ExtMax') for axis in range(3)):
+        return None
+    # Imaris numbers the axes X=0, Y=1, Z=2 while the data is ordered Z, Y, X
+    return ([float(attr_str(image_info[f'ExtMin{axis}'])) for axis in (2, 1, 0)],
+            [float(attr_str(image_info[f'ExtMax{axis}'])) for axis in (2, 1, 0)])
+
+
+def build_layers(path: str, chunked_arrays: List, channel_arrays: List, num_levels: int,
+                 image_info: Optional[Mapping] = None, resolution_level: int = 0,
+                 contrast_limits: Optional[Sequence[Optional[List[float]]]] = None,
+                 statistics_arrays: Optional[List] = None) -> List[Tuple[Any, dict]]:
+    """
+    Returns the napari layer data (one image layer per channel) shared by the Zarr and IMS readers.
+    `image_info` holds the 'DataSetInfo/Image' attributes used to derive voxel sizes.
+    `contrast_limits` are per-channel limits known from the file metadata (None where unknown);
+    the others are computed from `statistics_arrays`, by default `chunked_arrays`.
+    The layer metadata records the file, the resolution level and the channel of each layer
+    (see layer_registry).
+    """
+    channel_names = [f'Channel {i}' for i in range(len(channel_arrays))]
+
+    # Prepare per-channel metadata
+    final_output = []
+    for idx, data in enumerate(channel_arrays):
+        # Prepare metadata for each channel
+        meta = {
+            'name': channel_names[idx],
+            'metadata': {
+                'fileName': path,
+                'resolutionLevels': num_levels,
+                'resolutionLevel': resolution_level,
+                'channel': idx,
+            },
+            'contrast_limits': None,  # Will compute below
+            'scale': (1.0, 1.0, 1.0),  # Adjust if voxel sizes are available
+        }
+
+        # Compute contrast limits for the channel
+        try:
+            known = contrast_limits[idx] if contrast_limits is not None else None
+            if known is not None:
+                meta['contrast_limits'] = list(known)
+            else:
+                with span('statistics', channel=idx):
+                    min_contrast, max_contrast = min_max((statistics_arrays or chunked_arrays)[idx])
+                meta['contrast_limits'] = [min_contrast, max_contrast]
+        except Exception as e:
+            log(f"Could not compute contrast limits for channel {idx}: {e}")
+            # Set default contrast limits based on data type
+            dtype = data.dtype
+            if dtype == np.dtype('uint16'):
+                meta['contrast_limits'] = [0, 65535]
+            elif dtype == np.dtype('uint8'):
+                meta['contrast_limits'] = [0, 255]
+            else:
+                meta['contrast_limits'] = [float(data.min().compute()), float(data.max().compute())]
+
+        # Attempt to extract voxel size from metadata
+        try:
+            if image_info is None:
+                raise KeyError("'DataSetInfo/Image' not found")
+            extent = image_extent(image_info)
+            if extent is not None:
+                voxel_sizes = [hi - lo for lo, hi in zip(*extent)]
+                # Calculate scale factors
+                dimensions = data.shape[-3:]  # Assuming the last three axes are Z, Y, X
+                scale = [vs / dim for vs, dim in zip(voxel_sizes, dimensions)]
+                meta['scale'] = scale
+            else:
+                log("Required voxel size attributes not found. Using default scale of 1.0.")
+        except Exception as e:
+            log(f"Could not extract voxel sizes from metadata: {e}")
+            # Use default scale of 1.0
+            meta['scale'] = (1.0, 1.0, 1.0)
+
+        # Append data and metadata to the final output
+        final_output.append((data, meta))
+
+    return final_output
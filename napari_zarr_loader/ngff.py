@@ -0,0 +1,213 @@
+# ngff.py
+
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+from .chunked_array import ChunkedArray, to_dask
+from .chunking import iter_chunk_slices, run_bounded
+from .ims_reader import image_shape
+from .instrumentation import log, traced
+from .layers import attr_str
+from .pyramid import CHANNEL_PREFIX, LEVEL_PREFIX, TIMEPOINT_PREFIX, numbered_keys
+from .storage import open_zarr
+from .threading_policy import ensure_threading
+
+NGFF_VERSION = '0.4'
+AXES = [
+    {'name': 't', 'type': 'time'},
+    {'name': 'c', 'type': 'channel'},
+    {'name': 'z', 'type': 'space', 'unit': 'micrometer'},
+    {'name': 'y', 'type': 'space', 'unit': 'micrometer'},
+    {'name': 'x', 'type': 'space', 'unit': 'micrometer'},
+]
+# Spatial chunk shape used when the IMS datasets are not chunked
+DEFAULT_CHUNKS = (64, 256, 256)
+# Used when the IMS file does not define a channel color
+DEFAULT_COLORS = ['00FF00', 'FF00FF', '00FFFF', 'FF0000', '0000FF', 'FFFF00']
+
+
+def is_ngff(zarr_root) -> bool:
+    """Returns True if the Zarr hierarchy carries OME-NGFF multiscales metadata."""
+    return 'multiscales' in zarr_root.attrs
+
+
+def ims_voxel_size(ims_file, shape: Sequence[int]) -> Tuple[float, float, float]:
+    """
+    Returns the (Z, Y, X) voxel size of a level with the given image shape,
+    from the extents stored in 'DataSetInfo/Image'. Defaults to 1.0 if they are missing.
+    """
+    try:
+        info = ims_file['DataSetInfo/Image'].attrs
+        extents = [float(attr_str(info[f'ExtMax{i}'])) - float(attr_str(info[f'ExtMin{i}'])) for i in (2, 1, 0)]
+    except (KeyError, ValueError):
+        return (1.0, 1.0, 1.0)
+    return tuple(e / n for e, n in zip(extents, shape[-3:]))
+
+
+def ims_channel_info(ims_file, index: int) -> Tuple[str, str]:
+    """Returns the name and hex color of a channel, from 'DataSetInfo/Channel N'."""
+    name, color = f'Channel {index}', DEFAULT_COLORS[index % len(DEFAULT_COLORS)]
+    info = ims_file.get(f'DataSetInfo/Channel {index}')
+    if info is None:
+        return name, color
+    if 'Name' in info.attrs and attr_str(info.attrs['Name']).strip():
+        name = attr_str(info.attrs['Name']).strip()
+    try:
+        rgb = [float(v) for v in attr_str(info.attrs['Color']).split()]
+        color = ''.join(f'{int(round(v * 255)):02X}' for v in rgb[:3])
+    except (KeyError, ValueError):
+        pass
+    return name, color
+
+
+def write_ngff(ims_file, root, workers: int = 1, chunks: Optional[Sequence[int]] = None,
+               compressor='default') -> None:
+    """
+    Writes every resolution level of an .ims file as an OME-NGFF multiscale image into `root`.
+    Arrays are (T, C, Z, Y, X) with one channel and timepoint per chunk, chunks holding only the
+    fill value are skipped, and the contrast window of each channel is computed while copying level 0
+    and stored in the 'omero' rendering metadata.
+    """
+    dataset = ims_file['DataSet']
+    levels = numbered_keys(dataset, LEVEL_PREFIX)
+    level0 = dataset[levels[0]]
+    timepoints = numbered_keys(level0, TIMEPOINT_PREFIX)
+    channels = numbered_keys(level0[timepoints[0]], CHANNEL_PREFIX)
+
+    base_shape = image_shape(level0[timepoints[0]][channels[0]])
+    base_voxel = ims_voxel_size(ims_file, base_shape)
+
+    lock = threading.Lock()
+    windows = [[np.inf, -np.inf] for _ in channels]
+    datasets = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for n, level in enumerate(levels):
+            source0 = dataset[level][timepoints[0]][channels[0]]
+            shape = image_shape(source0)
+            spatial_chunks = tuple(chunks or source0['Data'].chunks or DEFAULT_CHUNKS)
+            spatial_chunks = tuple(min(c, s) for c, s in zip(spatial_chunks, shape))
+            array = root.create_dataset(str(n), shape=(len(timepoints), len(channels)) + shape,
+                                        chunks=(1, 1) + spatial_chunks, dtype=source0['Data'].dtype,
+                                        compressor=compressor, dimension_separator='/',
+                                        write_empty_chunks=False, overwrite=True)
+            fill_value = array.fill_value
+
+            for t, timepoint in enumerate(timepoints):
+                for c, channel in enumerate(channels):
+                    source = dataset[level][timepoint][channel]['Data']
+
+                    def copy_chunk(selection, source=source, t=t, c=c, n=n):
+                        block = source[selection]
+                        if n == 0 and block.size:
+                            with lock:
+                                windows[c][0] = min(windows[c][0], block.min())
+                                windows[c][1] = max(windows[c][1], block.max())
+                        if np.any(block != fill_value):
+                            array[(t, c) + selection] = block
+
+                    run_bounded(executor, copy_chunk, iter_chunk_slices(shape, spatial_chunks), 2 * workers)
+
+            factors = [b / s for b, s in zip(base_shape, shape)]
+            datasets.append({
+                'path': str(n),
+                'coordinateTransformations': [
+                    {'type': 'scale', 'scale': [1.0, 1.0] + [v * f for v, f in zip(base_voxel, factors)]},
+                ],
+            })
+            log(f"Wrote {level} as NGFF dataset '{n}' with shape {array.shape}")
+
+    multiscales = [{
+        'version': NGFF_VERSION,
+        'name': 'DataSet',
+        'axes': AXES,
+        'datasets': datasets,
+        'type': 'mean',
+    }]
+
+    dtype_max = float(np.iinfo(array.dtype).max) if np.issubdtype(array.dtype, np.integer) else None
+    omero_channels = []
+    for c in range(len(channels)):
+        name, color = ims_channel_info(ims_file, c)
+        lo, hi = (float(w) for w in windows[c])
+        omero_channels.append({
+            'label': name,
+            'color': color,
+            'active': True,
+            'window': {'start': lo, 'end': hi, 'min': 0.0 if dtype_max else lo, 'max': dtype_max or hi},
+        })
+    omero = {
+        'version': NGFF_VERSION,
+        'channels': omero_channels,
+        'rdefs': {'defaultT': 0, 'defaultZ': base_shape[0] // 2, 'model': 'color'},
+    }
+    # Written at once: zip containers cannot rewrite the attributes object
+    root.attrs.update({'multiscales': multiscales, 'omero': omero})
+
+
+@traced('ngff_reader')
+def ngff_reader(path: str, resolution_level: int = 0, zarr_root=None) -> List[Tuple[Any, dict]]:
+    """
+    Reads an OME-NGFF multiscale image straight from its metadata: the levels come from the
+    'multiscales' datasets, the scale from their coordinate transformations and the contrast
+    limits from the 'omero' channel windows, without listing groups or scanning voxels.
+    """
+    ensure_threading()
+    zarr_root = zarr_root if zarr_root is not None else open_zarr(path)
+    multiscales = zarr_root.attrs['multiscales'][0]
+    datasets = multiscales['datasets']
+    num_levels = len(datasets)
+    log(f"Available resolution levels: {num_levels}")
+    if resolution_level < 0 or resolution_level >= num_levels:
+        raise ValueError(f"resolution_level {resolution_level} is out of bounds. Available levels: 0 to {num_levels - 1}")
+
+    axes = [axis['name'] if isinstance(axis, dict) else axis for axis in multiscales.get('axes', [])]
+    level = datasets[resolution_level]
+    array = zarr_root[level['path']]
+    if not axes:
+        axes = ['t', 'c', 'z', 'y', 'x'][-array.ndim:]
+    data = to_dask(ChunkedArray(array))
+
+    scale = [1.0] * array.ndim
+    for transform in level.get('coordinateTransformations', []):
+        if transform.get('type') == 'scale':
+            scale = transform['scale']
+    spatial = [i for i, name in enumerate(axes) if name not in ('t', 'c')]
+
+    num_channels = array.shape[axes.index('c')] if 'c' in axes else 1
+    omero_channels = zarr_root.attrs.get('omero', {}).get('channels', [])
+    log(f"Number of channels: {num_channels}")
+
+    final_output = []
+    for c in range(num_channels):
+        # Assume single time point for simplicity, as the IMS-layout reader does
+        index = tuple(0 if name == 't' else c if name == 'c' else slice(None) for name in axes)
+        channel_data = data[index]
+        info = omero_channels[c] if c < len(omero_channels) else {}
+        window = info.get('window')
+        if window is not None:
+            contrast_limits = [float(window['start']), float(window['end'])]
+        elif channel_data.dtype == np.dtype('uint16'):
+            contrast_limits = [0, 65535]
+        elif channel_data.dtype == np.dtype('uint8'):
+            contrast_limits = [0, 255]
+        else:
+            contrast_limits = [float(channel_data.min().compute()), float(channel_data.max().compute())]
+
+        meta = {
+            'name': info.get('label', f'Channel {c}'),
+            'metadata': {
+                'fileName': path,
+                'resolutionLevels': num_levels,
+                'resolutionLevel': resolution_level,
+                'channel': c,
+            },
+            'contrast_limits': contrast_limits,
+            'scale': [float(scale[i]) for i in spatial],
+        }
+        if 'color' in info:
+            meta['colormap'] = f"#{info['color']}"
+        final_output.append((channel_data, meta))
+
+    return final_output
@@ -0,0 +1,145 @@
+# paths.py
+"""
+Path classification and store sniffing used while napari picks a reader. This module is
+imported at plugin discovery, so it only depends on the standard library.
+"""
+
+import json
+import os
+import threading
+import zipfile
+from typing import Optional
+
+# Single-file container: all chunks of a volume live in one uncompressed zip archive
+ZIP_SUFFIXES = ('.zarr.zip', '.zip')
+# Store layouts told apart by sniffing: the IMS hierarchy written by the converter,
+# OME-NGFF multiscale images, and plain Zarr arrays (not read by this plugin)
+IMS_LAYOUT = 'ims'
+NGFF_LAYOUT = 'ngff'
+ARRAY_LAYOUT = 'array'
+READABLE_LAYOUTS = (IMS_LAYOUT, NGFF_LAYOUT)
+
+# Sniffed layouts by path, with the signature (modification time, size) they were sniffed at
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+def is_url(path: str) -> bool:
+    """Returns True for URL-addressed stores (http(s)://, file:// and other fsspec protocols)."""
+    return '://' in path
+
+
+def is_zip_path(path: str) -> bool:
+    return path.lower().endswith(ZIP_SUFFIXES)
+
+
+def _layout_from(has_key, read_json) -> Optional[str]:
+    """
+    Classifies a store from its root '.zattrs' (OME-NGFF multiscales take precedence, as in
+    the reader) and the presence of 'DataSet/.zgroup' or '.zarray'.
+    """
+    if has_key('.zattrs') and 'multiscales' in read_json('.zattrs'):
+        return NGFF_LAYOUT
+    if has_key('DataSet/.zgroup'):
+        return IMS_LAYOUT
+    if has_key('.zarray'):
+        return ARRAY_LAYOUT
+    return None
+
+
+def _read_json(read, key: str) -> dict:
+    try:
+        value = json.loads(read(key))
+    except (OSError, KeyError, ValueError):
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def _sniff_directory(path: str) -> Optional[str]:
+    def read(key):
+        with open(os.path.join(path, key), 'rb') as f:
+            return f.read()
+    return _layout_from(lambda key: os.path.isfile(os.path.join(path, key)), lambda key: _read_json(read, key))
+
+
+def _sniff_zip(path: str) -> Optional[str]:
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = set(archive.namelist())
+            return _layout_from(names.__contains__, lambda key: _read_json(archive.read, key))
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def store_layout(path: str) -> Optional[str]:
+    """
+    Returns the layout of a local Zarr directory or zip container (IMS_LAYOUT, NGFF_LAYOUT,
+    ARRAY_LAYOUT, or None for anything else), reading at most the root '.zattrs'.
+    Layouts found are cached until the store's modification time or size changes, so the reader
+    reuses the classification made while sniffing. Remote stores are not sniffed: their
+    layout is whatever the reader recorded with remember_layout(), or None.
+    """
+    if is_url(path):
+        with _layouts_lock:
+            return _layouts.get(path, (None, None))[1]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _layouts_lock:
+        cached = _layouts.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    layout = _sniff_directory(path) if os.path.isdir(path) else _sniff_zip(path)
+    # Stores not recognised yet may still be being written, they are sniffed again next time
+    if layout is not None:
+        with _layouts_lock:
+            _layouts[path] = (signature, layout)
+    return layout
+
+
+def store_signature(path: str):
+    """
+    Returns a value that changes when resolution levels are added to or removed from a store:
+    the modification time of its 'DataSet' directory, or of the zip container or .ims file.
+    None for remote stores, which are considered unchanged for the session.
+    """
+    if is_url(path):
+        return None
+    return file_signature(os.path.join(path, 'DataSet') if os.path.isdir(path) else path)
+
+
+def file_signature(path: str):
+    """Returns the modification time and size of a local file or directory, None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def remember_layout(path: str, layout: Optional[str]) -> None:
+    """Records the layout of a remote store found by the reader, for later reads of the same URL."""
+    if is_url(path):
+        with _layouts_lock:
+            _layouts[path] = (None, layout)
+
+
+def reader_kind(path) -> Optional[str]:
+    """
+    Returns 'zarr' for IMS-layout and OME-NGFF Zarr stores (directories, zip containers and
+    URLs), 'ims' for Imaris files and None for anything else, including plain Zarr arrays.
+    Local stores are sniffed (see store_layout); URLs are accepted by suffix.
+    """
+    if not isinstance(path, str):
+        return None
+    if is_url(path):
+        if not path.rstrip('/').endswith('.zarr'):
+            return None
+        return 'zarr' if store_layout(path) in READABLE_LAYOUTS + (None,) else None
+    if path.lower().endswith('.ims'):
+        return 'ims' if os.path.isfile(path) else None
+    if (path.endswith('.zarr') and os.path.isdir(path)) or (is_zip_path(path) and os.path.isfile(path)):
+        return 'zarr' if store_layout(path) in READABLE_LAYOUTS else None
+    return None
@@ -0,0 +1,96 @@
+# performance.py
+
+import time
+from collections import deque
+from typing import Dict, Optional
+from . import instrumentation
+from .async_fetch import fetch_queue_depth
+from .chunk_cache import get_chunk_cache
+
+# Events kept while the monitor runs the recorder itself; older ones are dropped
+MAX_EVENTS = 50000
+# Metrics shown by the performance widget: key, label, unit
+METRICS = [
+    ('latency_ms', 'Slice request latency', 'ms'),
+    ('throughput_mb_s', 'Chunk throughput', 'MB/s'),
+    ('hit_ratio', 'Cache hit ratio', '%'),
+    ('queue_depth', 'Fetch queue depth', 'reads'),
+    ('memory_mb', 'Chunk cache memory', 'MB'),
+]
+
+
+def _mean(values) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+class PerformanceMonitor:
+    """
+    Turns the reader's instrumentation into one sample of metrics per call to `sample()`,
+    covering the time since the previous sample:
+
+    - latency_ms: mean duration of the slice requests answered by the readers;
+    - fetch_ms / decode_ms: mean duration of the chunk batch fetches and of the chunk decodes,
+      which tell storage from decompression; a slow view with fast requests is spent rendering;
+    - throughput_mb_s: decoded chunk bytes per second;
+    - hit_ratio: fraction of the chunk lookups answered by the chunk cache (None without lookups);
+    - queue_depth: chunk reads queued or in flight in the fetch engine;
+    - memory_mb: memory held by the decoded-chunk cache, i.e. by the voxels of the plugin's layers.
+
+    The last `history` samples are kept in `samples`. The monitor starts recording if the
+    instrumentation is off, and stops it again in `stop()`.
+    """
+
+    def __init__(self, history: int = 120):
+        self.samples = deque(maxlen=history)
+        self._owns_recorder = False
+        self._last_time = None
+        self._last_counters: Dict[str, int] = {}
+
+    def start(self) -> None:
+        if not instrumentation.is_enabled():
+            instrumentation.enable(MAX_EVENTS)
+            self._owns_recorder = True
+        recorder = instrumentation.get_recorder()
+        self._last_time = recorder.now()
+        self._last_counters = dict(recorder.counters)
+
+    def stop(self) -> None:
+        if self._owns_recorder:
+            instrumentation.disable()
+            self._owns_recorder = False
+        self._last_time = None
+
+    def sample(self) -> Optional[dict]:
+        """Computes the metrics since the previous sample, appends them to `samples` and returns them."""
+        recorder = instrumentation.get_recorder()
+        if recorder is None or self._last_time is None:
+            return None
+        now = recorder.now()
+        durations = {'slice_request': [], 'chunk_fetch': [], 'chunk_decode': []}
+        # Events are appended as they end, the newest ones last
+        for name, start, duration, _, _ in reversed(list(recorder.events)):
+            if duration is None:
+                continue
+            if start + duration <= self._last_time:
+                break
+            if name in durations:
+                durations[name].append(duration / 1e6)
+
+        counters = dict(recorder.counters)
+        delta = {name: counters.get(name, 0) - self._last_counters.get(name, 0)
+                 for name in ('bytes_decoded', 'cache_hits', 'cache_misses')}
+        lookups = delta['cache_hits'] + delta['cache_misses']
+        seconds = max(now - self._last_time, 1) / 1e9
+        sample = {
+            'time': time.time(),
+            'latency_ms': _mean(durations['slice_request']),
+            'fetch_ms': _mean(durations['chunk_fetch']),
+            'decode_ms': _mean(durations['chunk_decode']),
+            'throughput_mb_s': delta['bytes_decoded'] / 2**20 / seconds,
+            'hit_ratio': delta['cache_hits'] / lookups if lookups else None,
+            'queue_depth': fetch_queue_depth(),
+            'memory_mb': get_chunk_cache().nbytes / 2**20,
+        }
+        self._last_time, self._last_counters = now, counters
+        self.samples.append(sample)
+        return sample
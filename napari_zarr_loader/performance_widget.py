@@ -0,0 +1,87 @@
+# performance_widget.py
+
+from qtpy.QtCore import QPointF, Qt, QTimer
+from qtpy.QtGui import QColor, QPainter, QPen, QPolygonF
+from qtpy.QtWidgets import QFormLayout, QLabel, QSizePolicy, QVBoxLayout, QWidget
+from .performance import METRICS, PerformanceMonitor
+
+# Refresh period of the charts
+INTERVAL_MS = 1000
+
+
+class Sparkline(QWidget):
+    """Line chart of the recent values of one metric, scaled to its maximum."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = []
+        self.setMinimumHeight(36)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def set_values(self, values) -> None:
+        self.values = [0.0 if v is None else float(v) for v in values]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(38, 41, 48))
+        if len(self.values) < 2:
+            return
+        top = max(max(self.values), 1e-9)
+        width, height = self.width() - 1, self.height() - 2
+        step = width / (len(self.values) - 1)
+        points = [QPointF(i * step, 1 + height * (1 - v / top)) for i, v in enumerate(self.values)]
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor(0, 170, 255), 1.5))
+        painter.drawPolyline(QPolygonF(points))
+
+
+class PerformanceWidget(QWidget):
+    """
+    Dock widget charting the plugin's I/O and cache metrics (see PerformanceMonitor) once per
+    second while it is shown. Recording starts when the widget is shown and stops when it is hidden.
+    """
+
+    def __init__(self, napari_viewer=None, parent=None):
+        super().__init__(parent)
+        self.viewer = napari_viewer
+        self.monitor = PerformanceMonitor()
+        self.values, self.charts = {}, {}
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        for key, label, unit in METRICS:
+            self.values[key] = QLabel('-')
+            self.values[key].setAlignment(Qt.AlignRight)
+            form.addRow(f"{label} ({unit})", self.values[key])
+            self.charts[key] = Sparkline(self)
+            form.addRow(self.charts[key])
+        layout.addLayout(form)
+        # Mean fetch and decode times tell slow storage from slow decompression
+        self.breakdown = QLabel('-')
+        layout.addWidget(self.breakdown)
+        layout.addStretch()
+        self.timer = QTimer(self)
+        self.timer.setInterval(INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.monitor.start()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        self.monitor.stop()
+        super().hideEvent(event)
+
+    def refresh(self) -> None:
+        sample = self.monitor.sample()
+        if sample is None:
+            return
+        samples = list(self.monitor.samples)
+        for key, _, unit in METRICS:
+            scale = 100 if unit == '%' else 1
+            value = sample[key]
+            self.values[key].setText('-' if value is None else f"{value * scale:.1f}")
+            self.charts[key].set_values([s[key] * scale if s[key] is not None else None for s in samples])
+        self.breakdown.setText(f"fetch {sample['fetch_ms']:.1f} ms / batch, decode {sample['decode_ms']:.2f} ms / chunk")
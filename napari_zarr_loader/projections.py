@@ -0,0 +1,177 @@
+# projections.py
+
+import argparse
+import numpy as np
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+from .chunked_array import ChunkedArray, open_chunked, to_dask, write_occupancy
+from .chunking import chunk_grid_shape, chunk_slices, run_bounded
+from .instrumentation import log
+from .pyramid import (CHANNEL_PREFIX, DEFAULT_TARGET_SIZE, LEVEL_PREFIX, TIMEPOINT_PREFIX,
+                      add_levels, numbered_keys)
+from .statistics import min_max
+from .threading_policy import BULK, configure_threading, resolve_threading
+
+# Projections are stored as 'Projections/<Kind> <Axis>/ResolutionLevel N/TimePoint T/Channel C/Data'
+PROJECTIONS_GROUP = 'Projections'
+# Projection axes, counted from the end of the (..., Z, Y, X) arrays
+AXES = {'Z': -3, 'Y': -2, 'X': -1}
+KINDS = ('max', 'mean')
+
+
+def projection_name(kind: str, axis: str) -> str:
+    return f"{kind.capitalize()} {axis}"
+
+
+def parse_projection_name(name: str) -> Optional[Tuple[str, str]]:
+    """Returns the (kind, axis) of a projection group name, or None for other names."""
+    kind, _, axis = name.partition(' ')
+    kind = kind.lower()
+    return (kind, axis) if kind in KINDS and axis in AXES else None
+
+
+def project_chunk(source: ChunkedArray, target, index: Tuple[int, ...], axis: int, kind: str,
+                  clear_empty: bool = False) -> bool:
+    """
+    Computes the chunk at grid position `index` of the projection `target` of `source` along `axis`,
+    reading the source chunks along the axis one at a time, so that memory stays at one chunk.
+    With `clear_empty` a previously written chunk that is now empty is removed from the store.
+    Returns True if the chunk holds data.
+    """
+    axis = axis % source.ndim
+    out = None
+    for k in range(source.grid_shape[axis]):
+        src_index = index[:axis] + (k,) + index[axis:]
+        chunk = source.read_chunk(src_index)
+        reduced = chunk.max(axis=axis) if kind == 'max' else chunk.sum(axis=axis, dtype=np.float64)
+        if out is None:
+            out = reduced
+        else:
+            out = np.maximum(out, reduced) if kind == 'max' else out + reduced
+    if kind == 'mean':
+        out = (out / source.shape[axis]).astype(target.dtype)
+
+    out_sel = chunk_slices(index, target.shape, target.chunks)
+    if not np.any(out != target.fill_value):
+        if clear_empty:
+            # write_empty_chunks=False deletes the chunk if it already exists
+            target[out_sel] = target.fill_value
+        return False
+    target[out_sel] = out
+    return True
+
+
+def build_projection(source: ChunkedArray, group, axis: int, kind: str, executor, workers: int):
+    """
+    Creates the 'Data' array of the projection of `source` along `axis` in `group`,
+    one output chunk per task.
+    """
+    axis = axis % source.ndim
+    shape = source.shape[:axis] + source.shape[axis + 1:]
+    chunks = source.chunks[:axis] + source.chunks[axis + 1:]
+    dtype = source.dtype if kind == 'max' else np.float32
+    target = group.create_dataset('Data', shape=shape, chunks=chunks, dtype=dtype,
+                                  compressor=source.array.compressor, fill_value=source.fill_value,
+                                  write_empty_chunks=False, overwrite=True)
+    occupancy = np.zeros(chunk_grid_shape(shape, chunks), dtype=bool)
+
+    def build_chunk(index):
+        occupancy[index] = project_chunk(source, target, index, axis, kind)
+
+    run_bounded(executor, build_chunk, np.ndindex(*occupancy.shape), 2 * workers)
+    write_occupancy(group, occupancy)
+    return target
+
+
+def build_projections(root, kinds: Sequence[str] = ('max',), axes: Sequence[str] = tuple(AXES),
+                      target_size: int = DEFAULT_TARGET_SIZE, workers: Optional[int] = None) -> int:
+    """
+    Computes the projections of the full-resolution level of an IMS-layout hierarchy along the given
+    axes, for every timepoint and channel, each with its own resolution levels down to `target_size`
+    (maximum projections are downsampled with the block maximum, mean projections with the mean).
+    Returns the number of projections built.
+    """
+    workers = workers or resolve_threading(BULK)[0]
+    dataset = root['DataSet']
+    level0 = dataset[numbered_keys(dataset, LEVEL_PREFIX)[0]]
+    projections = root.require_group(PROJECTIONS_GROUP)
+    built = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for kind in kinds:
+            for axis in axes:
+                name = projection_name(kind, axis)
+                log(f"Building the {name} projection")
+                for timepoint in numbered_keys(level0, TIMEPOINT_PREFIX):
+                    for channel in numbered_keys(level0[timepoint], CHANNEL_PREFIX):
+                        source = open_chunked(level0[timepoint][channel], 'Data')
+                        group = projections.require_group(f"{name}/{LEVEL_PREFIX}0/{timepoint}/{channel}")
+                        build_projection(source, group, AXES[axis], kind, executor, workers)
+                add_levels(projections[name], target_size, kind, workers)
+                built += 1
+    return built
+
+
+def projection_layers(path: str, root, layers: List[Tuple[Any, dict]]) -> List[Tuple[Any, dict]]:
+    """
+    Returns one multiscale 2D layer per stored projection and channel (first timepoint),
+    covering the same extent as the channel layers in `layers`, whatever level these were opened at.
+    Contrast limits come from the coarsest level.
+    """
+    if PROJECTIONS_GROUP not in root:
+        return []
+    projections = root[PROJECTIONS_GROUP]
+    out = []
+    for name in sorted(projections.group_keys()):
+        axis = AXES.get(name.split(' ')[-1])
+        levels = numbered_keys(projections[name], LEVEL_PREFIX)
+        if axis is None or not levels:
+            continue
+        timepoints = numbered_keys(projections[name][levels[0]], TIMEPOINT_PREFIX)
+        if not timepoints:
+            continue
+        channels = numbered_keys(projections[name][levels[0]][timepoints[0]], CHANNEL_PREFIX)
+        for index, channel in enumerate(channels):
+            chunked = [open_chunked(projections[name][level][timepoints[0]][channel], 'Data')
+                       for level in levels if f"{timepoints[0]}/{channel}" in projections[name][level]]
+            scale = [1.0, 1.0]
+            if index < len(layers):
+                # Projection level 0 is full resolution: scale the layer's voxel size by the shape ratio
+                data, layer_meta = layers[index]
+                layer_scale, layer_shape = list(layer_meta['scale']), list(data.shape[-3:])
+                del layer_scale[axis], layer_shape[axis]
+                scale = [s * n / m for s, n, m in zip(layer_scale, layer_shape, chunked[0].shape[-2:])]
+            meta = {
+                'name': f"{channel} {name}",
+                'metadata': {'fileName': path, 'projection': name},
+                'contrast_limits': list(min_max(chunked[-1])),
+                'scale': tuple(scale),
+                'multiscale': True,
+            }
+            out.append(([to_dask(c) for c in chunked], meta))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add precomputed projections to an IMS-layout Zarr store.")
+    parser.add_argument('zarr_path', help="IMS-layout .zarr directory")
+    parser.add_argument('--mean', action='store_true', help="also build mean projections")
+    parser.add_argument('--axes', default='ZYX', help="projection axes (default: ZYX)")
+    parser.add_argument('--target-size', type=int, default=DEFAULT_TARGET_SIZE,
+                        help="largest axis length of the coarsest projection level")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of parallel workers (default: one per core)")
+    args = parser.parse_args(argv)
+
+    workers, _ = configure_threading(BULK, args.workers)
+    root = zarr.open(args.zarr_path, mode='r+')
+    kinds = KINDS if args.mean else ('max',)
+    built = build_projections(root, kinds, tuple(args.axes.upper()), args.target_size, workers)
+    # Keep consolidated metadata in sync with the new arrays
+    if '.zmetadata' in root.store:
+        zarr.consolidate_metadata(root.store)
+    print(f"Built {built} projection(s) in {args.zarr_path}")
+
+
+if __name__ == "__main__":
+    main()
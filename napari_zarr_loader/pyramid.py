@@ -0,0 +1,204 @@
+# pyramid.py
+
+import argparse
+import itertools
+import numpy as np
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+from .chunk_cache import get_chunk_cache
+from .chunked_array import SUMMARY_NAME, ChunkedArray, array_key, open_chunked, write_occupancy
+from .chunking import chunk_grid_shape, chunk_slices, run_bounded
+from .instrumentation import log
+from .threading_policy import BULK, configure_threading, resolve_threading
+
+LEVEL_PREFIX = 'ResolutionLevel '
+TIMEPOINT_PREFIX = 'TimePoint '
+CHANNEL_PREFIX = 'Channel '
+
+# Stop adding levels once every axis of the coarsest level is at most this many voxels
+DEFAULT_TARGET_SIZE = 512
+
+
+def numbered_keys(group, prefix: str) -> List[str]:
+    """
+    Returns the sub-group names of a Zarr or HDF5 `group` starting with `prefix`,
+    ordered by their numeric suffix.
+    """
+    names = group.group_keys() if hasattr(group, 'group_keys') else group.keys()
+    keys = [k for k in names if k.startswith(prefix) and k[len(prefix):].isdigit()]
+    return sorted(keys, key=lambda k: int(k[len(prefix):]))
+
+
+def downsample_factors(shape: Sequence[int]) -> Tuple[int, ...]:
+    """Halves every axis that is longer than one voxel."""
+    return tuple(2 if n > 1 else 1 for n in shape)
+
+
+def _blocks(block: np.ndarray, factors: Sequence[int]) -> np.ndarray:
+    """Reshapes `block` so that the voxels reduced into one output voxel lie along the last axis."""
+    pad = [(0, -n % f) for n, f in zip(block.shape, factors)]
+    if any(p for _, p in pad):
+        block = np.pad(block, pad, mode='edge')
+    split = []
+    for n, f in zip(block.shape, factors):
+        split += [n // f, f]
+    ndim = block.ndim
+    block = block.reshape(split).transpose(list(range(0, 2 * ndim, 2)) + list(range(1, 2 * ndim, 2)))
+    return block.reshape(block.shape[:ndim] + (-1,))
+
+
+def downsample_mean(block: np.ndarray, factors: Sequence[int]) -> np.ndarray:
+    """Block-wise mean, used for intensity images."""
+    reduced = _blocks(block, factors).mean(axis=-1)
+    if np.issubdtype(block.dtype, np.integer):
+        reduced = np.rint(reduced)
+    return reduced.astype(block.dtype)
+
+
+def downsample_mode(block: np.ndarray, factors: Sequence[int]) -> np.ndarray:
+    """Block-wise most frequent value, used for label images."""
+    values = np.sort(_blocks(block, factors), axis=-1)
+    counts = (values[..., :, None] == values[..., None, :]).sum(axis=-1)
+    return np.take_along_axis(values, counts.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+
+
+def downsample_max(block: np.ndarray, factors: Sequence[int]) -> np.ndarray:
+    """Block-wise maximum, used for maximum-intensity projections."""
+    return _blocks(block, factors).max(axis=-1)
+
+
+DOWNSAMPLERS = {
+    'mean': downsample_mean,
+    'mode': downsample_mode,
+    'max': downsample_max,
+}
+
+
+def downsample_chunk(source: ChunkedArray, target, index: Tuple[int, ...], factors: Sequence[int],
+                     method: str = 'mean', clear_empty: bool = True) -> bool:
+    """
+    Computes the chunk at grid position `index` of the coarse array `target` from `source`.
+    Chunks that only cover fill values are not written; with `clear_empty` a previously
+    written chunk is removed from the store. Returns True if the chunk holds data.
+    """
+    out_sel = chunk_slices(index, target.shape, target.chunks)
+    in_sel = tuple(slice(s.start * f, min(s.stop * f, n)) for s, f, n in zip(out_sel, factors, source.shape))
+    block = source[in_sel]
+    fill_value = target.fill_value
+    if not np.any(block != fill_value):
+        if clear_empty:
+            # write_empty_chunks=False deletes the chunk if it already exists
+            target[out_sel] = fill_value
+        return False
+    target[out_sel] = DOWNSAMPLERS[method](block, factors)
+    return True
+
+
+def create_level(source: ChunkedArray, group, factors: Sequence[int]):
+    """
+    Creates the (empty) 'Data' array of the next coarser level inside the channel group `group`.
+    """
+    shape = tuple(-(-n // f) for n, f in zip(source.shape, factors))
+    chunks = tuple(min(c, n) for c, n in zip(source.chunks, shape))
+    return group.create_dataset('Data', shape=shape, chunks=chunks, dtype=source.dtype,
+                                compressor=source.array.compressor, fill_value=source.fill_value,
+                                write_empty_chunks=False, overwrite=True)
+
+
+def build_level(source: ChunkedArray, group, factors: Sequence[int], method: str, executor, workers: int):
+    """
+    Downsamples `source` into a new 'Data' array in `group`, one output chunk per task.
+    At most two output chunks per worker are in flight, which bounds memory use.
+    """
+    target = create_level(source, group, factors)
+    occupancy = np.zeros(chunk_grid_shape(target.shape, target.chunks), dtype=bool)
+
+    def build_chunk(index):
+        # The array is new, so there are no stale chunks to clear
+        occupancy[index] = downsample_chunk(source, target, index, factors, method, clear_empty=False)
+
+    indices = itertools.product(*(range(n) for n in occupancy.shape))
+    run_bounded(executor, build_chunk, indices, 2 * workers)
+    write_occupancy(group, occupancy)
+    # The summary index of a level rebuilt in place no longer matches its data
+    if SUMMARY_NAME in group:
+        del group[SUMMARY_NAME]
+    # A level rebuilt in place must not be served from previously cached chunks
+    get_chunk_cache().invalidate(array_key(target))
+    return target
+
+
+def build_pyramid(root, target_size: int = DEFAULT_TARGET_SIZE, method: str = 'mean',
+                  workers: Optional[int] = None) -> int:
+    """
+    Adds resolution levels to an IMS-layout Zarr hierarchy until every axis of the coarsest level
+    is at most `target_size` voxels. Level N+1 is computed block-wise from level N, for every
+    timepoint and channel, in the 'DataSet/ResolutionLevel N/TimePoint T/Channel C/Data' layout.
+    Returns the number of levels added.
+    """
+    return add_levels(root['DataSet'], target_size, method, workers)
+
+
+def add_levels(dataset, target_size: int = DEFAULT_TARGET_SIZE, method: str = 'mean',
+               workers: Optional[int] = None) -> int:
+    """
+    Adds levels to a group holding 'ResolutionLevel N/TimePoint T/Channel C/Data' arrays
+    (see build_pyramid). Returns the number of levels added.
+    """
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method '{method}'. Use one of {sorted(DOWNSAMPLERS)}.")
+    workers = workers or resolve_threading(BULK)[0]
+    levels = numbered_keys(dataset, LEVEL_PREFIX)
+    if not levels:
+        raise ValueError("No resolution levels found in the DataSet group.")
+
+    added = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            level_index = int(levels[-1][len(LEVEL_PREFIX):])
+            coarsest = dataset[levels[-1]]
+            timepoints = numbered_keys(coarsest, TIMEPOINT_PREFIX)
+            channel_groups = [coarsest[t][c] for t in timepoints
+                              for c in numbered_keys(coarsest[t], CHANNEL_PREFIX)]
+            if not channel_groups:
+                break
+            shape = channel_groups[0]['Data'].shape
+            if max(shape) <= target_size or all(n <= 1 for n in shape):
+                break
+
+            new_level = f"{LEVEL_PREFIX}{level_index + 1}"
+            log(f"Building {new_level} from {levels[-1]}")
+            for channel_group in channel_groups:
+                source = open_chunked(channel_group, 'Data')
+                timepoint_name = channel_group.path.split('/')[-2]
+                channel_name = channel_group.path.split('/')[-1]
+                group = dataset.require_group(f"{new_level}/{timepoint_name}/{channel_name}")
+                build_level(source, group, downsample_factors(source.shape), method, executor, workers)
+            levels.append(new_level)
+            added += 1
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add resolution levels to an IMS-layout Zarr store.")
+    parser.add_argument('zarr_path', help="IMS-layout .zarr directory")
+    parser.add_argument('--target-size', type=int, default=DEFAULT_TARGET_SIZE,
+                        help="stop once every axis of the coarsest level is at most this many voxels")
+    parser.add_argument('--labels', action='store_true',
+                        help="downsample with the most frequent value instead of the mean")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of parallel workers (default: one per core)")
+    args = parser.parse_args(argv)
+
+    workers, _ = configure_threading(BULK, args.workers)
+    root = zarr.open(args.zarr_path, mode='r+')
+    added = build_pyramid(root, args.target_size, 'mode' if args.labels else 'mean', workers)
+    # Keep consolidated metadata in sync with the new levels
+    if '.zmetadata' in root.store:
+        zarr.consolidate_metadata(root.store)
+    print(f"Added {added} resolution level(s) to {args.zarr_path}")
+
+
+if __name__ == "__main__":
+    main()
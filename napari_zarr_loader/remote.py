@@ -0,0 +1,150 @@
+# remote.py
+
+import asyncio
+import threading
+import requests
+import zarr
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .async_fetch import get_fetch_engine
+from .coalesce import get_fetch_executor
+from .settings import get_setting
+
+try:
+    import aiohttp
+except ImportError:  # optional, enables asyncio fetching from HTTP stores
+    aiohttp = None
+
+HTTP_PREFIXES = ('http://', 'https://')
+RETRY_STATUS = (429, 500, 502, 503, 504)
+FILE_PREFIX = 'file://'
+
+
+class HTTPStore(zarr.storage.BaseStore):
+    """
+    Read-only Zarr store served over HTTP. All requests go through one keep-alive session
+    whose connection pool is sized for the concurrent chunk fetches, and failed requests
+    (connection errors, 429 and 5xx responses) are retried with exponential backoff.
+    Groups cannot be listed over HTTP, so stores need consolidated metadata ('.zmetadata').
+    """
+
+    def __init__(self, url: str, retries: int = None, timeout: float = None, pool_size: int = None):
+        self.path = url.rstrip('/')
+        self.timeout = timeout or get_setting('http_timeout')
+        pool_size = pool_size or get_setting('fetch_threads')
+        retry = Retry(total=get_setting('http_retries') if retries is None else retries,
+                      backoff_factor=0.2, status_forcelist=RETRY_STATUS,
+                      allowed_methods=('GET', 'HEAD'))
+        self.retries = retry.total
+        self._async_session = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _url(self, key: str) -> str:
+        return f"{self.path}/{key}"
+
+    def __getitem__(self, key):
+        response = self.session.get(self._url(key), timeout=self.timeout)
+        if response.status_code in (403, 404):
+            raise KeyError(key)
+        response.raise_for_status()
+        return response.content
+
+    @property
+    def supports_async(self) -> bool:
+        return aiohttp is not None
+
+    async def aget(self, key):
+        """
+        Fetches one key from the asyncio fetch engine's loop, through a pooled aiohttp session
+        bound to that loop, with the same retry policy as the synchronous requests.
+        """
+        if self._async_session is None:
+            connector = aiohttp.TCPConnector(limit=get_setting('max_inflight'))
+            self._async_session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._async_session.get(self._url(key)) as response:
+                    if response.status in (403, 404):
+                        raise KeyError(key)
+                    if response.status not in RETRY_STATUS:
+                        response.raise_for_status()
+                        return await response.read()
+            except aiohttp.ClientConnectionError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(0.2 * 2 ** attempt)
+        raise OSError(f"GET {self._url(key)} failed after {self.retries} retries")
+
+    def __contains__(self, key):
+        response = self.session.head(self._url(key), timeout=self.timeout)
+        return response.status_code == 200
+
+    def getitems(self, keys, *, contexts=None):
+        """Fetches several keys concurrently over the pooled connections."""
+        def fetch(key):
+            try:
+                return self[key]
+            except KeyError:
+                return None
+
+        values = get_fetch_executor().map(fetch, keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def __setitem__(self, key, value):
+        raise zarr.errors.ReadOnlyError()
+
+    def __delitem__(self, key):
+        raise zarr.errors.ReadOnlyError()
+
+    def __iter__(self):
+        # Only consolidated metadata can describe the hierarchy of a remote store
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+    def close(self):
+        self.session.close()
+        if self._async_session is not None:
+            # The aiohttp session belongs to the fetch engine's loop and is closed there
+            asyncio.run_coroutine_threadsafe(self._async_session.close(), get_fetch_engine().loop).result()
+            self._async_session = None
+
+
+# HTTP stores by URL, shared by every reader of a volume so that its connections are reused
+_http_stores = {}
+_http_stores_lock = threading.Lock()
+
+
+def http_store(url: str) -> HTTPStore:
+    """Returns the process-wide HTTPStore of `url`, created on first use."""
+    url = url.rstrip('/')
+    with _http_stores_lock:
+        if url not in _http_stores:
+            _http_stores[url] = HTTPStore(url)
+        return _http_stores[url]
+
+
+def close_http_stores() -> None:
+    """Closes the connection pools of all the HTTP stores opened so far."""
+    with _http_stores_lock:
+        stores = list(_http_stores.values())
+        _http_stores.clear()
+    for store in stores:
+        store.close()
+
+
+def open_remote_store(url: str):
+    """
+    Returns the store for a URL: pooled HTTP for http(s)://, a local directory for file://
+    and zarr's fsspec-backed FSStore for any other protocol.
+    """
+    if url.startswith(HTTP_PREFIXES):
+        return http_store(url)
+    if url.startswith(FILE_PREFIX):
+        return zarr.storage.DirectoryStore(url[len(FILE_PREFIX):])
+    return zarr.storage.FSStore(url, mode='r')
@@ -3,66 +3,60 @@
 import os
 import napari
 from magicgui import magic_factory
-from napari_plugin_engine import napari_hook_implementation
-from napari.layers import Image
-from .reader import zarr_reader  # Adjust import if necessary
+from typing import List, Optional, Tuple
+from .instrumentation import log, traced
+from .layer_registry import LayerRegistry, RegisteredLayer, set_resolution_level
+
+# Target of a level change: ('all', None), ('file', path) or ('layer', layer name)
+ALL_LAYERS = ('all', None)
+
+
+def target_choices(widget=None):
+    """Lists the files and the layers opened by the plugin in the current viewer."""
+    viewer = napari.current_viewer()
+    choices = [('All layers', ALL_LAYERS)]
+    if viewer is None:
+        return choices
+    registry = LayerRegistry(viewer)
+    choices += [(f"File: {os.path.basename(path.rstrip('/'))}", ('file', path)) for path in registry.files()]
+    choices += [(f"Layer: {entry.layer.name} (level {entry.level})", ('layer', entry.layer.name))
+                for entry in registry.entries()]
+    return choices
+
+
+def target_layers(viewer, target: Optional[Tuple[str, Optional[str]]] = None) -> List[RegisteredLayer]:
+    """Returns the plugin's layers designated by a target of target_choices()."""
+    kind, value = target or ALL_LAYERS
+    return LayerRegistry(viewer).select(file=value if kind == 'file' else None,
+                                        layer_name=value if kind == 'layer' else None)
+
 
 @magic_factory(
     auto_call=False,
-    call_button="Update"
+    call_button="Update",
+    target={'widget_type': 'ComboBox', 'choices': target_choices},
 )
 def resolution_change(
     viewer: napari.Viewer,
+    target=ALL_LAYERS,
     resolution_level: int = 0
 ):
     """
-    This widget allows you to change the resolution level of the Zarr data loaded in napari.
-    Select the desired resolution level and click 'Update' to reload the data.
+    This widget allows you to change the resolution level of the data loaded in napari.
+    Select the layers to update (all of them, those of one file, or a single layer) and the
+    desired resolution level, then click 'Update'. Only layers not yet at that level are reloaded.
     """
+    reload_layers(viewer, resolution_level, target)
 
-    # Find the first Image layer with 'fileName' in its metadata
-    image_layer = None
-    for layer in viewer.layers:
-        if isinstance(layer, Image) and 'fileName' in layer.metadata:
-            image_layer = layer
-            break
-
-    if image_layer is None:
-        print("No Image layer with 'fileName' in metadata found.")
-        return
 
-    # Get the file path from the metadata
-    file_path = image_layer.metadata.get('fileName', None)
-    if file_path is None:
-        print("No 'fileName' found in layer metadata.")
-        return
-
-    # Check if the file exists
-    if not os.path.exists(file_path):
-        print(f"The file '{file_path}' does not exist.")
-        return
-
-    # Use the zarr_reader function to load the data at the desired resolution level
-    try:
-        # Call the zarr_reader with the selected resolution level
-        layer_data_list = zarr_reader(file_path, resolution_level=resolution_level)
-    except ValueError as e:
-        print(e)
-        return
-
-    # Remove old layers
-    existing_layer_names = [layer.name for layer in viewer.layers]
-    for data_tuple in layer_data_list:
-        data, meta = data_tuple
-        layer_name = meta.get('name', 'Zarr Data')
-        if layer_name in existing_layer_names:
-            viewer.layers.remove(layer_name)
-
-    # Add the new layers to the viewer
-    for data_tuple in layer_data_list:
-        data, meta = data_tuple
-        viewer.add_image(data, **meta)
-
-@napari_hook_implementation
-def napari_experimental_provide_dock_widget():
-    return resolution_change
+@traced('reload_layers')
+def reload_layers(viewer, resolution_level: int = 0, target: Optional[Tuple[str, Optional[str]]] = None) -> int:
+    """
+    Switches the plugin's layers in `viewer` to another resolution level: all of them, or the
+    `target` file (('file', path)) or layer (('layer', name)). Returns the number of layers changed.
+    """
+    entries = target_layers(viewer, target)
+    if not entries:
+        log("No layer opened by napari-zarr-loader found.")
+        return 0
+    return set_resolution_level(entries, resolution_level)
@@ -0,0 +1,134 @@
+# roi.py
+
+import math
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .chunked_array import ChunkedArray, open_chunked, to_dask
+from .contributions import napari_get_reader
+from .hierarchy import hierarchy_index
+from .ims_reader import ImsArray, image_shape, open_file
+from .instrumentation import log, traced
+from .layer_registry import RegisteredLayer
+from .paths import IMS_LAYOUT, store_layout
+from .storage import open_zarr
+
+# A box in world coordinates: (minimum corner, maximum corner), one value per axis
+Box = Tuple[Sequence[float], Sequence[float]]
+
+
+def level_arrays(path: str, level: int, timepoint: Optional[int] = None,
+                 channels: Optional[Sequence[int]] = None) -> Optional[Dict[int, ChunkedArray]]:
+    """
+    Returns the ChunkedArray of every channel (or of the given `channels`) at `level` and `timepoint`
+    (by default the first one) of an IMS-layout Zarr store or an .ims file, by channel position
+    (as in the layer metadata), or None for other stores (e.g. OME-NGFF).
+    """
+    if path.lower().endswith('.ims'):
+        dataset = open_file(path)['DataSet']
+        index = hierarchy_index(dataset, path, image_shape)
+        index.check_level(level)
+        index.check_timepoint(timepoint)
+        return {channel: ChunkedArray(ImsArray(path, dataset[p]['Data'].name, image_shape(dataset[p])))
+                for channel, p in enumerate(index.channel_paths(level, timepoint))
+                if channels is None or channel in channels}
+    root = open_zarr(path)
+    if store_layout(path) not in (IMS_LAYOUT, None) or 'DataSet' not in root:
+        return None
+    dataset = root['DataSet']
+    index = hierarchy_index(dataset, path)
+    index.check_level(level)
+    index.check_timepoint(timepoint)
+    return {channel: open_chunked(dataset[p], 'Data') for channel, p in enumerate(index.channel_paths(level, timepoint))
+            if channels is None or channel in channels}
+
+
+def box_selection(box: Box, scale: Sequence[float], translate: Sequence[float],
+                  shape: Sequence[int]) -> Tuple[slice, ...]:
+    """
+    Returns the index slices of the voxels of an array (placed in the world by `scale` and
+    `translate`) whose positions fall within the world `box`, widened to whole voxels.
+    Infinite bounds select the whole axis.
+    """
+    selection = []
+    for lo, hi, s, t, n in zip(box[0], box[1], scale, translate, shape):
+        start = 0 if lo == -math.inf else min(n, max(0, math.floor((lo - t) / s)))
+        stop = n if hi == math.inf else min(n, math.floor((hi - t) / s) + 1)
+        selection.append(slice(start, max(start, stop)))
+    return tuple(selection)
+
+
+def layer_selection(layer, box: Box, shape: Sequence[int]) -> Tuple[List[float], Tuple[slice, ...]]:
+    """
+    Returns the voxel size of an array of `shape` covering the extent of the image `layer`
+    (another level of the same data), and the index slices of the world `box` in that array.
+    """
+    scale = [s * n / m for s, n, m in zip(layer.scale, layer.data.shape, shape)]
+    # Boxes drawn in fewer dimensions (e.g. a 2D Shapes layer) span the leading axes
+    missing = len(shape) - len(box[0])
+    full_box = ([-math.inf] * missing + list(box[0][-len(shape):]), [math.inf] * missing + list(box[1][-len(shape):]))
+    return scale, box_selection(full_box, scale, list(layer.translate), shape)
+
+
+@traced('load_roi')
+def roi_layers(entries: Sequence[RegisteredLayer], box: Box, level: int) -> List[Tuple[Any, dict]]:
+    """
+    Returns new layers holding the world `box` of the given layers at resolution `level`.
+    The data are lazy slices of one-chunk-per-task dask arrays over the store, so that viewing
+    them reads exactly the chunks overlapping the box. The level's voxel size is derived from
+    the source layer (same physical extent), and `translate` places the region in the world.
+    """
+    out = []
+    arrays_by_file = {}
+    for entry in entries:
+        if entry.file not in arrays_by_file:
+            arrays_by_file[entry.file] = level_arrays(entry.file, level)
+        arrays = arrays_by_file[entry.file]
+        layer = entry.layer
+        if arrays is not None and entry.channel in arrays:
+            array = to_dask(arrays[entry.channel], coalesce=False)
+        else:
+            # Other stores are sliced through their reader's dask arrays
+            layer_data = napari_get_reader(entry.file)(entry.file, resolution_level=level)
+            array = next(data for data, meta in layer_data if meta['metadata'].get('channel') == entry.channel)
+
+        scale, selection = layer_selection(layer, box, array.shape)
+        translate = list(layer.translate)
+        if any(s.stop <= s.start for s in selection):
+            log(f"The region does not overlap {layer.name}.")
+            continue
+        out.append((array[selection], {
+            'name': f"{layer.name} ROI (level {level})",
+            'scale': scale,
+            'translate': [t + s.start * sc for t, s, sc in zip(translate, selection, scale)],
+            'contrast_limits': list(layer.contrast_limits),
+            'colormap': layer.colormap.name,
+            'blending': layer.blending,
+            'metadata': {
+                'fileName': entry.file,
+                'channel': entry.channel,
+                'resolutionLevel': level,
+                'roi': [[s.start, s.stop] for s in selection],
+            },
+        }))
+    return out
+
+
+def shape_box(shapes_layer, index: Optional[int] = None, thickness: float = 0.0) -> Box:
+    """
+    Returns the world bounding box of a shape (by default the selected one, or the last one drawn)
+    of a napari Shapes layer. A rectangle drawn on one plane is flat along the other axes:
+    these are extended by `thickness` world units centred on the plane, or to the whole axis if it is 0.
+    """
+    if index is None:
+        selected = sorted(shapes_layer.selected_data)
+        index = selected[-1] if selected else len(shapes_layer.data) - 1
+    vertices = np.array([shapes_layer.data_to_world(v) for v in shapes_layer.data[index]])
+    lo, hi = vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()
+    for axis in range(len(lo)):
+        if hi[axis] > lo[axis]:
+            continue
+        if thickness:
+            lo[axis], hi[axis] = lo[axis] - thickness / 2, hi[axis] + thickness / 2
+        else:
+            lo[axis], hi[axis] = -math.inf, math.inf
+    return lo, hi
@@ -0,0 +1,117 @@
+# roi_widget.py
+
+import pathlib
+import threading
+import napari
+from magicgui import magic_factory
+from typing import List, Optional, Tuple
+from .export import FORMATS, export_region
+from .instrumentation import log
+from .resolution_change_widget import ALL_LAYERS, target_choices, target_layers
+from .roi import Box, layer_selection, level_arrays, roi_layers, shape_box
+
+
+@magic_factory(
+    call_button="Load region",
+    target={'widget_type': 'ComboBox', 'choices': target_choices},
+)
+def roi_loader(
+    viewer: napari.Viewer,
+    shapes: napari.layers.Shapes,
+    target=ALL_LAYERS,
+    resolution_level: int = 0,
+    thickness: float = 0.0
+):
+    """
+    Loads a region of interest at a finer resolution level as new layers.
+    Draw a rectangle (or any shape) in a Shapes layer over a coarse view, pick the layers and the
+    level, and click 'Load region'. `thickness` is the extent, in world units, along the axes the
+    shape is flat in (0 loads the whole axis). Only the chunks of the region are ever read.
+    """
+    if shapes is None or len(shapes.data) == 0:
+        log("Draw a rectangle in a Shapes layer first.")
+        return
+    load_roi(viewer, shape_box(shapes, thickness=thickness), resolution_level, target)
+
+
+def load_roi(viewer, box: Box, resolution_level: int,
+             target: Optional[Tuple[str, Optional[str]]] = None) -> List:
+    """Adds the world `box` of the target layers (see target_layers) at `resolution_level` to `viewer`."""
+    entries = target_layers(viewer, target)
+    if not entries:
+        log("No layer opened by napari-zarr-loader found.")
+        return []
+    try:
+        layer_data = roi_layers(entries, box, resolution_level)
+    except ValueError as e:
+        log(str(e))
+        return []
+    return [viewer.add_image(data, **meta) for data, meta in layer_data]
+
+
+@magic_factory(
+    call_button="Export region",
+    target={'widget_type': 'ComboBox', 'choices': target_choices},
+    output={'mode': 'w'},
+    output_format={'choices': list(FORMATS)},
+)
+def roi_exporter(
+    viewer: napari.Viewer,
+    shapes: napari.layers.Shapes,
+    output: pathlib.Path,
+    target=ALL_LAYERS,
+    resolution_level: int = 0,
+    thickness: float = 0.0,
+    output_format: str = 'zarr',
+    pyramid: bool = False
+):
+    """
+    Exports a region of interest of the target layers (one file) at a resolution level to a new
+    Zarr store or to TIFF planes, in the background (see export.export_region).
+    """
+    if shapes is None or len(shapes.data) == 0:
+        log("Draw a rectangle in a Shapes layer first.")
+        return
+    export_roi(viewer, shape_box(shapes, thickness=thickness), str(output), resolution_level, target,
+               output_format, pyramid, background=True)
+
+
+def export_roi(viewer, box: Box, output: str, resolution_level: int,
+               target: Optional[Tuple[str, Optional[str]]] = None, output_format: str = 'zarr',
+               pyramid: bool = False, background: bool = False) -> Optional[Tuple[int, ...]]:
+    """
+    Exports the world `box` of the target layers at `resolution_level` to `output`. The layers must
+    come from a single file; their channels are exported. Returns the shape of the exported region,
+    or None if it runs in the `background` or fails.
+    """
+    entries = target_layers(viewer, target)
+    files = list(dict.fromkeys(entry.file for entry in entries))
+    if len(files) != 1:
+        log("Select the layers of a single file to export.")
+        return None
+    try:
+        arrays = level_arrays(files[0], resolution_level)
+    except ValueError as e:
+        log(str(e))
+        return None
+    if arrays is None:
+        log(f"Only IMS-layout stores and .ims files can be exported: {files[0]}")
+        return None
+    _, selection = layer_selection(entries[0].layer, box, next(iter(arrays.values())).shape)
+
+    def run():
+        try:
+            shape = export_region(files[0], output, resolution_level, [entry.channel for entry in entries],
+                                  selection=selection, output_format=output_format, pyramid=pyramid)
+        except (ValueError, OSError, ImportError) as e:
+            log(f"Export failed: {e}")
+            return None
+        log(f"Exported a {shape} region to {output}")
+        return shape
+
+    if background:
+        # Exports can take minutes; the viewer stays responsive meanwhile
+        threading.Thread(target=run, name='roi-export').start()
+        return None
+    return run()
+
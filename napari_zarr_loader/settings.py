@@ -0,0 +1,49 @@
+# settings.py
+
+import os
+
+# Plugin settings, overridable through NAPARI_ZARR_LOADER_<NAME> environment variables
+DEFAULTS = {
+    # 'interactive' (few dask workers, many Blosc threads per chunk) or 'bulk'
+    # (one Blosc thread per worker, as many workers as cores)
+    'threading': 'interactive',
+    # 0 means derive the count from the threading mode and the number of cores
+    'blosc_threads': 0,
+    'dask_workers': 0,
+    # Size of the decoded-chunk cache shared by the Zarr and IMS readers, 0 disables it
+    'chunk_cache_mb': 256,
+    # Keep part of the cache LZ4-compressed, holding several times more chunks in the same memory
+    'compressed_cache': False,
+    # Decoded-chunk cache shared by all processes of the host (in /dev/shm by default), 0 disables it
+    'shared_cache_mb': 0,
+    'shared_cache_dir': '',
+    # Threads fetching the chunks of one request concurrently
+    'fetch_threads': 16,
+    # Dask tasks group whole chunks along Y and X up to this size, 0 keeps one task per chunk
+    'coalesce_mb': 16,
+    # Chunk reads go through an asyncio pipeline keeping up to max_inflight reads outstanding
+    'async_fetch': True,
+    'max_inflight': 256,
+    'decode_threads': 4,
+    # Remote (http://, https://) stores
+    'http_retries': 3,
+    'http_timeout': 30.0,
+    # Record timed spans and counters, printing a summary at exit; a trace file also gets
+    # the Chrome trace (chrome://tracing, Perfetto) of the session
+    'instrument': False,
+    'trace_file': '',
+}
+
+
+def get_setting(name: str):
+    """
+    Returns the value of a plugin setting, taking the environment variable
+    NAPARI_ZARR_LOADER_<NAME> into account. The value is cast to the type of the default.
+    """
+    default = DEFAULTS[name]
+    value = os.environ.get(f"NAPARI_ZARR_LOADER_{name.upper()}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return type(default)(value)
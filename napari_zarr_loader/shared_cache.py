@@ -0,0 +1,174 @@
+# shared_cache.py
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import numpy as np
+from typing import Hashable, Optional
+from .instrumentation import log
+from .settings import get_setting
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, evictions are then not serialized
+    fcntl = None
+
+# Chunk file header: magic, dtype string, number of dimensions and shape (up to MAX_NDIM axes)
+MAGIC = b'NZC1'
+MAX_NDIM = 8
+HEADER = struct.Struct(f'<4s16sI{MAX_NDIM}q')
+# Chunk data starts at an aligned offset after the header
+HEADER_SIZE = 128
+SUFFIX = '.chunk'
+# Evictions bring the cache down to this fraction of its size
+LOW_WATER = 0.9
+
+
+def default_directory() -> str:
+    """POSIX shared memory (/dev/shm) where available, otherwise the temporary directory."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'napari-zarr-loader-cache')
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+
+class SharedChunkCache:
+    """
+    Decoded-chunk cache shared by all processes on a host, one file per chunk in a shared-memory
+    directory. Files are published with an atomic rename, so lookups need no lock: a chunk is
+    either absent or complete, and is returned as a read-only view of the memory-mapped file
+    (no copy). Evicted files stay valid for processes still holding views of them.
+    The total size is bounded by `max_bytes`, evicting the least recently used chunks.
+    """
+
+    def __init__(self, max_bytes: int, directory: str = None):
+        self.max_bytes = max_bytes
+        self.directory = directory or default_directory()
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._added = 0
+        self._lock = threading.Lock()
+
+    def _prefix(self, array_key: str) -> str:
+        return _digest(array_key) + '-'
+
+    def _path(self, key: Hashable) -> str:
+        # Keys are (array key, chunk index) or (array key, chunk index, store version)
+        array_key, index, *version = key
+        name = self._prefix(array_key) + '_'.join(str(i) for i in index)
+        if version and version[0] is not None:
+            name += '-' + _digest(repr(version[0]))
+        name += SUFFIX
+        return os.path.join(self.directory, name)
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(SUFFIX))
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, dtype, ndim, *shape = HEADER.unpack_from(buffer)
+            if magic != MAGIC:
+                raise ValueError(f"not a cached chunk: {path}")
+            shape = shape[:ndim]
+            chunk = np.frombuffer(buffer, np.dtype(dtype.rstrip(b'\0').decode()),
+                                  count=int(np.prod(shape)), offset=HEADER_SIZE).reshape(shape)
+            # The modification time orders evictions
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return chunk
+
+    def put(self, key: Hashable, chunk: np.ndarray) -> None:
+        if chunk.dtype.hasobject or chunk.ndim > MAX_NDIM or HEADER_SIZE + chunk.nbytes > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shape = tuple(chunk.shape) + (0,) * (MAX_NDIM - chunk.ndim)
+        header = HEADER.pack(MAGIC, chunk.dtype.str.encode(), chunk.ndim, *shape)
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(header.ljust(HEADER_SIZE, b'\0'))
+                f.write(np.ascontiguousarray(chunk).data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log(f"Could not write to the shared chunk cache: {e}")
+            return
+        with self._lock:
+            self._added += HEADER_SIZE + chunk.nbytes
+            evict = self._added > self.max_bytes // 8
+            if evict:
+                self._added = 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used chunks once the cache exceeds its size."""
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return  # another process is already evicting
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * LOW_WATER:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, array_key: str) -> None:
+        """Drops all cached chunks of one array, in every process."""
+        prefix = self._prefix(array_key)
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix):
+                self._remove(os.path.join(self.directory, name))
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+
+_shared_cache = None
+
+
+def get_shared_chunk_cache() -> Optional[SharedChunkCache]:
+    """
+    Returns the host-wide shared chunk cache, or None when it is disabled
+    ('shared_cache_mb' setting, 0 by default; 'shared_cache_dir' sets its location).
+    """
+    global _shared_cache
+    if _shared_cache is None and get_setting('shared_cache_mb') > 0:
+        _shared_cache = SharedChunkCache(int(get_setting('shared_cache_mb') * 2**20),
+                                         get_setting('shared_cache_dir') or None)
+    return _shared_cache
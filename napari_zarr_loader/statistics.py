@@ -0,0 +1,187 @@
+# statistics.py
+
+import argparse
+import itertools
+import dask
+import numpy as np
+import zarr
+from typing import Dict, Iterable, List, Optional, Tuple
+from .chunked_array import SUMMARY_NAME, ChunkedArray, normalize_selection, open_chunked, write_summary
+from .chunking import chunk_slices
+from .hierarchy import build_index
+
+# Number of chunks reduced per dask task, keeps the task graph small on large levels
+CHUNKS_PER_TASK = 64
+# Number of chunks fetched as one batch (and held in memory) within a task
+CHUNKS_PER_FETCH = 8
+
+# Fields of the chunk summary index, along its last axis
+MIN, MAX, SUM, COUNT, NONZERO = range(5)
+SUMMARY_FIELDS = ('min', 'max', 'sum', 'count', 'nonzero')
+
+
+def chunk_summary(block: np.ndarray) -> np.ndarray:
+    """Returns the (min, max, sum, count, nonzero) summary of a block of voxels."""
+    if not block.size:
+        return np.array([np.inf, -np.inf, 0, 0, 0], dtype=np.float64)
+    return np.array([block.min(), block.max(), block.sum(dtype=np.float64), block.size,
+                     np.count_nonzero(block)], dtype=np.float64)
+
+
+def fill_summary(chunked: ChunkedArray) -> np.ndarray:
+    """Returns the summary index of an array holding only its fill value."""
+    summary = np.empty(chunked.grid_shape + (len(SUMMARY_FIELDS),), dtype=np.float64)
+    count = np.ones(chunked.grid_shape)
+    for axis, (n, c) in enumerate(zip(chunked.shape, chunked.chunks)):
+        sizes = np.full(chunked.grid_shape[axis], c)
+        sizes[-1:] = n - c * (chunked.grid_shape[axis] - 1)
+        count = count * sizes.reshape((-1,) + (1,) * (chunked.ndim - axis - 1))
+    fill = float(chunked.fill_value)
+    summary[..., MIN] = summary[..., MAX] = fill
+    summary[..., SUM] = fill * count
+    summary[..., COUNT] = count
+    summary[..., NONZERO] = count if fill else 0
+    return summary
+
+
+def _blocks_summary(chunked: ChunkedArray, indices: List[Tuple[int, ...]]) -> List[np.ndarray]:
+    summaries = []
+    for start in range(0, len(indices), CHUNKS_PER_FETCH):
+        chunks = chunked.read_chunks(indices[start:start + CHUNKS_PER_FETCH])
+        summaries.extend(chunk_summary(chunks[index]) for index in indices[start:start + CHUNKS_PER_FETCH])
+    return summaries
+
+
+def _batches(indices: Iterable[Tuple[int, ...]]) -> Iterable[List[Tuple[int, ...]]]:
+    indices = iter(indices)
+    while True:
+        batch = list(itertools.islice(indices, CHUNKS_PER_TASK))
+        if not batch:
+            return
+        yield batch
+
+
+def compute_summary(chunked: ChunkedArray, indices: Optional[Iterable[Tuple[int, ...]]] = None) -> np.ndarray:
+    """
+    Computes the summary index of an array, reading only chunks that may hold data.
+    With `indices`, only those chunks are recomputed in the array's existing summary.
+    """
+    if indices is None:
+        summary = fill_summary(chunked)
+        indices = chunked.occupied_chunks()
+    else:
+        summary = chunked.summary.copy()
+    batches = list(_batches(indices))
+    results = dask.compute(*(dask.delayed(_blocks_summary)(chunked, batch) for batch in batches))
+    for batch, summaries in zip(batches, results):
+        for index, values in zip(batch, summaries):
+            summary[index] = values
+    return summary
+
+
+def min_max(chunked: ChunkedArray) -> Tuple[float, float]:
+    """
+    Returns the minimum and maximum of an array, from its summary index when it has one.
+    Otherwise only chunks that may hold data are read; empty chunks contribute their fill value
+    without any store access.
+    """
+    if chunked.summary is not None:
+        return float(chunked.summary[..., MIN].min()), float(chunked.summary[..., MAX].max())
+
+    tasks = [dask.delayed(_blocks_min_max)(chunked, batch) for batch in _batches(chunked.occupied_chunks())]
+    results = list(dask.compute(*tasks))
+    if chunked.has_empty_chunks():
+        results.append((chunked.fill_value, chunked.fill_value))
+
+    lo = min(r[0] for r in results) if results else chunked.fill_value
+    hi = max(r[1] for r in results) if results else chunked.fill_value
+    return float(lo), float(hi)
+
+
+def _blocks_min_max(chunked: ChunkedArray, indices: List[Tuple[int, ...]]) -> Tuple[float, float]:
+    lo, hi = np.inf, -np.inf
+    for start in range(0, len(indices), CHUNKS_PER_FETCH):
+        for chunk in chunked.read_chunks(indices[start:start + CHUNKS_PER_FETCH]).values():
+            if chunk.size:
+                lo, hi = min(lo, chunk.min()), max(hi, chunk.max())
+    return lo, hi
+
+
+def region_stats(chunked: ChunkedArray, selection=Ellipsis) -> Dict[str, float]:
+    """
+    Returns the min, max, mean, sum, count and nonzero count of a region of an array.
+    Chunks lying entirely inside the region are answered from the summary index, so only the
+    chunks cut by the region boundary are read (all chunks when there is no summary).
+    """
+    region, _, steps = normalize_selection(selection, chunked.shape)
+    if any(step != 1 for step in steps):
+        raise ValueError("region statistics need unit-step slices")
+    ranges = [range(s.start // c, -(-s.stop // c)) for s, c in zip(region, chunked.chunks)]
+    partial, totals = [], [np.array([np.inf, -np.inf, 0, 0, 0], dtype=np.float64)]
+    for index in itertools.product(*ranges):
+        bounds = chunk_slices(index, chunked.shape, chunked.chunks)
+        inside = all(r.start <= b.start and b.stop <= r.stop for r, b in zip(region, bounds))
+        if inside and chunked.summary is not None:
+            totals.append(chunked.summary[index])
+        else:
+            partial.append(index)
+
+    for start in range(0, len(partial), CHUNKS_PER_FETCH):
+        batch = partial[start:start + CHUNKS_PER_FETCH]
+        for index, chunk in chunked.read_chunks(batch).items():
+            bounds = chunk_slices(index, chunked.shape, chunked.chunks)
+            crop = tuple(slice(max(r.start, b.start) - b.start, min(r.stop, b.stop) - b.start)
+                         for r, b in zip(region, bounds))
+            totals.append(chunk_summary(chunk[crop]))
+
+    totals = np.stack(totals)
+    count = totals[:, COUNT].sum()
+    return {
+        'min': float(totals[:, MIN].min()) if count else float('nan'),
+        'max': float(totals[:, MAX].max()) if count else float('nan'),
+        'mean': float(totals[:, SUM].sum() / count) if count else float('nan'),
+        'sum': float(totals[:, SUM].sum()),
+        'count': int(count),
+        'nonzero': int(totals[:, NONZERO].sum()),
+    }
+
+
+def refresh_summary(group, indices: Iterable[Tuple[int, ...]]) -> None:
+    """Recomputes the summaries of the given chunks of a channel group's 'Data' array, if it is indexed."""
+    if SUMMARY_NAME not in group:
+        return
+    # The occupancy bitmap may not reflect the edits yet, so every given chunk is read
+    chunked = ChunkedArray(group['Data'], summary=group[SUMMARY_NAME][...])
+    if chunked.summary is not None:
+        write_summary(group, compute_summary(chunked, sorted(indices)))
+
+
+def index_volume(root) -> int:
+    """
+    Computes the chunk summary index of every 'Data' array of an IMS-layout hierarchy.
+    Returns the number of arrays indexed.
+    """
+    dataset = root['DataSet']
+    indexed = 0
+    for path in build_index(dataset).iter_groups():
+        group = dataset[path]
+        write_summary(group, compute_summary(open_chunked(group)))
+        indexed += 1
+    return indexed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the per-chunk summary index of an IMS-layout Zarr store.")
+    parser.add_argument('zarr_path', help="IMS-layout .zarr directory")
+    args = parser.parse_args(argv)
+
+    root = zarr.open(args.zarr_path, mode='r+')
+    indexed = index_volume(root)
+    # Keep consolidated metadata in sync with the new arrays
+    if '.zmetadata' in root.store:
+        zarr.consolidate_metadata(root.store)
+    print(f"Indexed {indexed} array(s) in {args.zarr_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# storage.py
+
+import struct
+import threading
+import zipfile
+import zarr
+from numcodecs import Blosc, blosc
+from .coalesce import merge_ranges
+from .paths import is_url, is_zip_path
+from .remote import open_remote_store
+
+# Blosc shuffle modes accepted in compressor specifications
+SHUFFLES = {'noshuffle': Blosc.NOSHUFFLE, 'shuffle': Blosc.SHUFFLE, 'bitshuffle': Blosc.BITSHUFFLE}
+# Fixed part of a zip local file header, followed by the file name and the extra field
+ZIP_HEADER = struct.Struct('<4s5H3L2H')
+
+
+class ZipChunkStore(zarr.storage.ZipStore):
+    """
+    Read-only zip container in which every thread reads through its own archive handle,
+    so that chunk reads from dask workers do not serialize on a single handle.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path, mode='r')
+        self._local = threading.local()
+
+    def _zip_file(self) -> zipfile.ZipFile:
+        zip_file = getattr(self._local, 'zip_file', None)
+        if zip_file is None:
+            zip_file = self._local.zip_file = zipfile.ZipFile(self.path, mode='r')
+        return zip_file
+
+    def __getitem__(self, key):
+        with self._zip_file().open(key) as f:
+            return f.read()
+
+    def _raw_file(self):
+        raw_file = getattr(self._local, 'raw_file', None)
+        if raw_file is None:
+            raw_file = self._local.raw_file = open(self.path, 'rb')
+        return raw_file
+
+    def getitems(self, keys, *, contexts=None):
+        """
+        Reads several members at once. Members stored next to each other in the archive
+        are read with a single ranged read and split afterwards.
+        """
+        zip_file = self._zip_file()
+        infos = []
+        for key in keys:
+            try:
+                infos.append(zip_file.getinfo(key))
+            except KeyError:
+                continue
+
+        # Upper bound of each member's size: local headers may carry a different extra field
+        ranges = [(info.header_offset,
+                   ZIP_HEADER.size + len(info.filename.encode()) + len(info.extra) + info.compress_size + 64)
+                  for info in infos]
+        values = {}
+        raw_file = self._raw_file()
+        for offset, size, members in merge_ranges(ranges):
+            raw_file.seek(offset)
+            buffer = raw_file.read(size)
+            for i in members:
+                info = infos[i]
+                start = info.header_offset - offset
+                header = ZIP_HEADER.unpack_from(buffer, start)
+                data_start = start + ZIP_HEADER.size + header[-2] + header[-1]
+                data = buffer[data_start:data_start + info.compress_size]
+                if info.compress_type != zipfile.ZIP_STORED or len(data) != info.compress_size:
+                    data = self[info.filename]
+                values[info.filename] = data
+        return values
+
+    def __contains__(self, key):
+        try:
+            self._zip_file().getinfo(key)
+        except KeyError:
+            return False
+        return True
+
+
+def parse_compressor(spec):
+    """
+    Parses a compressor specification: 'none', or 'CNAME[:LEVEL[:SHUFFLE]]' for Blosc,
+    e.g. 'zstd:3:bitshuffle' (level 5 and byte shuffling by default).
+    """
+    if spec in (None, 'default'):
+        return 'default'
+    if spec == 'none':
+        return None
+    cname, _, rest = spec.partition(':')
+    level, _, shuffle = rest.partition(':')
+    if cname not in blosc.list_compressors() or (shuffle and shuffle not in SHUFFLES):
+        raise ValueError(f"Invalid compressor '{spec}', expected 'none' or CNAME[:LEVEL[:SHUFFLE]] with CNAME "
+                         f"in {blosc.list_compressors()} and SHUFFLE in {sorted(SHUFFLES)}")
+    return Blosc(cname=cname, clevel=int(level or 5), shuffle=SHUFFLES[shuffle or 'shuffle'])
+
+
+def create_store(path: str):
+    """
+    Returns the store to write a converted volume to: a zip container for '.zip' paths,
+    otherwise the directory itself.
+    """
+    if is_zip_path(path):
+        return zarr.ZipStore(path, mode='w')
+    return path
+
+
+def finalize_store(store) -> None:
+    """
+    Consolidates the metadata of a freshly written volume into '.zmetadata', so that readers
+    fetch a single metadata object instead of one per group and array, and closes zip containers.
+    """
+    zarr.consolidate_metadata(store)
+    if isinstance(store, zarr.storage.ZipStore):
+        store.close()
+
+
+def open_store(path: str):
+    """
+    Returns the read-only store for a local directory, a zip container or a URL.
+    """
+    if is_url(path):
+        return open_remote_store(path)
+    if is_zip_path(path):
+        return ZipChunkStore(path)
+    return zarr.storage.DirectoryStore(path)
+
+
+def open_zarr(path: str):
+    """
+    Opens a store read-only, using consolidated metadata when present.
+    """
+    store = open_store(path)
+    if '.zmetadata' in store:
+        return zarr.open_consolidated(store, mode='r')
+    return zarr.open(store, mode='r')
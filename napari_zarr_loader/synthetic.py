@@ -0,0 +1,151 @@
+# synthetic.py
+
+import h5py
+import numpy as np
+import zarr
+from concurrent.futures import ThreadPoolExecutor
+from numcodecs import Blosc
+from typing import Optional, Sequence, Tuple
+from .chunked_array import ChunkedArray, open_chunked, write_occupancy, write_summary
+from .chunking import chunk_grid_shape, chunk_slices, iter_chunk_slices, run_bounded
+from .pyramid import CHANNEL_PREFIX, LEVEL_PREFIX, TIMEPOINT_PREFIX, build_level, downsample_factors
+from .statistics import chunk_summary, compute_summary, fill_summary
+from .storage import create_store, finalize_store
+
+# Compressors of the generated stores, by name
+COMPRESSORS = {
+    'lz4': Blosc(cname='lz4', clevel=5, shuffle=Blosc.BITSHUFFLE),
+    'zstd': Blosc(cname='zstd', clevel=3, shuffle=Blosc.BITSHUFFLE),
+    'none': None,
+}
+
+
+def chunk_is_empty(seed: int, timepoint: int, channel: int, index: Tuple[int, ...], sparsity: float) -> bool:
+    """Decides, reproducibly, whether a level-0 chunk of a synthetic volume holds only zeros."""
+    return np.random.default_rng((seed, timepoint, channel) + tuple(index)).random() < sparsity
+
+
+def synthetic_block(selection: Tuple[slice, ...], dtype, seed: int = 0, timepoint: int = 0,
+                    channel: int = 0) -> np.ndarray:
+    """
+    Returns the voxels of a synthetic volume within `selection`: smooth structures plus noise,
+    which compresses like microscopy data rather than like random values.
+    """
+    z, y, x = np.ogrid[tuple(slice(s.start, s.stop) for s in selection)]
+    smooth = (3 + np.sin(z / 5 + timepoint + channel) + np.sin(y / 9) + np.sin(x / 13)) / 6
+    dtype = np.dtype(dtype)
+    top = np.iinfo(dtype).max // 16 if dtype.kind in 'ui' else 1.0
+    rng = np.random.default_rng((seed, timepoint, channel) + tuple(s.start for s in selection))
+    block = smooth * top + rng.normal(0, top / 50, smooth.shape)
+    return np.clip(block, 0, None).astype(dtype)
+
+
+def _write_level0(group, shape, chunks, dtype, compressor, sparsity, seed, timepoint, channel,
+                  summary, executor, workers):
+    array = group.create_dataset('Data', shape=shape, chunks=chunks, dtype=dtype, compressor=compressor,
+                                 write_empty_chunks=False, overwrite=True)
+    occupancy = np.zeros(chunk_grid_shape(shape, chunks), dtype=bool)
+    summaries = fill_summary(ChunkedArray(array))
+
+    def write_chunk(selection):
+        index = tuple(s.start // c for s, c in zip(selection, chunks))
+        if chunk_is_empty(seed, timepoint, channel, index, sparsity):
+            return
+        block = synthetic_block(selection, dtype, seed, timepoint, channel)
+        array[selection] = block
+        occupancy[index] = True
+        summaries[index] = chunk_summary(block)
+
+    run_bounded(executor, write_chunk, iter_chunk_slices(shape, chunks), 2 * workers)
+    write_occupancy(group, occupancy)
+    if summary:
+        write_summary(group, summaries)
+
+
+def make_volume(path: str, shape: Sequence[int] = (64, 256, 256), chunks: Sequence[int] = (16, 64, 64),
+                levels: int = 3, timepoints: int = 1, channels: int = 1, sparsity: float = 0.0,
+                compressor: str = 'lz4', dtype: str = 'uint16', summary: bool = True, seed: int = 0,
+                workers: Optional[int] = None) -> str:
+    """
+    Writes a synthetic volume in the IMS layout produced by the converter, with chunk-occupancy
+    bitmaps, optional summary indices and `levels` resolution levels (each halving every axis).
+    A `sparsity` fraction of the level-0 chunks hold only the fill value and are not stored.
+    `path` may be a '.zarr' directory or a '.zarr.zip' container. Returns `path`.
+    """
+    shape, chunks = tuple(shape), tuple(chunks)
+    workers = workers or 4
+    store = create_store(path)
+    root = zarr.open(store, mode='w')
+    dataset = root.create_group('DataSet')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for t in range(timepoints):
+            for c in range(channels):
+                group = dataset.create_group(f"{LEVEL_PREFIX}0/{TIMEPOINT_PREFIX}{t}/{CHANNEL_PREFIX}{c}")
+                _write_level0(group, shape, chunks, dtype, COMPRESSORS[compressor], sparsity, seed, t, c,
+                              summary, executor, workers)
+                for level in range(1, levels):
+                    source = open_chunked(group)
+                    group = dataset.create_group(f"{LEVEL_PREFIX}{level}/{TIMEPOINT_PREFIX}{t}/{CHANNEL_PREFIX}{c}")
+                    target = build_level(source, group, downsample_factors(source.shape), 'mean', executor, workers)
+                    if summary:
+                        write_summary(group, compute_summary(open_chunked(group)))
+                    if all(n <= 1 for n in target.shape):
+                        break
+
+    info = root.create_group('DataSetInfo/Image')
+    # Imaris numbers the axes X=0, Y=1, Z=2; one micrometre per voxel.
+    # A single update: every attribute write appends a new '.zattrs' member to zip containers
+    extents = {}
+    for axis, n in enumerate(reversed(shape)):
+        extents[f'ExtMin{axis}'] = '0'
+        extents[f'ExtMax{axis}'] = str(float(n))
+    info.attrs.update(extents)
+    finalize_store(store)
+    return path
+
+
+def _ims_chars(value) -> np.ndarray:
+    """Imaris stores attributes as arrays of single characters."""
+    return np.array(list(str(value)), dtype='S1')
+
+
+def make_ims_file(path: str, shape: Sequence[int] = (64, 256, 256), chunks: Sequence[int] = (16, 64, 64),
+                  levels: int = 2, channels: int = 1, sparsity: float = 0.0, dtype: str = 'uint16',
+                  seed: int = 0) -> str:
+    """
+    Writes a synthetic .ims (HDF5) file with the Imaris layout: datasets padded to whole chunks,
+    ImageSize and extent attributes stored as character arrays, one timepoint.
+    Coarser levels take every second voxel of the previous one. Returns `path`.
+    """
+    shape, chunks = tuple(shape), tuple(chunks)
+    grid = chunk_grid_shape(shape, chunks)
+    empty = [np.array([chunk_is_empty(seed, 0, c, index, sparsity) for index in np.ndindex(*grid)],
+                      dtype=bool).reshape(grid) for c in range(channels)]
+    with h5py.File(path, 'w') as f:
+        for level in range(levels):
+            step = 2 ** level
+            level_shape = tuple(-(-n // step) for n in shape)
+            level_chunks = tuple(min(c, n) for c, n in zip(chunks, level_shape))
+            for c in range(channels):
+                group = f.create_group(f"DataSet/{LEVEL_PREFIX}{level}/{TIMEPOINT_PREFIX}0/{CHANNEL_PREFIX}{c}")
+                padded = tuple(-(-n // k) * k for n, k in zip(level_shape, level_chunks))
+                dataset = group.create_dataset('Data', shape=padded, dtype=dtype, chunks=level_chunks,
+                                               compression='gzip', compression_opts=1)
+                for index in np.ndindex(*chunk_grid_shape(level_shape, level_chunks)):
+                    selection = chunk_slices(index, level_shape, level_chunks)
+                    # Voxels of empty level-0 chunks stay empty at every level
+                    coords = np.ix_(*(np.arange(s.start, s.stop) * step // k for s, k in zip(selection, chunks)))
+                    mask = empty[c][coords]
+                    if mask.all():
+                        continue
+                    full = tuple(slice(s.start * step, s.stop * step) for s in selection)
+                    block = synthetic_block(full, dtype, seed, 0, c)[(slice(None, None, step),) * 3]
+                    block[mask] = 0
+                    dataset[selection] = block
+                for axis, n in zip('ZYX', level_shape):
+                    group.attrs[f'ImageSize{axis}'] = _ims_chars(n)
+        info = f.create_group('DataSetInfo/Image')
+        for axis, n in enumerate(reversed(shape)):
+            info.attrs[f'ExtMin{axis}'] = _ims_chars(0)
+            info.attrs[f'ExtMax{axis}'] = _ims_chars(float(n))
+    return path
@@ -0,0 +1,88 @@
+# threading_policy.py
+
+import os
+import threading
+import dask
+from numcodecs import blosc
+from typing import Optional, Tuple
+from .settings import get_setting
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+# Interactive slicing only touches a handful of chunks at once, so keep the dask pool small
+# (it mostly waits on storage) and let Blosc split each (large) chunk across all the cores.
+MAX_INTERACTIVE_WORKERS = 4
+
+
+def resolve_threading(mode: Optional[str] = None, workers: Optional[int] = None,
+                      cpu_count: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Returns (dask_workers, blosc_threads) for the given threading mode without changing any
+    global state. Explicit settings take precedence over the values derived from the mode.
+    """
+    mode = mode or get_setting('threading')
+    if mode not in (INTERACTIVE, BULK):
+        raise ValueError(f"Unknown threading mode '{mode}'. Use '{INTERACTIVE}' or '{BULK}'.")
+    cpu_count = cpu_count or os.cpu_count() or 1
+
+    workers = workers or get_setting('dask_workers')
+    if not workers:
+        workers = min(MAX_INTERACTIVE_WORKERS, cpu_count) if mode == INTERACTIVE else cpu_count
+
+    blosc_threads = get_setting('blosc_threads')
+    if not blosc_threads:
+        blosc_threads = cpu_count if mode == INTERACTIVE else 1
+    blosc_threads = min(blosc_threads, blosc.MAX_THREADS)
+
+    return workers, blosc_threads
+
+
+def configure_threading(mode: Optional[str] = None, workers: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Coordinates the Blosc internal thread count with the dask worker count so that
+    decompression does not oversubscribe the cores.
+    With its thread pool, Blosc decodes through one global context guarded by a global lock,
+    so concurrent decodes run one at a time. In 'interactive' mode that single decoder gets all
+    the cores, while a few dask workers keep the storage reads concurrent.
+    In 'bulk' mode (conversion) every worker decodes/encodes concurrently, each with its own
+    single-threaded Blosc context.
+    Returns (dask_workers, blosc_threads).
+    """
+    with _configure_lock:
+        return _apply(mode, workers)
+
+
+def _apply(mode: Optional[str], workers: Optional[int]) -> Tuple[int, int]:
+    workers, blosc_threads = resolve_threading(mode, workers)
+
+    blosc.set_nthreads(blosc_threads)
+    # Blosc only uses its thread pool from the main thread unless told otherwise, and does
+    # so through the locked global context; without it each call gets a private context.
+    blosc.use_threads = blosc_threads > 1
+
+    dask.config.set(scheduler='threads', num_workers=workers)
+    global _configured_mode
+    _configured_mode = mode or get_setting('threading')
+    return workers, blosc_threads
+
+
+# Mode last applied by configure_threading, None until then
+_configured_mode = None
+_configure_lock = threading.Lock()
+
+
+def active_mode() -> Optional[str]:
+    """Returns the threading mode currently applied, or None if none was applied yet."""
+    return _configured_mode
+
+
+def ensure_threading(mode: Optional[str] = None) -> None:
+    """
+    Applies the threading policy once per process. Called by the reader and the converter at startup,
+    possibly from several threads: the global Blosc and dask settings only change with the mode.
+    """
+    mode = mode or get_setting('threading')
+    with _configure_lock:
+        if _configured_mode != mode:
+            _apply(mode, None)
@@ -0,0 +1,193 @@
+# tile_server.py
+
+import argparse
+import json
+import os
+import threading
+import numpy as np
+import zarr
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote
+from .chunked_array import ChunkedArray, open_chunked
+from .instrumentation import log
+from .storage import open_zarr
+
+DEFAULT_PORT = 8765
+METADATA_KEYS = ('.zgroup', '.zattrs', '.zarray')
+
+
+class ServedVolume:
+    """
+    A Zarr hierarchy exposed by the chunk server. With `decoded`, chunks are served decompressed
+    out of the server's decoded-chunk cache and the array metadata announces no compressor, so
+    clients only copy bytes; otherwise the stored (compressed) chunks are passed through.
+    """
+
+    def __init__(self, path: str, decoded: bool = True):
+        self.path = path
+        self.decoded = decoded
+        self.root = open_zarr(path)
+        self.metadata = {}
+        self.arrays: Dict[str, ChunkedArray] = {}
+        self._add_node('', self.root)
+        if isinstance(self.root, zarr.Group):
+            self.root.visititems(self._add_node)
+        self.zmetadata = json.dumps({'zarr_consolidated_format': 1, 'metadata': self.metadata}).encode()
+
+    def _add_node(self, name: str, node):
+        prefix = f"{name}/" if name else ''
+        store = self.root.store
+        for key in METADATA_KEYS:
+            if prefix + key not in store:
+                continue
+            meta = store[prefix + key]
+            # Consolidated metadata stores return parsed documents
+            meta = dict(meta) if isinstance(meta, dict) else json.loads(meta)
+            if key == '.zarray' and self.decoded:
+                meta.update(compressor=None, filters=None)
+            self.metadata[prefix + key] = meta
+        if isinstance(node, zarr.Array):
+            parent_name, _, leaf = name.rpartition('/')
+            parent = self.root[parent_name] if parent_name else self.root
+            self.arrays[name] = open_chunked(parent, leaf) if leaf == 'Data' else ChunkedArray(node)
+
+    def _locate(self, key: str) -> Optional[Tuple[ChunkedArray, Tuple[int, ...]]]:
+        """Returns the array and chunk grid position addressed by a chunk key."""
+        name, _, chunk_name = key.rpartition('/')
+        for _ in range(key.count('/') + 1):
+            chunked = self.arrays.get(name)
+            if chunked is not None:
+                break
+            # Chunk keys with the '/' dimension separator span several path components
+            name, _, head = name.rpartition('/')
+            chunk_name = f"{head}/{chunk_name}"
+        else:
+            return None
+        separator = getattr(chunked.array, '_dimension_separator', None) or '.'
+        try:
+            index = tuple(int(i) for i in chunk_name.split(separator))
+        except ValueError:
+            return None
+        if len(index) != chunked.ndim or any(not 0 <= i < n for i, n in zip(index, chunked.grid_shape)):
+            return None
+        return chunked, index
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the value of a store key, or None if there is no such key."""
+        if key == '.zmetadata':
+            return self.zmetadata
+        if key in self.metadata:
+            return json.dumps(self.metadata[key]).encode()
+        located = self._locate(key)
+        if located is None:
+            return None
+        chunked, index = located
+        if chunked.is_empty(index):
+            return None
+        if not self.decoded:
+            try:
+                return chunked.array.chunk_store[key]
+            except KeyError:
+                return None
+        chunk = chunked.read_chunk(index)
+        if chunk.shape != chunked.chunks:
+            # Edge chunks are stored padded to the full chunk shape
+            padded = np.full(chunked.chunks, chunked.fill_value, dtype=chunked.dtype)
+            padded[tuple(slice(0, n) for n in chunk.shape)] = chunk
+            chunk = padded
+        return chunk.tobytes(order=chunked.array.order)
+
+
+class ChunkRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _value(self) -> Optional[bytes]:
+        name, _, key = unquote(self.path).lstrip('/').partition('/')
+        volume = self.server.volumes.get(name)
+        return volume.get(key) if volume is not None and key else None
+
+    def _respond(self, body: bool):
+        try:
+            value = self._value()
+        except Exception as e:
+            log(f"Error serving {self.path}: {e}")
+            self.send_error(500)
+            return
+        if value is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(value)))
+        self.end_headers()
+        if body:
+            self.wfile.write(value)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def log_message(self, *args):
+        pass
+
+
+class ChunkServer(ThreadingHTTPServer):
+    """
+    Local HTTP server sharing opened volumes, and the chunks decoded from them, between processes.
+    Each volume is served as a consolidated Zarr store under '/<name>', which the reader and
+    HTTPStore open like any remote volume: N viewers of one volume cost a single decode.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        super().__init__((host, port), ChunkRequestHandler)
+        self.volumes: Dict[str, ServedVolume] = {}
+        self._thread = None
+
+    def add_volume(self, path: str, name: str = None, decoded: bool = True) -> str:
+        """Serves the volume at `path` (directory, zip container or URL) and returns its URL."""
+        name = name or os.path.basename(os.path.normpath(path))
+        if not name.endswith('.zarr'):
+            name = os.path.splitext(name)[0] + '.zarr'
+        self.volumes[name] = ServedVolume(path, decoded)
+        return self.url(name)
+
+    def url(self, name: str) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def start(self):
+        """Serves requests from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name='napari-zarr-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Zarr volumes and their decoded chunks to local processes.")
+    parser.add_argument('paths', nargs='+', help="volumes to serve (.zarr directories, .zip containers or URLs)")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--compressed', action='store_true',
+                        help="pass stored chunks through instead of serving decoded chunks")
+    args = parser.parse_args(argv)
+
+    server = ChunkServer(args.host, args.port)
+    for path in args.paths:
+        print(f"Serving {path} at {server.add_volume(path, decoded=not args.compressed)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
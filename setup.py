@@ -10,14 +10,23 @@ setup(
     packages=find_packages(),
     install_requires=[
         'napari',
-        'napari-plugin-engine',
+        'npe2',
         'magicgui',
-        'zarr',
+        'zarr>=2.11,<3',
         'dask[array]',
+        'h5py',
+        'requests',
     ],
+    extras_require={
+        # asyncio fetching from HTTP stores
+        'async': ['aiohttp'],
+        # exports of regions to TIFF planes
+        'tiff': ['tifffile'],
+    },
+    package_data={'napari_zarr_loader': ['napari.yaml']},
     entry_points={
-        'napari.plugin': [
-            'napari-zarr-loader = napari_zarr_loader',
+        'napari.manifest': [
+            'napari-zarr-loader = napari_zarr_loader:napari.yaml',
         ],
     },
 )
\ No newline at end of file